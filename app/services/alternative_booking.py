@@ -0,0 +1,334 @@
+"""
+Find Next Best Price → Make Alternative Booking (``Workflow/workflow_diagram.mmd``).
+
+When a corporate booking fails, ``AlternativeBookingService`` asks every
+booking provider for a quote on each item *in parallel*, under one global
+deadline (``ALT_BOOKING_DEADLINE_MS``) for the whole search. It takes the
+cheapest offer per item among the quotes that arrived in time and books it.
+Providers still quoting at the deadline are cut off. Their quotes are not
+waited for, but a quote that arrives late is still cached for the next search.
+
+Quotes are cached per (category, item, currency, provider) for
+``ALT_BOOKING_QUOTE_TTL_SECONDS``, including "no availability" answers. A
+search only fans out to providers without a fresh quote, so repeated failures
+for the same item do not hammer the providers.
+
+Items are booked concurrently on their own thread pool, so quotes that were
+cut off and are still running cannot delay a booking. If any item cannot be
+booked, the items that were booked are cancelled before the failure is
+returned; nothing stays booked for an order that is not rebooked.
+
+Providers are offline stand-ins (``StubBookingProvider``) configured by
+``ALT_BOOKING_PROVIDERS`` as ``name:latency_ms:price_factor`` entries. Each quotes
+``price_factor`` times the item's price, ±5%, after ``latency_ms`` ±50%.
+
+Configuration (environment):
+
+- ``ALT_BOOKING_PROVIDERS``          providers (default ``skyline:80:1.04,globetrot:150:0.98,budgetgo:450:0.93``)
+- ``ALT_BOOKING_DEADLINE_MS``        global fan-out deadline (default 300)
+- ``ALT_BOOKING_QUOTE_TTL_SECONDS``  quote cache lifetime (default 30)
+- ``ALT_BOOKING_WORKERS``            threads quoting providers (default 16)
+- ``ALT_BOOKING_BOOKING_WORKERS``    threads booking and cancelling (default 8)
+"""
+
+import concurrent.futures
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from .base_service import BaseService, ServiceResult
+    from .metrics import Counter, Histogram
+    from .tracing import propagating, span
+except ImportError:
+    from base_service import BaseService, ServiceResult
+    from metrics import Counter, Histogram
+    from tracing import propagating, span
+
+DEFAULT_PROVIDERS = "skyline:80:1.04,globetrot:150:0.98,budgetgo:450:0.93"
+
+FANOUT_DURATION = Histogram('alternative_booking_fanout_seconds', 'Wall time of an alternative-offer quote fan-out')
+PROVIDER_CUTOFFS = Counter('alternative_booking_provider_cutoffs_total',
+                           'Provider quotes still outstanding at the fan-out deadline', ['provider'])
+
+
+class ProviderError(Exception):
+    """A provider could not quote or book"""
+
+
+@dataclass(frozen=True, slots=True)
+class Offer:
+    provider: str
+    item: str
+    category: str
+    unit_price: float
+    currency: str
+    quoted_at: float
+
+
+class StubBookingProvider:
+    """Offline stand-in for a booking provider's quote and booking API"""
+
+    def __init__(self, name: str, latency_ms: float, price_factor: float, failure_rate: float = 0.1):
+        self.name = name
+        self.latency_seconds = latency_ms / 1000
+        self.price_factor = price_factor
+        self.failure_rate = failure_rate
+        self.bookings = set()  # references of confirmed bookings
+        self._lock = threading.Lock()
+
+    def quote(self, item: Dict[str, Any], currency: str) -> Optional[Offer]:
+        """Unit price for ``item``, or None when the provider has no availability"""
+        time.sleep(self.latency_seconds * random.uniform(0.5, 1.5))
+        if random.random() < self.failure_rate:
+            return None
+        price = round(item['price'] * self.price_factor * random.uniform(0.95, 1.05), 2)
+        return Offer(self.name, item['name'], item.get('category', 'service'), price, currency, time.time())
+
+    def book(self, offer: Offer, quantity: int, reference: str) -> str:
+        """Book ``quantity`` at the offered price; returns the provider's booking reference"""
+        time.sleep(self.latency_seconds * random.uniform(0.5, 1.5))
+        if random.random() < self.failure_rate:
+            raise ProviderError(f"{self.name} could not confirm the booking - offer no longer available")
+        reference = f"{self.name[:3].upper()}{uuid.uuid4().hex[:8].upper()}"
+        with self._lock:
+            self.bookings.add(reference)
+        return reference
+
+    def cancel(self, reference: str):
+        """Cancel a booking made by ``book``; cancelling twice is a no-op"""
+        time.sleep(self.latency_seconds * random.uniform(0.5, 1.5))
+        with self._lock:
+            self.bookings.discard(reference)
+
+
+def providers_from_env(spec: str = None, failure_rate: float = 0.1) -> List[StubBookingProvider]:
+    providers = []
+    for entry in (spec or os.getenv("ALT_BOOKING_PROVIDERS", DEFAULT_PROVIDERS)).split(','):
+        if entry.strip():
+            name, latency_ms, price_factor = entry.strip().split(':')
+            providers.append(StubBookingProvider(name, float(latency_ms), float(price_factor), failure_rate))
+    return providers
+
+
+QuoteKey = Tuple[str, str, str, str]  # category, item, currency, provider
+
+
+class QuoteCache:
+    """Recent quotes (or ``None`` for no availability) with a short TTL"""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._quotes: Dict[QuoteKey, Tuple[Optional[Offer], float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: QuoteKey) -> Tuple[bool, Optional[Offer]]:
+        """``(found, offer)``"""
+        entry = self._quotes.get(key)
+        if entry is None or entry[1] < time.time():
+            return False, None
+        return True, entry[0]
+
+    def put(self, key: QuoteKey, offer: Optional[Offer]):
+        now = time.time()
+        with self._lock:
+            self._quotes[key] = (offer, now + self.ttl_seconds)
+            if len(self._quotes) > 10000:
+                self._quotes = {k: v for k, v in self._quotes.items() if v[1] >= now}
+
+    def __len__(self) -> int:
+        return len(self._quotes)
+
+
+class AlternativeBookingService(BaseService):
+    """🔁 Alternative Booking - Finds the next best price across providers and books it"""
+
+    def __init__(self, providers: List[StubBookingProvider] = None, deadline_ms: float = None,
+                 quote_ttl_seconds: float = None, workers: int = None, booking_workers: int = None):
+        super().__init__("AlternativeBookingService", failure_rate=0.1)
+        self.providers = providers or providers_from_env(failure_rate=self.failure_rate)
+        self.deadline_seconds = (float(os.getenv("ALT_BOOKING_DEADLINE_MS", "300"))
+                                 if deadline_ms is None else deadline_ms) / 1000
+        self.quotes = QuoteCache(float(os.getenv("ALT_BOOKING_QUOTE_TTL_SECONDS", "30"))
+                                 if quote_ttl_seconds is None else quote_ttl_seconds)
+        workers = int(os.getenv("ALT_BOOKING_WORKERS", "16")) if workers is None else workers
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='alt-booking')
+        booking_workers = (int(os.getenv("ALT_BOOKING_BOOKING_WORKERS", "8"))
+                           if booking_workers is None else booking_workers)
+        self._booking_executor = ThreadPoolExecutor(max_workers=max(1, booking_workers),
+                                                    thread_name_prefix='alt-booking-book')
+        self._cutoffs = {provider.name: PROVIDER_CUTOFFS.labels(provider.name) for provider in self.providers}
+        self._lock = threading.Lock()
+        self._fanout_times = deque(maxlen=1000)
+        self._stats = {'searches': 0, 'fanouts': 0, 'quote_requests': 0, 'cache_hits': 0, 'cutoffs': 0,
+                       'late_quotes_cached': 0, 'provider_errors': 0, 'not_found': 0, 'booked': 0, 'booking_failures': 0,
+                       'bookings_cancelled': 0, 'cancel_failures': 0}
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def execute(self, order_id: str, items: List[Dict[str, Any]], currency: str = "USD",
+                max_total: float = None, **kwargs) -> ServiceResult:
+        """Find the cheapest offer for every item and book it, within ``max_total`` if given"""
+        self._log_operation("FIND_ALTERNATIVE", True, "Order: %s, Items: %d", order_id, len(items))
+        offers, search = self.search(items, currency)
+        if any(not item_offers for item_offers in offers):
+            self._count('not_found')
+            missing = ', '.join(item['name'] for item, item_offers in zip(items, offers) if not item_offers)
+            return ServiceResult(success=False, data={'search': search},
+                                 error_message=f"No alternative found for {missing}")
+
+        cheapest = sum(item_offers[0].unit_price * item.get('quantity', 1) for item, item_offers in zip(items, offers))
+        if max_total is not None and cheapest > max_total + 0.005:
+            self._count('not_found')
+            return ServiceResult(success=False, data={'search': search},
+                                 error_message=f"No alternative within budget: best price {cheapest:.2f} {currency} "
+                                               f"exceeds {max_total:.2f} {currency}")
+
+        # items are booked concurrently, each with its cheapest provider first
+        bookings = list(self._booking_executor.map(propagating(self._book), [order_id] * len(items), items, offers))
+        failed = [item['name'] for item, booking in zip(items, bookings) if booking is None]
+        if failed:
+            self._count('booking_failures')
+            not_cancelled = self._cancel([booking for booking in bookings if booking])
+            return ServiceResult(success=False, data={'search': search, 'not_cancelled': not_cancelled},
+                                 error_message=f"Alternative booking failed for {', '.join(failed)}")
+
+        self._count('booked')
+        total = round(sum(booking['unit_price'] * booking['quantity'] for booking in bookings), 2)
+        self._log_operation("ALTERNATIVE_BOOKING", True, "Order %s rebooked for %s %s", order_id, total, currency)
+        return ServiceResult(success=True, data={
+            'order_id': order_id,
+            'status': 'shipped',
+            'tracking_number': bookings[0]['booking_reference'],
+            'shipping_method': 'alternative booking',
+            'alternative_booking': True,
+            'bookings': bookings,
+            'total': total,
+            'currency': currency,
+            'search': search
+        })
+
+    def _book(self, order_id: str, item: Dict[str, Any], offers: List[Offer]) -> Optional[Dict[str, Any]]:
+        # a provider that can no longer confirm falls through to the next best offer
+        providers = {provider.name: provider for provider in self.providers}
+        for offer in offers:
+            try:
+                reference = providers[offer.provider].book(offer, item.get('quantity', 1), order_id)
+            except ProviderError as e:
+                self._log_operation("ALTERNATIVE_BOOKING", False, "%s", e)
+                continue
+            return {'item': offer.item, 'provider': offer.provider, 'unit_price': offer.unit_price,
+                    'quantity': item.get('quantity', 1), 'booking_reference': reference}
+        return None
+
+    def _cancel(self, bookings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Cancel ``bookings`` concurrently; returns those that could not be cancelled"""
+        providers = {provider.name: provider for provider in self.providers}
+        futures = [(booking, self._booking_executor.submit(
+            propagating(providers[booking['provider']].cancel), booking['booking_reference']))
+            for booking in bookings]
+        not_cancelled = []
+        for booking, future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                self._log_operation("CANCEL_BOOKING", False, "%s %s: %s",
+                                    booking['provider'], booking['booking_reference'], e)
+                not_cancelled.append(booking)
+        self._count('bookings_cancelled', len(bookings) - len(not_cancelled))
+        self._count('cancel_failures', len(not_cancelled))
+        return not_cancelled
+
+    def search(self, items: List[Dict[str, Any]], currency: str) -> Tuple[List[List[Offer]], Dict[str, Any]]:
+        """Offers per item, cheapest first, and a report of the fan-out"""
+        started = time.perf_counter()
+        deadline = started + self.deadline_seconds
+        offers: List[List[Offer]] = [[] for _ in items]
+        futures = {}
+        cached = 0
+        with span("alternative_booking.search", {'items': len(items), 'providers': len(self.providers)}):
+            for index, item in enumerate(items):
+                for provider in self.providers:
+                    key = (item.get('category', 'service'), item['name'], currency, provider.name)
+                    found, offer = self.quotes.get(key)
+                    if found:
+                        cached += 1
+                        if offer is not None:
+                            offers[index].append(offer)
+                    else:
+                        futures[self._executor.submit(propagating(provider.quote), item, currency)] = (index, key)
+
+            if futures:
+                done, outstanding = concurrent.futures.wait(futures, timeout=max(0.0, deadline - time.perf_counter()))
+                elapsed = time.perf_counter() - started
+                FANOUT_DURATION.observe(elapsed)
+            else:
+                done, outstanding, elapsed = set(), set(), 0.0
+
+        errors = 0
+        for future in done:
+            index, key = futures[future]
+            try:
+                offer = future.result()
+            except Exception:
+                errors += 1
+                continue
+            self.quotes.put(key, offer)
+            if offer is not None:
+                offers[index].append(offer)
+        for future in outstanding:
+            provider = futures[future][1][3]
+            self._cutoffs[provider].inc()
+            future.add_done_callback(lambda f, key=futures[future][1]: self._late_quote(key, f))
+
+        with self._lock:
+            self._stats['searches'] += 1
+            self._stats['quote_requests'] += len(futures)
+            self._stats['cache_hits'] += cached
+            self._stats['cutoffs'] += len(outstanding)
+            self._stats['provider_errors'] += errors
+            if futures:
+                self._stats['fanouts'] += 1
+                self._fanout_times.append(elapsed)
+
+        for item_offers in offers:
+            item_offers.sort(key=lambda offer: offer.unit_price)
+        return offers, {
+            'providers_asked': len(futures),
+            'quotes_cached': cached,
+            'cut_off': sorted({futures[future][1][3] for future in outstanding}),
+            'fanout_ms': round(elapsed * 1000, 1),
+            'deadline_ms': round(self.deadline_seconds * 1000)
+        }
+
+    def _late_quote(self, key: QuoteKey, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        self.quotes.put(key, future.result())
+        self._count('late_quotes_cached')
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            report = dict(self._stats)
+            times = sorted(self._fanout_times)
+        report['cutoff_rate'] = round(report['cutoffs'] / report['quote_requests'], 3) if report['quote_requests'] else 0.0
+        report['fanout_ms'] = {
+            'p50': round(times[len(times) // 2] * 1000, 1) if times else None,
+            'p95': round(times[min(len(times) - 1, int(len(times) * 0.95))] * 1000, 1) if times else None
+        }
+        report['cached_quotes'] = len(self.quotes)
+        report['providers'] = [provider.name for provider in self.providers]
+        report['deadline_ms'] = round(self.deadline_seconds * 1000)
+        return report
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        self._booking_executor.shutdown(wait=wait)
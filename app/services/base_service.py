@@ -1,30 +1,109 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from dataclasses import dataclass, field, replace
+from typing import Dict, Any, List, Optional
 import random
 import logging
+import os
+import time
 from datetime import datetime
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+try:
+    from .structured_logging import configure_logging, sample_rate_for
+    from .metrics import ServiceMetrics, instrument_service
+    from .tracing import trace_service
+except ImportError:
+    from structured_logging import configure_logging, sample_rate_for
+    from metrics import ServiceMetrics, instrument_service
+    from tracing import trace_service
+
+# Configure logging (queued, formatted off the request thread)
+configure_logging()
 logger = logging.getLogger(__name__)
 
-class ServiceResult:
-    """Represents the result of a service operation"""
-    def __init__(self, success: bool, data: Optional[Dict[str, Any]] = None, 
-                 error_message: Optional[str] = None, retry_count: int = 0):
-        self.success = success
-        self.data = data or {}
-        self.error_message = error_message
-        self.retry_count = retry_count
-        self.timestamp = datetime.now()
+# Converts monotonic result timestamps to wall-clock time on demand
+_WALL_CLOCK_OFFSET = time.time() - time.monotonic()
+
+class _ServiceResultMixin:
+    """Behaviour shared by mutable and frozen service results"""
+    __slots__ = ()
+
+    @property
+    def timestamp(self) -> datetime:
+        """Wall-clock creation time, computed only when asked for"""
+        return datetime.fromtimestamp(_WALL_CLOCK_OFFSET + self._created)
+
+    @property
+    def age(self) -> float:
+        """Seconds since the result was created"""
+        return time.monotonic() - self._created
+
+    def __json__(self) -> Dict[str, Any]:
+        """Fields sent to API clients; ``data`` is referenced, not copied"""
+        return {'success': self.success, 'data': self.data,
+                'error_message': self.error_message, 'retry_count': self.retry_count}
+
+@dataclass(slots=True)
+class ServiceResult(_ServiceResultMixin):
+    """Represents the result of a service operation.
+
+    Slotted, with a monotonic creation time; ``data`` is ``None`` when the
+    service returned nothing. API responses are serialized through
+    ``__json__``, which leaves out ``_created``.
+    """
+    success: bool
+    data: Optional[Dict[str, Any]] = None
+    error_message: Optional[str] = None
+    retry_count: int = 0
+    _created: float = field(default_factory=time.monotonic, repr=False, compare=False)
+
+    def freeze(self) -> 'FrozenServiceResult':
+        """Immutable copy sharing the same ``data``"""
+        return FrozenServiceResult(self.success, self.data, self.error_message, self.retry_count, self._created)
+
+@dataclass(slots=True, frozen=True)
+class FrozenServiceResult(_ServiceResultMixin):
+    """Immutable ``ServiceResult``, safe to share between threads and caches"""
+    success: bool
+    data: Optional[Dict[str, Any]] = None
+    error_message: Optional[str] = None
+    retry_count: int = 0
+    _created: float = field(default_factory=time.monotonic, repr=False, compare=False)
+
+    def freeze(self) -> 'FrozenServiceResult':
+        return self
+
+# Filled in by the parse step when the input names no email; it identifies nobody
+PLACEHOLDER_EMAILS = frozenset({'customer@example.com'})
+
+def customer_key(customer_id: str, customer_email: str = None) -> str:
+    """Stable customer identity: the parsed email when known, else the customer id.
+
+    The parse step makes up a new customer id for almost every request, so
+    per-customer state (velocity limits, corporate wallets) keys on this.
+    """
+    email = (customer_email or '').strip().lower()
+    if email and email not in PLACEHOLDER_EMAILS:
+        return f"email:{email}"
+    return customer_id
 
 class BaseService(ABC):
     """Abstract base class for all services"""
     
+    def __init_subclass__(cls, **kwargs):
+        """Record metrics (and spans, when tracing is on) for every concrete ``execute``"""
+        super().__init_subclass__(**kwargs)
+        execute = cls.__dict__.get('execute')
+        if execute is not None and not getattr(execute, '__isabstractmethod__', False):
+            cls.execute = instrument_service(trace_service(execute))
+    
     def __init__(self, name: str, failure_rate: float = 0.25):
         self.name = name
-        self.failure_rate = failure_rate
+        # SERVICE_FAILURE_RATE overrides every simulated failure rate (e.g. 0 for load tests)
+        override = os.getenv("SERVICE_FAILURE_RATE")
+        self.failure_rate = float(override) if override else failure_rate
         self.call_count = 0
+        self.log_sample_rate = sample_rate_for(name)
+        self.metrics = ServiceMetrics(name)
         
     @abstractmethod
     def execute(self, **kwargs) -> ServiceResult:
@@ -37,16 +116,36 @@ class BaseService(ABC):
         should_fail = random.random() < self.failure_rate
         
         if should_fail:
-            logger.warning(f"{self.name} - Simulated failure on call #{self.call_count}")
-        else:
-            logger.info(f"{self.name} - Successful execution on call #{self.call_count}")
+            logger.warning("%s - Simulated failure on call #%d", self.name, self.call_count,
+                           extra={'service': self.name, 'call': self.call_count, 'simulated_failure': True})
+        elif self._should_log(logging.INFO, True):
+            logger.info("%s - Successful execution on call #%d", self.name, self.call_count,
+                        extra={'service': self.name, 'call': self.call_count})
             
         return should_fail
     
-    def _log_operation(self, operation: str, success: bool, details: str = ""):
-        """Log service operations for observability"""
+    def _record_batch(self, elapsed: float, results: List[ServiceResult]):
+        """Record a bulk provider call as one call per message, each taking the whole call's time"""
+        for result in results:
+            self.metrics.record(elapsed, result)
+    
+    def _should_log(self, level: int, success: bool) -> bool:
+        """Level gate plus per-service sampling of successful operations"""
+        if not logger.isEnabledFor(level):
+            return False
+        return not success or self.log_sample_rate >= 1.0 or random.random() < self.log_sample_rate
+    
+    def _log_operation(self, operation: str, success: bool, details: str = "", *args, level: int = logging.INFO):
+        """Log service operations for observability.
+        
+        ``details`` is a %-style format string for ``args``; it is only formatted
+        if the record is emitted, on the logging thread.
+        """
+        if not self._should_log(level, success):
+            return
         status = "SUCCESS" if success else "FAILURE"
-        logger.info(f"{self.name} - {operation} - {status} - {details}")
+        logger.log(level, "%s - %s - %s - " + details, self.name, operation, status, *args,
+                   extra={'service': self.name, 'operation': operation, 'success': success})
 
 class RetryableService(BaseService):
     """Base class for services that support retry logic"""
@@ -59,17 +158,22 @@ class RetryableService(BaseService):
         """Execute service with retry logic"""
         for attempt in range(self.max_retries + 1):
             result = self.execute(**kwargs)
-            result.retry_count = attempt
+            if isinstance(result, FrozenServiceResult):
+                result = replace(result, retry_count=attempt)
+            else:
+                result.retry_count = attempt
+            if attempt > 0:
+                self.metrics.retries.inc()
             
             if result.success:
                 if attempt > 0:
-                    logger.info(f"{self.name} - Succeeded after {attempt} retries")
+                    logger.info("%s - Succeeded after %d retries", self.name, attempt)
                 return result
             
             if attempt < self.max_retries:
-                logger.warning(f"{self.name} - Attempt {attempt + 1} failed, retrying...")
+                logger.warning("%s - Attempt %d failed, retrying...", self.name, attempt + 1)
             else:
-                logger.error(f"{self.name} - All {self.max_retries + 1} attempts failed")
+                logger.error("%s - All %d attempts failed", self.name, self.max_retries + 1)
                 
         return result
 
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Offline stand-in for the exchange rate API.
+
+Serves ``GET /<api key>/convert?amount=&from=&to=`` in the response format
+``CurrencyConversionService`` parses, with deterministic rates, so currency
+conversion can be load-tested without network access:
+
+    python app/services/fx_stub.py --port 8002 --latency-ms 50
+    CURRENCY_API_BASE_URL=http://localhost:8002 python start.py
+"""
+
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Units per US dollar
+USD_RATES = {'USD': 1.0, 'EUR': 0.85, 'GBP': 0.73, 'JPY': 110.0, 'CAD': 1.25,
+             'AUD': 1.35, 'CHF': 0.92, 'CNY': 6.45, 'INR': 74.5}
+
+
+def stub_rate(from_currency: str, to_currency: str) -> float:
+    """Cross rate through USD; unknown currencies trade at par"""
+    return round(USD_RATES.get(to_currency, 1.0) / USD_RATES.get(from_currency, 1.0), 6)
+
+
+class StubFXHandler(BaseHTTPRequestHandler):
+    """``/<key>/convert`` endpoint of the exchange rate API"""
+
+    latency_seconds = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if not url.path.rstrip('/').endswith('/convert'):
+            self.send_error(404)
+            return
+
+        query = parse_qs(url.query)
+        from_currency = query.get('from', ['USD'])[0].upper()
+        to_currency = query.get('to', ['USD'])[0].upper()
+        amount = float(query.get('amount', ['1'])[0])
+        rate = stub_rate(from_currency, to_currency)
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+
+        body = json.dumps({
+            'query': {'from': from_currency, 'to': to_currency, 'amount': str(amount)},
+            'info': {'rate': rate},
+            'result': round(amount * rate, 6)
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def create_server(host: str = '127.0.0.1', port: int = 8002, latency_ms: float = 0.0) -> ThreadingHTTPServer:
+    """Build (but do not start) the stub server"""
+    handler = type('ConfiguredStubFXHandler', (StubFXHandler,), {'latency_seconds': latency_ms / 1000.0})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline exchange rate API stand-in")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8002)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Artificial latency per request')
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, args.latency_ms)
+    print(f"Stub exchange rate API listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
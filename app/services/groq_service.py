@@ -1,32 +1,112 @@
-from groq import Groq
 import json
 import os
+import threading
+import time
 import uuid
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Callable, Iterator, Optional
 
 try:
     # Try relative imports first (when imported as a package)
     from .base_service import BaseService, ServiceResult
+    from .json_stream import IncrementalJSONParser
+    from .llm_backends import LLMBackend, LLMBackendError, LLMRateLimitError, create_llm_backend
+    from .rate_limit import AdmissionController, RateLimitTimeout
+    from .model_router import ModelRouter, validate_workflow_config
+    from .tracing import span
 except ImportError:
     # Fall back to absolute imports (when run as standalone)
     from base_service import BaseService, ServiceResult
+    from json_stream import IncrementalJSONParser
+    from llm_backends import LLMBackend, LLMBackendError, LLMRateLimitError, create_llm_backend
+    from rate_limit import AdmissionController, RateLimitTimeout
+    from model_router import ModelRouter, validate_workflow_config
+    from tracing import span
+
+# One admission queue per backend per process, shared by every GroqLLMService instance.
+# Only Groq has a known quota; other backends get a concurrency limit and no token
+# bucket unless LLM_REQUESTS_PER_MINUTE is set.
+_admission_controllers: Dict[str, AdmissionController] = {}
+_admission_lock = threading.Lock()
+
+def get_admission_controller(backend: str = None) -> AdmissionController:
+    """Shared rate limiter / adaptive concurrency limit for calls to ``backend``
+    (default: the ``LLM_BACKEND`` env var)"""
+    name = (backend or os.getenv("LLM_BACKEND", "groq")).lower()
+    name = name.rsplit(":", 1)[-1]  # recording:<backend> shares the recorded backend's queue
+    name = "openai" if name == "http" else name
+    controller = _admission_controllers.get(name)
+    if controller is None:
+        with _admission_lock:
+            controller = _admission_controllers.get(name)
+            if controller is None:
+                if name == "groq":
+                    controller = AdmissionController.from_env("GROQ")
+                else:
+                    controller = AdmissionController.from_env("LLM", requests_per_minute="0")
+                _admission_controllers[name] = controller
+    return controller
+
+# Routers are shared per large model so routing stats cover the whole process
+_model_routers: Dict[str, ModelRouter] = {}
+
+def get_model_router(large_model: str) -> ModelRouter:
+    """Shared complexity router whose large tier is ``large_model``"""
+    with _admission_lock:
+        if large_model not in _model_routers:
+            _model_routers[large_model] = ModelRouter.from_env(large_model)
+        return _model_routers[large_model]
+
+def routing_stats() -> Dict[str, Any]:
+    """Routing statistics of every router, keyed by large model"""
+    with _admission_lock:
+        routers = dict(_model_routers)
+    return {model: router.stats() for model, router in routers.items()}
+
+_llm_service = None
+_llm_service_lock = threading.Lock()
+
+def get_llm_service() -> 'GroqLLMService':
+    """Process-wide GroqLLMService, built on first use and shared by all request threads"""
+    global _llm_service
+    if _llm_service is None:
+        with _llm_service_lock:
+            if _llm_service is None:
+                _llm_service = GroqLLMService()
+    return _llm_service
+
+class ParseAborted(Exception):
+    """The LLM call could not complete; ``args[0]`` is the user-facing error message"""
 
 class GroqLLMService(BaseService):
     """Enhanced service for Groq LLM integration to parse generalized natural language workflows"""
     
-    def __init__(self, api_key: str = None, model: str = "compound-beta"):
+    def __init__(self, api_key: str = None, model: str = "compound-beta", json_mode: bool = None,
+                 backend: LLMBackend = None):
         super().__init__("GroqLLMService", failure_rate=0.1)
         self.api_key = api_key or os.getenv("GROQ_API_KEY_PROD4")
         self.model = model or os.getenv("GROQ_MODEL", "compound-beta")
+        # Groq's JSON mode cannot be combined with streaming, so it is opt-in
+        if json_mode is None:
+            json_mode = os.getenv("GROQ_JSON_MODE", "").lower() in ("1", "true", "yes")
+        self.json_mode = json_mode
         
-        if not self.api_key:
-            raise ValueError("Groq API key is required")
-            
-        self.client = Groq(api_key=self.api_key)
+        # Groq by default; LLM_BACKEND selects an OpenAI-compatible server or replay
+        self.backend = backend or create_llm_backend(api_key=self.api_key)
+        
+        # Requests over quota queue for up to queue_timeout seconds instead of failing
+        self.admission = get_admission_controller(self.backend.name)
+        self.queue_timeout = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
         
-    def execute(self, user_input: str, **kwargs) -> ServiceResult:
-        """Parse natural language input into workflow configuration for any domain"""
-        self._log_operation("PARSE_WORKFLOW", True, f"Input: {user_input[:100]}...")
+        # Simple inputs go to a smaller, faster model (see model_router.py)
+        self.router = get_model_router(self.model)
+        
+    def execute(self, user_input: str, on_field: Callable[[str, Any], None] = None, **kwargs) -> ServiceResult:
+        """Parse natural language input into workflow configuration for any domain.
+
+        ``on_field(name, value)`` is called for each top-level config field as soon
+        as it has been streamed, before the rest of the response has arrived.
+        """
+        self._log_operation("PARSE_WORKFLOW", True, "Input: %s...", user_input[:100])
         
         # Simulate failure
         if self._simulate_failure():
@@ -147,64 +227,42 @@ class GroqLLMService(BaseService):
 
             user_prompt = f"User Input: \"{user_input}\"\n\nGenerate the workflow configuration JSON:"
 
-            # Call Groq API with connection error handling
+            # Route by input complexity; small-model output that is not valid
+            # JSON or fails schema validation, or a failed small-model call, is
+            # escalated to the large model
+            route = self.router.route(user_input)
+            deadline = time.monotonic() + self.queue_timeout
+            timings = {"queue_wait": 0.0, "llm": 0.0, "attempts": 0}
             try:
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    temperature=0.3,
-                    max_tokens=1200
-                )
-            except Exception as api_error:
-                # Handle connection/API errors specifically
-                error_msg = str(api_error)
-                if "connection" in error_msg.lower() or "timeout" in error_msg.lower():
-                    self._log_operation("PARSE_WORKFLOW", False, "Error: Connection error.")
-                    return ServiceResult(
-                        success=False,
-                        error_message="Connection error."
-                    )
+                model_used = route.model
+                if not route.escalates:
+                    parser = self._complete_workflow(route.model, system_prompt, user_prompt, on_field, deadline, timings)
                 else:
-                    raise  # Re-raise other API errors
-            
-            # Parse the response
-            llm_response = response.choices[0].message.content.strip()
-            
-            # Try to parse as JSON
-            try:
-                workflow_config = json.loads(llm_response)
-            except json.JSONDecodeError:
-                # If not valid JSON, try to extract JSON from the response
-                import re
-                
-                # First try to extract from markdown code blocks
-                markdown_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', llm_response, re.DOTALL)
-                if markdown_match:
+                    # small-model fields reach on_field only once the whole response has been validated
                     try:
-                        workflow_config = json.loads(markdown_match.group(1))
-                    except json.JSONDecodeError:
-                        # If markdown extraction fails, try general JSON pattern
-                        json_match = re.search(r'\{.*\}', llm_response, re.DOTALL)
-                        if json_match:
-                            try:
-                                workflow_config = json.loads(json_match.group())
-                            except json.JSONDecodeError:
-                                raise ValueError(f"Could not parse JSON from LLM response. Response was: {llm_response[:500]}...")
-                        else:
-                            raise ValueError(f"No JSON found in LLM response. Response was: {llm_response[:500]}...")
-                else:
-                    # Try general JSON pattern
-                    json_match = re.search(r'\{.*\}', llm_response, re.DOTALL)
-                    if json_match:
-                        try:
-                            workflow_config = json.loads(json_match.group())
-                        except json.JSONDecodeError:
-                            raise ValueError(f"Could not parse JSON from LLM response. Response was: {llm_response[:500]}...")
-                    else:
-                        raise ValueError(f"No JSON found in LLM response. Response was: {llm_response[:500]}...")
+                        parser = self._complete_workflow(route.model, system_prompt, user_prompt, None, deadline, timings)
+                        problems = validate_workflow_config(parser.close()) if parser.complete else ["truncated response"]
+                    except (ValueError, LLMBackendError) as e:
+                        problems = [str(e)]
+                    if not problems and on_field is not None:
+                        callback = self._field_callback(on_field)
+                        for name, value in parser.close().items():
+                            callback(name, value)
+                    if problems:
+                        self._log_operation("PARSE_WORKFLOW", False, "%s output rejected (%s), escalating", route.model, '; '.join(problems[:3]))
+                        self.router.record_escalation()
+                        parser = self._complete_workflow(self.router.large_model, system_prompt, user_prompt, on_field, deadline, timings)
+                        model_used = self.router.large_model
+            except ParseAborted as e:
+                return ServiceResult(
+                    success=False,
+                    error_message=str(e)
+                )
+            
+            llm_response = parser.text.strip()
+            workflow_config = parser.close()
+            if not parser.complete:
+                self._log_operation("PARSE_WORKFLOW", False, "Truncated JSON response, recovered %s fields", len(workflow_config))
             
             # Validate and set defaults for required fields
             required_fields = {
@@ -320,20 +378,123 @@ class GroqLLMService(BaseService):
                     "llm_response": llm_response,
                     "domain_detected": workflow_config.get('domain', 'general'),
                     "workflow_type": workflow_config.get('workflow_type', 'general_workflow'),
-                    "parsed_successfully": True
+                    "parsed_successfully": True,
+                    "parsed_complete": parser.complete,
+                    "model": model_used,
+                    "routing": {
+                        "tier": route.tier,
+                        "complexity_score": route.score,
+                        "escalated": model_used != route.model
+                    },
+                    "timings": {
+                        "queue_wait_ms": round(timings["queue_wait"] * 1000, 1),
+                        "llm_ms": round(timings["llm"] * 1000, 1),
+                        "attempts": timings["attempts"]
+                    }
                 }
             )
             
         except Exception as e:
-            self._log_operation("PARSE_WORKFLOW", False, f"Error: {str(e)}")
+            self._log_operation("PARSE_WORKFLOW", False, "Error: %s", e)
             return ServiceResult(
                 success=False,
                 error_message=f"Failed to parse workflow: {str(e)}"
             )
     
+    def _complete_workflow(self, model: str, system_prompt: str, user_prompt: str,
+                           on_field: Optional[Callable[[str, Any], None]], deadline: float,
+                           timings: Dict[str, float]) -> IncrementalJSONParser:
+        """Stream one completion from ``model`` into an incremental parser.
+
+        Fields are handed to ``on_field`` as soon as the model emits them. Calls
+        wait in the shared admission queue, and 429s back off and retry until
+        ``deadline``. Queue wait and LLM time are accumulated into ``timings``.
+        Raises ``ParseAborted`` when no completion can be obtained.
+        """
+        attempts = 0
+        while True:
+            attempts += 1
+            timings["attempts"] += 1
+            parser = IncrementalJSONParser(on_field=self._field_callback(on_field))
+            try:
+                with self.admission.admit(deadline) as ticket, \
+                        span("llm.completion", {'llm.backend': self.backend.name, 'llm.model': model,
+                                                'llm.attempt': attempts}, kind='client') as llm_span:
+                    timings["queue_wait"] += ticket.queue_wait
+                    llm_span.set_attribute('llm.queue_wait_ms', round(ticket.queue_wait * 1000, 1))
+                    try:
+                        for delta in self._stream_completion(system_prompt, user_prompt, model):
+                            parser.feed(delta)
+                    except LLMRateLimitError:
+                        ticket.overloaded = True
+                        raise
+                    finally:
+                        latency = time.monotonic() - ticket.started
+                        timings["llm"] += latency
+                        self.router.record_call(model, latency, len(system_prompt) + len(user_prompt),
+                                                len(parser.text), parser.complete)
+                        llm_span.set_attribute('llm.response_chars', len(parser.text))
+                return parser
+            except LLMRateLimitError as e:
+                backoff = e.retry_after or min(8.0, 0.5 * 2 ** (attempts - 1))
+                if time.monotonic() + backoff >= deadline:
+                    self._log_operation("PARSE_WORKFLOW", False, "Rate limited after %s attempts", attempts)
+                    raise ParseAborted("Groq LLM service rate limit exceeded, please retry shortly")
+                self._log_operation("PARSE_WORKFLOW", False, "Rate limited, retrying in %.1fs", backoff)
+                self.metrics.retries.inc()
+                time.sleep(backoff)
+            except RateLimitTimeout as e:
+                self._log_operation("PARSE_WORKFLOW", False, "Error: %s", e)
+                raise ParseAborted("Groq LLM service is busy, please retry shortly")
+            except Exception as api_error:
+                # Handle connection/API errors specifically
+                error_msg = str(api_error)
+                if "connection" in error_msg.lower() or "timeout" in error_msg.lower():
+                    self._log_operation("PARSE_WORKFLOW", False, "Error: Connection error.")
+                    raise ParseAborted("Connection error.")
+                else:
+                    raise  # Re-raise other API errors
+    
+    def _stream_completion(self, system_prompt: str, user_prompt: str, model: str = None) -> Iterator[str]:
+        """Yield the workflow completion as text deltas"""
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+        
+        if self.json_mode:
+            yield self.backend.complete(
+                messages,
+                model=model or self.model,
+                temperature=0.3,
+                max_tokens=1200,
+                response_format={"type": "json_object"}
+            )
+            return
+        
+        yield from self.backend.stream(
+            messages,
+            model=model or self.model,
+            temperature=0.3,
+            max_tokens=1200
+        )
+    
+    def _field_callback(self, on_field: Optional[Callable[[str, Any], None]]) -> Optional[Callable[[str, Any], None]]:
+        """Wrap a caller's field callback so its errors cannot abort the parse"""
+        if on_field is None:
+            return None
+        
+        def callback(name: str, value: Any) -> None:
+            try:
+                on_field(name, value)
+            except Exception as e:
+                self._log_operation("FIELD_CALLBACK", False, "%s: %s", name, e)
+        
+        return callback
+    
     def generate_workflow_suggestions(self, partial_input: str, **kwargs) -> ServiceResult:
         """Generate workflow suggestions based on partial input across multiple domains"""
-        self._log_operation("GENERATE_SUGGESTIONS", True, f"Partial input: {partial_input}")
+        self._log_operation("GENERATE_SUGGESTIONS", True, "Partial input: %s", partial_input)
         
         try:
             system_prompt = """Generate 4-6 diverse workflow suggestions based on the partial user input. 
@@ -350,17 +511,15 @@ Return as a JSON array of strings."""
             
             user_prompt = f"Partial input: \"{partial_input}\"\n\nGenerate diverse workflow suggestions:"
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
+            suggestions_text = self.backend.complete(
+                [
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
+                model=self.model,
                 temperature=0.7,
                 max_tokens=600
-            )
-            
-            suggestions_text = response.choices[0].message.content.strip()
+            ).strip()
             
             try:
                 suggestions = json.loads(suggestions_text)
@@ -402,17 +561,15 @@ Return a JSON object with:
     "suggested_workflow_type": "recommended workflow type"
 }"""
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
+            analysis_text = self.backend.complete(
+                [
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_input}
                 ],
+                model=self.model,
                 temperature=0.2,
                 max_tokens=300
-            )
-            
-            analysis_text = response.choices[0].message.content.strip()
+            ).strip()
             analysis = json.loads(analysis_text)
             
             return ServiceResult(
@@ -0,0 +1,122 @@
+"""
+Fast JSON serialization for API responses.
+
+``FastJSONProvider`` replaces Flask's default provider. It serializes with
+``orjson`` when the package is installed and with compact stdlib ``json``
+otherwise, writes bytes straight into the response, and gzips bodies larger
+than ``JSON_GZIP_MIN_BYTES`` for clients that accept it.
+
+``orjson`` is optional and not listed in ``requirements.txt``
+(``pip install orjson``). Both serializers turn objects with a ``__json__``
+method, such as ``ServiceResult``, into JSON through that method, so responses
+are the same whichever one is used.
+
+Configuration (environment):
+
+- ``JSON_SERIALIZER``      ``auto`` (default), ``orjson`` or ``stdlib``
+- ``JSON_GZIP_MIN_BYTES``  compress bodies at least this large (default 8192, 0 disables)
+- ``JSON_GZIP_LEVEL``      gzip level 1-9 (default 6)
+"""
+
+import gzip
+import json
+import os
+from dataclasses import replace
+from typing import Any, Dict, Iterable
+
+from flask import has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Inputs the services echo back in their results; left out in compact mode
+ECHOED_FIELDS = ('items',)
+
+
+def _accepts_gzip() -> bool:
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        token, _, params = part.strip().partition(';')
+        if token.strip().lower() in ('gzip', '*'):
+            return params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, with optional gzip of large bodies"""
+
+    sort_keys = False
+    ensure_ascii = False
+
+    def __init__(self, app):
+        super().__init__(app)
+        serializer = os.getenv("JSON_SERIALIZER", "auto").lower()
+        if serializer == "orjson" and orjson is None:
+            raise ImportError("JSON_SERIALIZER=orjson but the orjson package is not installed")
+        self.use_orjson = orjson is not None and serializer != "stdlib"
+        self.gzip_min_bytes = int(os.getenv("JSON_GZIP_MIN_BYTES", "8192"))
+        self.gzip_level = int(os.getenv("JSON_GZIP_LEVEL", "6"))
+
+    @property
+    def serializer(self) -> str:
+        return "orjson" if self.use_orjson else "stdlib"
+
+    @staticmethod
+    def default(o: Any) -> Any:
+        """Objects with a ``__json__`` method (e.g. ``ServiceResult``) serialize through it"""
+        to_json = getattr(o, '__json__', None)
+        if to_json is not None:
+            return to_json()
+        return DefaultJSONProvider.default(o)
+
+    def dumps_bytes(self, obj: Any) -> bytes:
+        """Serialize ``obj`` to UTF-8 JSON bytes"""
+        if self.use_orjson:
+            # dataclasses go through default() and so __json__, instead of orjson's field walk
+            options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATACLASS
+            if self.sort_keys:
+                options |= orjson.OPT_SORT_KEYS
+            # orjson handles datetime and UUID natively; the rest goes through default()
+            return orjson.dumps(obj, default=self.default, option=options)
+        return json.dumps(obj, default=self.default, ensure_ascii=self.ensure_ascii,
+                          sort_keys=self.sort_keys, separators=(',', ':')).encode('utf-8')
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode('utf-8')
+
+    def response(self, *args: Any, **kwargs: Any):
+        body = self.dumps_bytes(self._prepare_response_obj(args, kwargs))
+        response = self._app.response_class(body, mimetype=self.mimetype)
+        if self.gzip_min_bytes and len(body) >= self.gzip_min_bytes and has_request_context():
+            response.vary.add('Accept-Encoding')
+            if _accepts_gzip():
+                response.set_data(gzip.compress(body, compresslevel=self.gzip_level, mtime=0))
+                response.headers['Content-Encoding'] = 'gzip'
+        return response
+
+
+def wants_compact(data: Dict[str, Any] = None) -> bool:
+    """Compact responses are requested with ``?compact=1`` or ``"compact": true`` in the body"""
+    if request.args.get('compact', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return bool(data and data.get('compact') is True)
+
+
+def compact_results(results: Dict[str, Any], fields: Iterable[str] = ECHOED_FIELDS) -> Dict[str, Any]:
+    """Copy of per-service ``results`` without echoed input fields.
+
+    Results whose data holds an echoed field are replaced by a copy with
+    filtered data; the originals are never modified, since services may keep
+    references to their data (e.g. the order store).
+    """
+    compact = {}
+    for name, result in results.items():
+        data = result.data
+        if isinstance(data, dict) and any(field in data for field in fields):
+            result = replace(result, data={key: value for key, value in data.items() if key not in fields})
+        compact[name] = result
+    return compact
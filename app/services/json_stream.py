@@ -0,0 +1,167 @@
+"""
+Incremental JSON parsing for streamed LLM completions.
+
+The parser is fed completion deltas as they arrive and decodes each top-level
+field of the JSON object the moment its value is closed, so callers can act on
+``domain``, ``currency`` or ``items`` before the model has finished writing the
+rest of the configuration.
+"""
+
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+# Characters that change the parser state; everything else is skipped in bulk.
+_STRUCTURAL = re.compile(r'[{}\[\]",:]')
+# Characters that matter inside a string
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+FieldCallback = Callable[[str, Any], None]
+
+
+class IncrementalJSONParser:
+    """Streaming parser for a single top-level JSON object.
+
+    Text before the opening brace (prose, a markdown fence) and after the
+    closing brace is ignored. Only the new chunk is scanned on each feed: the
+    scanner's state (nesting depth, inside a string, after a backslash) is kept
+    between chunks, so every character is looked at exactly once. The text of
+    the key or value being read is collected piece by piece and decoded once
+    it closes; chunks are only joined when ``text`` is read.
+    """
+
+    def __init__(self, on_field: Optional[FieldCallback] = None):
+        self.on_field = on_field
+        self.fields: Dict[str, Any] = {}
+        self.complete = False
+        self._chunks: List[str] = []
+        self._started = False
+        self._depth = 0
+        self._expect = "key"  # key -> colon -> value -> key ...
+        self._key: Optional[str] = None
+        self._in_string = False
+        self._escaped = False  # the last character read was a backslash inside a string
+        self._capturing = False  # reading a top-level key or value
+        self._pending: List[str] = []  # its text from earlier chunks
+
+    @property
+    def text(self) -> str:
+        """Raw text received so far"""
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
+
+    def feed(self, chunk: str) -> None:
+        """Consume the next piece of the completion"""
+        if not chunk:
+            return
+        self._chunks.append(chunk)
+        if not self.complete:
+            self._scan(chunk)
+
+    def close(self) -> Dict[str, Any]:
+        """Finish the stream and return the decoded fields.
+
+        Raises ``ValueError`` when no field could be decoded at all. A stream
+        that stops mid-object (e.g. truncated by ``max_tokens``) still returns
+        the fields that were completed; check ``complete`` to tell the two apart.
+        """
+        if not self._started:
+            raise ValueError(f"No JSON found in LLM response. Response was: {self.text[:500]}...")
+        if not self.complete and not self.fields:
+            raise ValueError(f"Could not parse JSON from LLM response. Response was: {self.text[:500]}...")
+        return self.fields
+
+    def _scan(self, chunk: str) -> None:
+        pos = 0
+        if not self._started:
+            brace = chunk.find("{")
+            if brace < 0:
+                return
+            self._started = True
+            self._depth = 1
+            pos = brace + 1
+        start = 0 if self._capturing else -1  # where the captured key or value begins in this chunk
+
+        while True:
+            if self._in_string:
+                end = self._string_end(chunk, pos)
+                if end < 0:
+                    break
+                self._in_string = False
+                pos = end + 1
+                if self._depth == 1 and self._expect == "key":
+                    self._key = json.loads(self._captured(chunk, start, pos))
+                    self._expect = "colon"
+                    start = -1
+                continue
+
+            match = _STRUCTURAL.search(chunk, pos)
+            if match is None:
+                break
+            pos = match.start()
+            char = chunk[pos]
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expect == "key":
+                    self._capturing, start = True, pos
+            elif self._depth == 1:
+                if char == ":" and self._expect == "colon":
+                    self._expect = "value"
+                    self._capturing, start = True, pos + 1
+                elif char == "," and self._expect == "value":
+                    self._emit(self._captured(chunk, start, pos))
+                    start = -1
+                elif char == "}":
+                    if self._expect == "value":
+                        self._emit(self._captured(chunk, start, pos))
+                    self._depth = 0
+                    self.complete = True
+                    return
+                elif char in "{[":
+                    self._depth += 1
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+            pos += 1
+
+        if self._capturing:
+            self._pending.append(chunk[start:])
+
+    def _string_end(self, chunk: str, pos: int) -> int:
+        """Index of the closing quote of the string being read, or -1 if it goes on past ``chunk``"""
+        while pos < len(chunk):
+            if self._escaped:
+                self._escaped = False
+                pos += 1
+                continue
+            match = _STRING_SPECIAL.search(chunk, pos)
+            if match is None:
+                return -1
+            if match.group() == '"':
+                return match.start()
+            self._escaped = True
+            pos = match.start() + 1
+        return -1
+
+    def _captured(self, chunk: str, start: int, end: int) -> str:
+        """The captured key or value, ending at ``end`` in ``chunk``"""
+        text = "".join(self._pending) + chunk[start:end]
+        self._pending.clear()
+        self._capturing = False
+        return text
+
+    def _emit(self, raw_value: str) -> None:
+        key = self._key
+        try:
+            value = json.loads(raw_value)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid value for field '{key}' in LLM response: {raw_value[:200]!r}") from e
+
+        self.fields[key] = value
+        self._key = None
+        self._expect = "key"
+        if self.on_field is not None:
+            self.on_field(key, value)
@@ -0,0 +1,276 @@
+"""
+LLM backends used by GroqLLMService.
+
+The service talks to an ``LLMBackend`` rather than to a specific SDK:
+
+- ``GroqBackend``              the hosted Groq API (default)
+- ``OpenAICompatibleBackend``  any ``/v1/chat/completions`` server, e.g. llama.cpp,
+                               vLLM or the offline stand-in in ``llm_stub.py``
+- ``ReplayBackend``            deterministic replay of recorded responses
+- ``RecordingBackend``         wraps another backend and records its responses
+
+The backend is selected with ``LLM_BACKEND`` (``groq``, ``openai``, ``replay``);
+see ``create_llm_backend``.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    from .tracing import inject_headers
+except ImportError:
+    from tracing import inject_headers
+
+Messages = List[Dict[str, str]]
+
+
+class LLMBackendError(Exception):
+    """Raised when a backend cannot produce a completion"""
+
+
+class LLMRateLimitError(LLMBackendError):
+    """Raised when the provider throttled the request (HTTP 429)"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _retry_after(headers) -> Optional[float]:
+    try:
+        return float(headers.get('retry-after')) if headers is not None and headers.get('retry-after') else None
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMBackend(ABC):
+    """Chat-completion backend"""
+
+    name = "base"
+
+    @abstractmethod
+    def complete(self, messages: Messages, model: str, temperature: float = 0.3,
+                 max_tokens: int = 1200, **options) -> str:
+        """Return the full completion text"""
+        pass
+
+    def stream(self, messages: Messages, model: str, temperature: float = 0.3,
+               max_tokens: int = 1200, **options) -> Iterator[str]:
+        """Yield the completion as text deltas (non-streaming backends yield once)"""
+        yield self.complete(messages, model, temperature, max_tokens, **options)
+
+
+class GroqBackend(LLMBackend):
+    """Hosted Groq API through the ``groq`` SDK"""
+
+    name = "groq"
+
+    def __init__(self, api_key: str = None):
+        self.api_key = api_key or os.getenv("GROQ_API_KEY_PROD4")
+        if not self.api_key:
+            raise ValueError("Groq API key is required")
+
+        import groq
+        self._rate_limit_error = groq.RateLimitError
+        self.client = groq.Groq(api_key=self.api_key)
+
+    def _create(self, **kwargs):
+        headers = inject_headers({})
+        if headers:
+            kwargs['extra_headers'] = headers
+        try:
+            return self.client.chat.completions.create(**kwargs)
+        except self._rate_limit_error as e:
+            raise LLMRateLimitError(str(e), _retry_after(getattr(e.response, 'headers', None))) from e
+
+    def complete(self, messages: Messages, model: str, temperature: float = 0.3,
+                 max_tokens: int = 1200, **options) -> str:
+        response = self._create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **options
+        )
+        return response.choices[0].message.content or ""
+
+    def stream(self, messages: Messages, model: str, temperature: float = 0.3,
+               max_tokens: int = 1200, **options) -> Iterator[str]:
+        stream = self._create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            **options
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """Plain HTTP client for OpenAI-compatible ``/chat/completions`` servers"""
+
+    name = "openai"
+
+    def __init__(self, base_url: str = None, api_key: str = None, timeout: float = 60.0):
+        self.base_url = (base_url or os.getenv("LLM_BASE_URL", "http://localhost:8001/v1")).rstrip("/")
+        self.api_key = api_key or os.getenv("LLM_API_KEY", "")
+        self.timeout = timeout
+
+        import requests
+        self._requests = requests
+        self.session = requests.Session()
+
+    def _post(self, payload: Dict[str, Any], stream: bool):
+        headers = inject_headers({'Content-Type': 'application/json'})
+        if self.api_key:
+            headers['Authorization'] = f"Bearer {self.api_key}"
+        try:
+            response = self.session.post(
+                f"{self.base_url}/chat/completions",
+                json=payload,
+                headers=headers,
+                timeout=self.timeout,
+                stream=stream
+            )
+        except self._requests.exceptions.RequestException as e:
+            raise LLMBackendError(f"Connection error: {str(e)}") from e
+        if response.status_code == 429:
+            raise LLMRateLimitError("LLM server rate limit exceeded", _retry_after(response.headers))
+        if response.status_code >= 400:
+            raise LLMBackendError(f"LLM server returned HTTP {response.status_code}: {response.text[:200]}")
+        return response
+
+    def complete(self, messages: Messages, model: str, temperature: float = 0.3,
+                 max_tokens: int = 1200, **options) -> str:
+        payload = {'model': model, 'messages': messages, 'temperature': temperature,
+                   'max_tokens': max_tokens, **options}
+        data = self._post(payload, stream=False).json()
+        return data['choices'][0]['message'].get('content') or ""
+
+    def stream(self, messages: Messages, model: str, temperature: float = 0.3,
+               max_tokens: int = 1200, **options) -> Iterator[str]:
+        payload = {'model': model, 'messages': messages, 'temperature': temperature,
+                   'max_tokens': max_tokens, 'stream': True, **options}
+        response = self._post(payload, stream=True)
+        with response:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get('choices') or []
+                if choices:
+                    content = (choices[0].get('delta') or {}).get('content')
+                    if content:
+                        yield content
+
+
+def recording_key(messages: Messages) -> str:
+    """Stable key for a conversation, independent of model and sampling options"""
+    canonical = json.dumps(messages, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ReplayBackend(LLMBackend):
+    """Serves recorded responses from a JSONL file.
+
+    Each line is ``{"key": ..., "response": ...}`` as written by
+    ``RecordingBackend``. On a miss the backend either raises (``strict``) or
+    falls back to the deterministic stand-in model from ``llm_stub``, so full
+    workflow runs are reproducible without network access.
+    """
+
+    name = "replay"
+
+    def __init__(self, path: str = None, strict: bool = None, chunk_size: int = 64):
+        self.path = path or os.getenv("LLM_REPLAY_FILE")
+        if strict is None:
+            strict = os.getenv("LLM_REPLAY_STRICT", "").lower() in ("1", "true", "yes")
+        self.strict = strict
+        self.chunk_size = chunk_size
+        self.responses: Dict[str, str] = {}
+        if self.path and os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.responses[record['key']] = record['response']
+
+    def complete(self, messages: Messages, model: str, temperature: float = 0.3,
+                 max_tokens: int = 1200, **options) -> str:
+        response = self.responses.get(recording_key(messages))
+        if response is not None:
+            return response
+        if self.strict:
+            raise LLMBackendError("No recorded response for this prompt")
+
+        try:
+            from .llm_stub import synthesize_completion
+        except ImportError:
+            from llm_stub import synthesize_completion
+        return synthesize_completion(messages)
+
+    def stream(self, messages: Messages, model: str, temperature: float = 0.3,
+               max_tokens: int = 1200, **options) -> Iterator[str]:
+        response = self.complete(messages, model, temperature, max_tokens, **options)
+        for i in range(0, len(response), self.chunk_size):
+            yield response[i:i + self.chunk_size]
+
+
+class RecordingBackend(LLMBackend):
+    """Records every completion of the wrapped backend for later replay"""
+
+    def __init__(self, backend: LLMBackend, path: str):
+        self.backend = backend
+        self.path = path
+        self.name = f"recording:{backend.name}"
+        self._lock = threading.Lock()
+
+    def _record(self, messages: Messages, model: str, response: str):
+        line = json.dumps({'key': recording_key(messages), 'model': model, 'response': response}, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+
+    def complete(self, messages: Messages, model: str, temperature: float = 0.3,
+                 max_tokens: int = 1200, **options) -> str:
+        response = self.backend.complete(messages, model, temperature, max_tokens, **options)
+        self._record(messages, model, response)
+        return response
+
+    def stream(self, messages: Messages, model: str, temperature: float = 0.3,
+               max_tokens: int = 1200, **options) -> Iterator[str]:
+        parts = []
+        for delta in self.backend.stream(messages, model, temperature, max_tokens, **options):
+            parts.append(delta)
+            yield delta
+        self._record(messages, model, "".join(parts))
+
+
+def create_llm_backend(name: Optional[str] = None, api_key: str = None) -> LLMBackend:
+    """Build the backend selected by ``name`` or the ``LLM_BACKEND`` env var.
+
+    ``LLM_RECORD_FILE`` wraps the backend in a ``RecordingBackend``.
+    """
+    name = (name or os.getenv("LLM_BACKEND", "groq")).lower()
+    if name == "groq":
+        backend = GroqBackend(api_key=api_key)
+    elif name in ("openai", "http"):
+        backend = OpenAICompatibleBackend()
+    elif name == "replay":
+        backend = ReplayBackend()
+    else:
+        raise ValueError(f"Unknown LLM backend: {name}")
+
+    record_file = os.getenv("LLM_RECORD_FILE")
+    if record_file:
+        backend = RecordingBackend(backend, record_file)
+    return backend
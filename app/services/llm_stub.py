@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Offline stand-in for the LLM.
+
+``synthesize_completion`` derives a deterministic response from the prompt with
+keyword heuristics, shaped like the real model's output. The same logic is
+served over an OpenAI-compatible HTTP API so the orchestrator can be load-tested
+without API quota:
+
+    python app/services/llm_stub.py --port 8001 --latency-ms 300
+    LLM_BACKEND=openai LLM_BASE_URL=http://localhost:8001/v1 python start.py
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+try:
+    from .prefetch import extract_hints
+except ImportError:
+    from prefetch import extract_hints
+
+CURRENCY_COUNTRIES = {'USD': 'US', 'EUR': 'EU', 'GBP': 'UK', 'JPY': 'JP', 'CAD': 'CA',
+                      'AUD': 'AU', 'CHF': 'CH', 'CNY': 'CN', 'INR': 'IN'}
+
+# keyword -> (domain, workflow_type, item name, category, unit price)
+DOMAIN_KEYWORDS = [
+    (('flight', 'fly', 'airline'), ('travel', 'travel_booking', 'Flight Ticket', 'flight', 650.0)),
+    (('hotel', 'room', 'stay', 'trip'), ('travel', 'travel_booking', 'Hotel Room', 'hotel', 220.0)),
+    (('laptop', 'computer', 'monitor', 'phone'), ('ecommerce', 'product_order', 'Laptop', 'product', 1200.0)),
+    (('license', 'software', 'saas'), ('software', 'subscription', 'Software License', 'subscription', 300.0)),
+    (('doctor', 'appointment', 'checkup', 'dentist'), ('healthcare', 'appointment', 'Medical Consultation', 'service', 150.0)),
+    (('conference', 'meeting', 'catering', 'event'), ('events', 'service_request', 'Event Package', 'service', 2500.0)),
+    (('restaurant', 'dinner', 'lunch'), ('food', 'service_request', 'Restaurant Reservation', 'service', 90.0)),
+]
+
+EMAIL_RE = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+')
+
+CORPORATE_WORDS = ('corporate', 'company', 'office', 'team', 'business', 'enterprise', 'employees', 'department')
+
+DOMAIN_STEPS = {
+    'travel': ["Review Request", "Book Travel", "Process Payment", "Confirm Booking", "Send Confirmation"],
+    'ecommerce': ["Review Request", "Create Order", "Process Payment", "Arrange Shipping", "Send Confirmation"],
+}
+DEFAULT_STEPS = ["Review Request", "Schedule Service", "Process Payment", "Confirm Appointment", "Send Details"]
+
+
+def _user_input(messages: List[Dict[str, str]]) -> str:
+    """Recover the raw user input from the last user message"""
+    content = next((m['content'] for m in reversed(messages) if m.get('role') == 'user'), '')
+    match = re.search(r'(?:User Input|Partial input): "(.*)"', content, re.DOTALL)
+    return match.group(1) if match else content
+
+
+def synthesize_workflow_config(user_input: str) -> Dict[str, Any]:
+    """Deterministic workflow configuration for ``user_input``"""
+    text = user_input.lower()
+    domain, workflow_type, item_name, category, price = ('general', 'service_request', 'General Service', 'service', 100.0)
+    for keywords, spec in DOMAIN_KEYWORDS:
+        if any(word in text for word in keywords):
+            domain, workflow_type, item_name, category, price = spec
+            break
+
+    hints = extract_hints(user_input)
+    quantity = hints.quantities[0][0] if hints.quantities else 1
+    currency = hints.currencies[0] if hints.currencies else 'USD'
+    payment_currency = hints.payment_currencies[0] if hints.payment_currencies else (
+        hints.currencies[1] if len(hints.currencies) > 1 else currency)
+    corporate = any(word in text for word in CORPORATE_WORDS)
+    digest = hashlib.sha256(user_input.encode('utf-8')).hexdigest()[:8].upper()
+    email = EMAIL_RE.search(user_input)
+
+    total = round(price * quantity, 2)
+    return {
+        'workflow_type': workflow_type,
+        'domain': domain,
+        'workflow_steps': DOMAIN_STEPS.get(domain, DEFAULT_STEPS),
+        'customer_id': f"{'CORP' if corporate else 'CUST'}-{digest}",
+        'customer_email': email.group(0) if email else 'customer@example.com',
+        'customer_phone': '+1234567890',
+        'customer_address': '123 Default St, City, State',
+        'channel': 'Corporate' if corporate else 'B2C',
+        'items': [{
+            'name': item_name,
+            'category': category,
+            'price': price,
+            'quantity': quantity,
+            'duration': 'N/A',
+            'specifications': 'Standard specifications'
+        }],
+        'currency': currency,
+        'target_currency': payment_currency,
+        'payment_method': 'wallet' if corporate else 'credit_card',
+        'payment_country': CURRENCY_COUNTRIES.get(payment_currency, 'US'),
+        'cross_border_transaction': currency != payment_currency,
+        'original_amount': total,
+        'converted_amount': total,
+        'booking_type': 'enterprise' if corporate else 'standard',
+        'service_level': 'standard',
+        'shipping_method': 'standard' if domain == 'ecommerce' else 'digital',
+        'delivery_timeline': '1-3 days',
+        'special_requirements': 'None'
+    }
+
+
+def synthesize_completion(messages: List[Dict[str, str]]) -> str:
+    """Deterministic completion text for a GroqLLMService prompt"""
+    system_prompt = next((m['content'] for m in messages if m.get('role') == 'system'), '')
+    user_input = _user_input(messages)
+
+    if 'workflow suggestions' in system_prompt:
+        return json.dumps([
+            f"{user_input} for the business travel team",
+            f"{user_input} with express delivery",
+            f"{user_input} paid by corporate wallet",
+            f"{user_input} for an individual customer"
+        ])
+    if 'business domain' in system_prompt:
+        config = synthesize_workflow_config(user_input)
+        return json.dumps({
+            'domain': config['domain'],
+            'confidence': 'medium',
+            'keywords': sorted(set(re.findall(r'[a-z]{4,}', user_input.lower())))[:5],
+            'suggested_workflow_type': config['workflow_type']
+        })
+    return json.dumps(synthesize_workflow_config(user_input), indent=2)
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible ``/v1/chat/completions`` endpoint"""
+
+    latency_seconds = 0.0
+    chunk_size = 48
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        content = synthesize_completion(request.get('messages', []))
+        model = request.get('model', 'stub')
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+
+        if request.get('stream'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.end_headers()
+            for i in range(0, len(content), self.chunk_size):
+                event = {'model': model, 'choices': [{'index': 0, 'delta': {'content': content[i:i + self.chunk_size]}}]}
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+            self.wfile.write(b"data: [DONE]\n\n")
+            return
+
+        body = json.dumps({
+            'model': model,
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': len(content) // 4}
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def create_server(host: str = '127.0.0.1', port: int = 8001, latency_ms: float = 0.0) -> ThreadingHTTPServer:
+    """Build (but do not start) the stub server"""
+    handler = type('ConfiguredStubLLMHandler', (StubLLMHandler,), {'latency_seconds': latency_ms / 1000.0})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline OpenAI-compatible LLM stand-in")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Artificial latency per completion')
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, args.latency_ms)
+    print(f"Stub LLM server listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,388 @@
+"""
+In-process Prometheus metrics.
+
+A small registry of counters, gauges and histograms rendered in the Prometheus
+text exposition format by ``GET /metrics``. Label children are resolved once
+and cached by the caller; observing takes no lock on the hot path.
+
+Every ``BaseService`` subclass is instrumented automatically (see
+``instrument_service``):
+
+- ``service_call_duration_seconds{service}``      histogram of ``execute`` latency
+- ``service_calls_total{service, outcome}``      ``success``, ``failure``, ``fallback`` or ``error``
+- ``service_retries_total{service}``             retries (retry endpoint, ``execute_with_retry``, LLM 429s)
+
+The Flask app adds workflow latency, in-flight runs and queue-depth gauges.
+With several worker processes each worker keeps its own values; Prometheus
+sees whichever worker answers the scrape.
+"""
+
+import bisect
+import functools
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# ``data['source']`` values that mean the service answered from a fallback path
+FALLBACK_SOURCES = frozenset({'fallback_rates'})
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _CounterChild:
+    __slots__ = ('_value', '_lock')
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class _GaugeChild:
+    __slots__ = ('_value', '_lock')
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self._value -= amount
+
+    def set(self, value: float):
+        self._value = value
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class _HistogramChild:
+    """Histogram buckets; observations are appended to a deque and folded in batches.
+
+    ``deque.append`` and ``popleft`` are atomic, so the hot path takes no lock;
+    folding happens at scrape time or once ``FOLD_THRESHOLD`` samples are pending.
+    """
+
+    __slots__ = ('_upper_bounds', '_counts', '_sum', '_pending', '_lock')
+
+    FOLD_THRESHOLD = 4096
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self._upper_bounds = upper_bounds
+        self._counts = [0] * (len(upper_bounds) + 1)
+        self._sum = 0.0
+        self._pending = deque()
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        pending = self._pending
+        pending.append(value)
+        if len(pending) >= self.FOLD_THRESHOLD:
+            self._fold()
+
+    def _fold(self):
+        with self._lock:
+            popleft = self._pending.popleft
+            batch = [popleft() for _ in range(len(self._pending))]
+            if batch:
+                self._add_sorted(sorted(batch))
+
+    def observe_many(self, values: List[float]):
+        """Add a batch of observations"""
+        with self._lock:
+            self._add_sorted(sorted(values))
+
+    def _add_sorted(self, values: List[float]):
+        # one bisect per bucket bound instead of one per value
+        previous = 0
+        for index, bound in enumerate(self._upper_bounds):
+            position = bisect.bisect_right(values, bound, previous)
+            self._counts[index] += position - previous
+            previous = position
+        self._counts[-1] += len(values) - previous
+        self._sum += math.fsum(values)
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        self._fold()
+        with self._lock:
+            return list(self._counts), self._sum
+
+
+class _Metric(ABC):
+    type_name = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), registry: 'Registry' = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    @abstractmethod
+    def _new_child(self):
+        """A child holding the value of one label combination"""
+
+    def labels(self, *values: str):
+        """Child for one label combination; cache it on hot paths"""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    @abstractmethod
+    def _samples(self) -> Iterable[str]:
+        """Exposition lines of every child"""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_label_text(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class Gauge(_Metric):
+    """Gauge set by the caller, or read from ``callback`` at scrape time"""
+
+    type_name = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 registry: 'Registry' = None, callback: Optional[Callable[[], float]] = None):
+        self.callback = callback
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def _samples(self):
+        if self.callback is not None:
+            try:
+                yield f"{self.name} {_format_value(float(self.callback()))}"
+            except Exception:
+                pass
+            return
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_label_text(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 registry: 'Registry' = None, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.upper_bounds = tuple(sorted(float(b) for b in buckets if b != math.inf))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.upper_bounds + (math.inf,), counts):
+                cumulative += count
+                labels = _label_text(self.labelnames, values, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _label_text(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._hooks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def before_render(self, hook: Callable[[], None]):
+        """Run ``hook`` before each render, e.g. to fold buffered samples"""
+        with self._lock:
+            self._hooks.append(hook)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            hooks = list(self._hooks)
+        for hook in hooks:
+            hook()
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+SERVICE_CALL_DURATION = Histogram('service_call_duration_seconds', 'Latency of service execute() calls', ['service'])
+SERVICE_CALLS = Counter('service_calls_total', 'Service calls by outcome (success, failure, fallback, error)',
+                        ['service', 'outcome'])
+SERVICE_RETRIES = Counter('service_retries_total', 'Service call retries', ['service'])
+
+
+class ServiceMetrics:
+    """Metrics of one service instance.
+
+    A call is recorded as one ``deque.append`` of its latency to the deque of
+    its outcome; the deques are folded into the latency histogram and outcome
+    counters at scrape time (or when one grows past the fold threshold).
+    """
+
+    __slots__ = ('duration', 'success', 'failure', 'fallback', 'error', 'retries',
+                 'success_pending', 'failure_pending', 'fallback_pending', '_fold_lock')
+
+    def __init__(self, service: str, registry: 'Registry' = None):
+        self.duration = SERVICE_CALL_DURATION.labels(service)
+        self.success = SERVICE_CALLS.labels(service, 'success')
+        self.failure = SERVICE_CALLS.labels(service, 'failure')
+        self.fallback = SERVICE_CALLS.labels(service, 'fallback')
+        self.error = SERVICE_CALLS.labels(service, 'error')
+        self.retries = SERVICE_RETRIES.labels(service)
+        self.success_pending = deque()
+        self.failure_pending = deque()
+        self.fallback_pending = deque()
+        self._fold_lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).before_render(self.fold)
+
+    def record(self, elapsed: float, result) -> None:
+        if not result.success:
+            pending = self.failure_pending
+        elif result.data and result.data.get('source') in FALLBACK_SOURCES:
+            pending = self.fallback_pending
+        else:
+            pending = self.success_pending
+        pending.append(elapsed)
+        if len(pending) >= _HistogramChild.FOLD_THRESHOLD:
+            self.fold()
+
+    def fold(self):
+        """Move pending latencies into the histogram and outcome counters"""
+        with self._fold_lock:
+            for pending, counter in ((self.success_pending, self.success),
+                                     (self.failure_pending, self.failure),
+                                     (self.fallback_pending, self.fallback)):
+                # popleft is atomic, so appends racing with the drain are kept for the next fold
+                popleft = pending.popleft
+                batch = [popleft() for _ in range(len(pending))]
+                if batch:
+                    self.duration.observe_many(batch)
+                    counter.inc(len(batch))
+
+
+def instrument_service(execute: Callable) -> Callable:
+    """Wrap a service's ``execute`` to record latency and outcome.
+
+    Raised exceptions count as ``error``. The instance must have a ``metrics``
+    attribute holding its ``ServiceMetrics``.
+    """
+    if getattr(execute, '__instrumented__', False):
+        return execute
+
+    perf_counter = time.perf_counter
+
+    @functools.wraps(execute)
+    def instrumented(self, *args, **kwargs):
+        started = perf_counter()
+        try:
+            result = execute(self, *args, **kwargs)
+        except BaseException:
+            self.metrics.duration.observe(perf_counter() - started)
+            self.metrics.error.inc()
+            raise
+        self.metrics.record(perf_counter() - started, result)
+        return result
+
+    instrumented.__instrumented__ = True
+    return instrumented
+
+
+def timed(histogram_child, in_flight: Optional[Gauge] = None) -> Callable:
+    """Decorator observing a function's latency, optionally tracking concurrent calls"""
+    def decorator(func: Callable) -> Callable:
+        perf_counter = time.perf_counter
+        gauge = in_flight.labels() if in_flight is not None else None
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if gauge is not None:
+                gauge.inc()
+            started = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram_child.observe(perf_counter() - started)
+                if gauge is not None:
+                    gauge.dec()
+        return wrapper
+    return decorator
@@ -0,0 +1,158 @@
+"""
+Complexity-based model routing for the workflow parse step.
+
+Simple inputs ("Order 2 laptops") go to a small, fast model; long inputs with
+many entities or cross-border / currency phrasing go to the large model. Output
+of the small model is validated by the caller and escalated to the large model
+when it does not satisfy the workflow config schema.
+"""
+
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+
+try:
+    from .prefetch import extract_hints
+except ImportError:
+    from prefetch import extract_hints
+
+# USD per million (input, output) tokens, used for cost estimates only
+MODEL_PRICING = {
+    'llama-3.1-8b-instant': (0.05, 0.08),
+    'llama-3.3-70b-versatile': (0.59, 0.79),
+    'compound-beta': (0.59, 0.79),
+}
+
+_CROSS_BORDER_RE = re.compile(
+    r'\b(convert|conversion|exchange|cross[- ]border|international|abroad|overseas|foreign|'
+    r'paying with|card from|equivalent)\b',
+    re.IGNORECASE
+)
+_PROPER_NOUN_RE = re.compile(r'(?<![.!?]\s)(?<!^)\b[A-Z][a-z]{2,}')
+
+
+def score_complexity(user_input: str) -> Tuple[float, Dict[str, Any]]:
+    """Score how hard an input is to parse; higher means more complex"""
+    hints = extract_hints(user_input)
+    words = len(user_input.split())
+    entities = (len(hints.currencies) + len(hints.payment_currencies) + len(hints.cities)
+                + len(hints.quantities) + len(_PROPER_NOUN_RE.findall(user_input)))
+    cross_border = bool(_CROSS_BORDER_RE.search(user_input)) or len(set(hints.currencies + hints.payment_currencies)) > 1
+
+    score = min(words / 15.0, 4.0) + 0.5 * entities + (3.0 if cross_border else 0.0)
+    return round(score, 2), {'words': words, 'entities': entities, 'cross_border': cross_border}
+
+
+@dataclass
+class ModelRoute:
+    """Routing decision for one input"""
+    model: str
+    tier: str
+    score: float
+    features: Dict[str, Any]
+
+    @property
+    def escalates(self) -> bool:
+        """Small-model output is validated and escalated on failure"""
+        return self.tier == 'small'
+
+
+class ModelRouter:
+    """Routes parse requests by input complexity and tracks per-model outcomes"""
+
+    def __init__(self, small_model: str, large_model: str, threshold: float = 3.0, enabled: bool = True):
+        self.small_model = small_model
+        self.large_model = large_model
+        self.threshold = threshold
+        self.enabled = enabled and small_model != large_model
+        self._lock = threading.Lock()
+        self._models: Dict[str, Dict[str, float]] = {}
+        self._routed = {'small': 0, 'large': 0}
+        self._escalations = 0
+
+    @classmethod
+    def from_env(cls, large_model: str) -> 'ModelRouter':
+        """Configured by ``GROQ_SMALL_MODEL``, ``LLM_ROUTING`` and ``LLM_ROUTING_THRESHOLD``"""
+        return cls(
+            small_model=os.getenv("GROQ_SMALL_MODEL", "llama-3.1-8b-instant"),
+            large_model=large_model,
+            threshold=float(os.getenv("LLM_ROUTING_THRESHOLD", "3.0")),
+            enabled=os.getenv("LLM_ROUTING", "1").lower() not in ("0", "false", "no")
+        )
+
+    def route(self, user_input: str) -> ModelRoute:
+        score, features = score_complexity(user_input)
+        tier = 'small' if self.enabled and score < self.threshold else 'large'
+        with self._lock:
+            self._routed[tier] += 1
+        return ModelRoute(self.small_model if tier == 'small' else self.large_model, tier, score, features)
+
+    def record_call(self, model: str, latency: float, prompt_chars: int, completion_chars: int, success: bool):
+        """Record latency and estimated cost of one completion (about 4 chars per token)"""
+        input_price, output_price = MODEL_PRICING.get(model, (0.0, 0.0))
+        cost = (prompt_chars / 4.0 * input_price + completion_chars / 4.0 * output_price) / 1_000_000
+        with self._lock:
+            stats = self._models.setdefault(model, {'calls': 0, 'failures': 0, 'latency_total': 0.0, 'cost_usd': 0.0})
+            stats['calls'] += 1
+            stats['failures'] += 0 if success else 1
+            stats['latency_total'] += latency
+            stats['cost_usd'] += cost
+
+    def record_escalation(self):
+        with self._lock:
+            self._escalations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            models = {
+                model: {
+                    'calls': int(s['calls']),
+                    'failures': int(s['failures']),
+                    'avg_latency_ms': round(s['latency_total'] / s['calls'] * 1000, 1) if s['calls'] else 0.0,
+                    'estimated_cost_usd': round(s['cost_usd'], 6)
+                }
+                for model, s in self._models.items()
+            }
+            small_routed = self._routed['small']
+            return {
+                'enabled': self.enabled,
+                'small_model': self.small_model,
+                'large_model': self.large_model,
+                'threshold': self.threshold,
+                'routed': dict(self._routed),
+                'escalations': self._escalations,
+                'escalation_rate': round(self._escalations / small_routed, 3) if small_routed else 0.0,
+                'models': models
+            }
+
+
+def validate_workflow_config(config: Dict[str, Any]) -> List[str]:
+    """Check a raw (pre-default) workflow config against the schema; returns problems"""
+    problems = []
+    for field in ('workflow_type', 'domain', 'channel', 'currency'):
+        if not isinstance(config.get(field), str) or not config.get(field):
+            problems.append(f"missing or invalid '{field}'")
+    if config.get('channel') not in (None, 'B2C', 'Corporate'):
+        problems.append(f"unknown channel '{config.get('channel')}'")
+    for field in ('currency', 'target_currency'):
+        value = config.get(field)
+        if value is not None and not (isinstance(value, str) and re.fullmatch(r'[A-Z]{3}', value)):
+            problems.append(f"'{field}' is not an ISO currency code")
+
+    items = config.get('items')
+    if not isinstance(items, list) or not items:
+        problems.append("'items' must be a non-empty list")
+    else:
+        for index, item in enumerate(items):
+            if not isinstance(item, dict) or not item.get('name'):
+                problems.append(f"item {index} has no name")
+                continue
+            price = item.get('price')
+            quantity = item.get('quantity')
+            if isinstance(price, bool) or not isinstance(price, (int, float)) or price < 0:
+                problems.append(f"item {index} has an invalid price")
+            if isinstance(quantity, bool) or not isinstance(quantity, (int, float)) or quantity <= 0:
+                problems.append(f"item {index} has an invalid quantity")
+    return problems
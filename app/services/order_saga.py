@@ -0,0 +1,130 @@
+"""
+The order fulfilment sagas of ``/api/execute`` (``Workflow/workflow_diagram.mmd``).
+
+``order``            create order → charge card → ship
+``corporate_order``  create order → reserve wallet → ship → deduct from wallet
+
+If a corporate booking (the shipping step) fails, the next best price is
+looked up across providers and booked instead (``alternative_booking``),
+within the reserved amount. Item prices are in the order's currency, the
+reservation in the payment currency, so the items are quoted at the rate the
+order total was converted with. Only when that also fails does the saga
+compensate.
+
+If a payment or shipping step fails, the completed steps are undone. The
+payment is refunded or the wallet reservation is released (restore wallet),
+and the order is cancelled. Payment compensation does not need the order, so
+the refund and the cancellation run concurrently.
+
+Orders, wallet holds and unsettled payments live in memory. When a saga is
+resumed after a crash they died with the process, so there is nothing left
+to undo: a compensation whose order, hold or payment cannot be found counts
+as done instead of failing the saga again on every resume.
+
+The saga context holds what the steps need: ``customer_id``,
+``customer_email`` (velocity limits and wallets key on it), ``items``, ``channel``,
+``amount`` and ``currency`` (the converted order total and the payment
+currency).
+"""
+
+from typing import Any, Callable, Dict, List
+
+try:
+    from .base_service import ServiceResult
+    from .saga import Saga, SagaStep
+except ImportError:
+    from base_service import ServiceResult
+    from saga import Saga, SagaStep
+
+ORDER_SAGA = 'order'
+CORPORATE_ORDER_SAGA = 'corporate_order'
+
+
+def _in_payment_currency(context: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """The order's items priced in the payment currency, at the order total's conversion rate"""
+    items = context['items']
+    original = sum(item['price'] * item.get('quantity', 1) for item in items)
+    rate = context['amount'] / original if original else 1.0
+    return [dict(item, price=item['price'] * rate) for item in items]
+
+
+def _nothing_to_undo(**ids: str) -> ServiceResult:
+    """Compensation of something this process does not know (e.g. lost in a crash)"""
+    return ServiceResult(success=True, data=dict(ids, status='not_found'))
+
+
+def order_sagas(get_service: Callable[[str], Any]) -> List[Saga]:
+    """Both order sagas, resolving services through ``get_service`` when they run"""
+
+    def create_order(context: Dict[str, Any], results: Dict[str, ServiceResult]) -> ServiceResult:
+        return get_service('order_creation').execute(
+            customer_id=context['customer_id'], items=context['items'], channel=context['channel'])
+
+    def cancel_order(context: Dict[str, Any], order: ServiceResult) -> ServiceResult:
+        orders = get_service('order_creation')
+        if order.data['order_id'] not in orders.orders:
+            return _nothing_to_undo(order_id=order.data['order_id'])
+        return orders.cancel(order.data['order_id'], reason='payment or shipping failed')
+
+    def charge_card(context: Dict[str, Any], results: Dict[str, ServiceResult]) -> ServiceResult:
+        return get_service('payment_processing').execute(
+            amount=context['amount'], customer_id=context['customer_id'], currency=context['currency'],
+            customer_email=context.get('customer_email'))
+
+    def refund_card(context: Dict[str, Any], payment: ServiceResult) -> ServiceResult:
+        payments = get_service('payment_processing')
+        # neither settled nor waiting to settle: the charge never went through
+        if payments.settlement.status(payment.data['payment_id']) is None:
+            return _nothing_to_undo(payment_id=payment.data['payment_id'])
+        return payments.refund(
+            payment.data['payment_id'], payment.data['amount'], context['customer_id'], payment.data['currency'])
+
+    def reserve_wallet(context: Dict[str, Any], results: Dict[str, ServiceResult]) -> ServiceResult:
+        return get_service('wallet').execute(
+            customer_id=context['customer_id'], amount=context['amount'], currency=context['currency'],
+            order_id=results['order'].data['order_id'], customer_email=context.get('customer_email'))
+
+    def release_wallet(context: Dict[str, Any], reservation: ServiceResult) -> ServiceResult:
+        wallet = get_service('wallet')
+        if wallet.ledger.hold(reservation.data['hold_id']) is None:
+            return _nothing_to_undo(hold_id=reservation.data['hold_id'])
+        return wallet.execute(
+            customer_id=context['customer_id'], action='release', hold_id=reservation.data['hold_id'])
+
+    def ship(context: Dict[str, Any], results: Dict[str, ServiceResult]) -> ServiceResult:
+        return get_service('shipping_confirmation').execute(order_id=results['order'].data['order_id'])
+
+    def ship_or_rebook(context: Dict[str, Any], results: Dict[str, ServiceResult]) -> ServiceResult:
+        shipping = ship(context, results)
+        if shipping.success:
+            return shipping
+        # Find Next Best Price → Make Alternative Booking
+        alternative = get_service('alternative_booking').execute(
+            order_id=results['order'].data['order_id'], items=_in_payment_currency(context),
+            currency=context['currency'], max_total=context['amount'])
+        if not alternative.success:
+            alternative.error_message = f"{shipping.error_message}; {alternative.error_message}"
+        return alternative
+
+    def commit_wallet(context: Dict[str, Any], results: Dict[str, ServiceResult]) -> ServiceResult:
+        # a cheaper alternative booking is deducted at its price; the rest of the hold is released
+        shipping = results['shipping'].data
+        amount = min(shipping['total'], context['amount']) if shipping.get('alternative_booking') else None
+        return get_service('wallet').execute(
+            customer_id=context['customer_id'], action='commit', hold_id=results['payment'].data['hold_id'],
+            amount=amount, currency=context['currency'])
+
+    order = SagaStep('order', create_order, cancel_order)
+    return [
+        Saga(ORDER_SAGA, [
+            order,
+            SagaStep('payment', charge_card, refund_card, depends_on=()),
+            SagaStep('shipping', ship)
+        ]),
+        Saga(CORPORATE_ORDER_SAGA, [
+            order,
+            SagaStep('payment', reserve_wallet, release_wallet, depends_on=()),
+            SagaStep('shipping', ship_or_rebook),
+            SagaStep('wallet_commit', commit_wallet)
+        ])
+    ]
@@ -0,0 +1,644 @@
+"""
+Transactional outbox for customer notifications.
+
+Request handlers do not call the email, SMS and call-center services. They
+write the notifications to a SQLite table (``NotificationOutbox.enqueue_many``,
+one transaction for everything an order triggers) and return.
+``NotificationDispatcher`` threads claim due rows, deliver them through the
+notification services and record the outcome:
+
+- failed deliveries are retried with exponential backoff, up to ``max_attempts``,
+  then marked ``dead``
+- a claim is a lease; rows claimed by a process that died are claimed again
+  once the lease expires, so delivery is at-least-once
+- ``dedupe_key`` is unique, so enqueueing the same notification twice (e.g. a
+  client retrying a request) is a no-op, and the notification id is passed to
+  the sender as an idempotency key
+- sent, dead and dropped notifications are deleted by the dispatcher once
+  they are ``OUTBOX_RETENTION_HOURS`` old; a duplicate enqueued after that
+  is delivered again
+
+Configuration (environment):
+
+- ``OUTBOX_PATH``           SQLite file (default ``data/outbox.sqlite3`` in the repository)
+- ``OUTBOX_WORKERS``        dispatcher threads per process (default 2)
+- ``OUTBOX_MAX_ATTEMPTS``   delivery attempts before a notification is dead (default 5)
+- ``OUTBOX_LEASE_SECONDS``  claim lease (default 30)
+- ``OUTBOX_RETENTION_HOURS`` age at which finished notifications are deleted (default 24)
+- ``NOTIFY_BATCH_SIZE``     messages per bulk provider call (default 50; 1 sends one by one)
+- ``NOTIFY_LINGER_MS``      longest a message waits for its batch to fill (default 200)
+- ``NOTIFY_COALESCE_SECONDS`` hold messages this long and send one digest per recipient (default 0, off)
+- ``NOTIFY_RATE_LIMITS``    messages per second per channel, ``channel=rate[:burst]`` pairs
+                            (default ``call=5,email=100,sms=30``; a burst defaults to one second)
+- ``NOTIFY_OVERLOAD_POLICY`` ``channel=defer|drop`` pairs (default ``sms=drop``; others defer)
+- ``NOTIFY_MAX_LAG_SECONDS`` queue lag after which ``drop`` channels discard due messages (default 300)
+
+Channels are served in priority order: call-center escalations (``high``),
+then transactional email, then bulk SMS. A channel out of rate-limit tokens
+is deferred, its messages stay queued; under a ``drop`` policy, messages that
+have waited longer than the lag limit are marked ``dropped`` instead of being
+sent late. ``notification_queue_lag_seconds{priority}`` exports the lag.
+"""
+
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from .base_service import ServiceResult
+    from .metrics import Gauge
+    from .rate_limit import TokenBucket
+    from .tracing import inject_headers, span
+except ImportError:
+    from base_service import ServiceResult
+    from metrics import Gauge
+    from rate_limit import TokenBucket
+    from tracing import inject_headers, span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = Path(__file__).resolve().parent.parent.parent / "data" / "outbox.sqlite3"
+
+# notification channel -> service registry name
+CHANNEL_SERVICES = {
+    'email': 'email_notification',
+    'sms': 'sms_notification',
+    'call': 'call_center_trigger'
+}
+
+# delivery priority classes, most urgent first
+PRIORITIES = ('high', 'transactional', 'bulk')
+CHANNEL_PRIORITY = {'call': 'high', 'email': 'transactional', 'sms': 'bulk'}
+
+DEFAULT_RATE_LIMITS = "call=5,email=100,sms=30"
+DEFAULT_OVERLOAD_POLICY = "sms=drop"
+
+QUEUE_LAG = Gauge('notification_queue_lag_seconds', 'Age of the oldest due notification by priority', ['priority'])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notifications (
+    id              TEXT PRIMARY KEY,
+    dedupe_key      TEXT NOT NULL UNIQUE,
+    channel         TEXT NOT NULL,
+    payload         TEXT NOT NULL,
+    status          TEXT NOT NULL DEFAULT 'pending',
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    lease_until     REAL,
+    traceparent     TEXT,
+    priority        INTEGER NOT NULL DEFAULT 1,
+    created_at      REAL NOT NULL,
+    sent_at         REAL,
+    last_error      TEXT,
+    result          TEXT
+);
+CREATE INDEX IF NOT EXISTS notifications_due ON notifications (status, next_attempt_at);
+"""
+
+
+@dataclass(slots=True)
+class Notification:
+    """A notification to deliver; ``payload`` holds the notification service's arguments.
+
+    ``priority`` is one of ``PRIORITIES``; it defaults to the channel's.
+    """
+    channel: str
+    payload: Dict[str, Any]
+    dedupe_key: Optional[str] = None
+    priority: Optional[str] = None
+
+    @property
+    def rank(self) -> int:
+        return PRIORITIES.index(self.priority or CHANNEL_PRIORITY.get(self.channel, 'transactional'))
+
+
+@dataclass(slots=True)
+class ClaimedNotification:
+    id: str
+    channel: str
+    payload: Dict[str, Any]
+    attempts: int
+    traceparent: Optional[str]
+
+
+class NotificationOutbox:
+    """SQLite-backed outbox; safe to share between threads and processes"""
+
+    def __init__(self, path: str = None):
+        self.path = str(path or os.getenv("OUTBOX_PATH", DEFAULT_PATH))
+        if self.path != ':memory:':
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.executescript(SCHEMA)
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(notifications)")}
+            if 'priority' not in columns:
+                # outbox created before priorities existed
+                connection.execute("ALTER TABLE notifications ADD COLUMN priority INTEGER NOT NULL DEFAULT 1")
+
+    def _connection(self) -> sqlite3.Connection:
+        # one connection per thread (and per process: connections must not cross fork)
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def enqueue_many(self, notifications: Iterable[Notification]) -> List[Tuple[str, bool]]:
+        """Write ``notifications`` in one transaction.
+
+        Returns ``(id, created)`` per notification; ``created`` is False when a
+        notification with the same ``dedupe_key`` was already enqueued, and
+        ``id`` is then the existing one.
+        """
+        now = time.time()
+        traceparent = inject_headers({}).get('traceparent')
+        connection = self._connection()
+        outcome = []
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for notification in notifications:
+                notification_id = str(uuid.uuid4())
+                dedupe_key = notification.dedupe_key or notification_id
+                cursor = connection.execute(
+                    "INSERT OR IGNORE INTO notifications "
+                    "(id, dedupe_key, channel, payload, next_attempt_at, traceparent, priority, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (notification_id, dedupe_key, notification.channel,
+                     json.dumps(notification.payload, default=str), now, traceparent, notification.rank, now))
+                if cursor.rowcount:
+                    outcome.append((notification_id, True))
+                else:
+                    existing = connection.execute("SELECT id FROM notifications WHERE dedupe_key = ?",
+                                                  (dedupe_key,)).fetchone()
+                    outcome.append((existing[0], False))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return outcome
+
+    def enqueue(self, channel: str, payload: Dict[str, Any], dedupe_key: str = None,
+                priority: str = None) -> Tuple[str, bool]:
+        return self.enqueue_many([Notification(channel, payload, dedupe_key, priority)])[0]
+
+    def claim(self, limit: int, lease_seconds: float, channel: str = None) -> List[ClaimedNotification]:
+        """Lease up to ``limit`` due notifications (of ``channel``), including ones whose lease expired"""
+        now = time.time()
+        rows = self._connection().execute(
+            "UPDATE notifications SET status = 'in_flight', lease_until = ?, attempts = attempts + 1 "
+            "WHERE id IN (SELECT id FROM notifications "
+            "             WHERE ((status = 'pending' AND next_attempt_at <= ?) "
+            "                 OR (status = 'in_flight' AND lease_until <= ?)) "
+            "               AND (? IS NULL OR channel = ?) "
+            "             ORDER BY priority, next_attempt_at LIMIT ?) "
+            "RETURNING id, channel, payload, attempts, traceparent",
+            (now + lease_seconds, now, now, channel, channel, limit)).fetchall()
+        return [ClaimedNotification(row[0], row[1], json.loads(row[2]), row[3], row[4]) for row in rows]
+
+    def due_by_channel(self) -> Dict[str, Tuple[int, float, int]]:
+        """``channel -> (due notifications, when the oldest became due, most urgent priority)``,
+        most urgent channel first"""
+        now = time.time()
+        rows = self._connection().execute(
+            "SELECT channel, COUNT(*), MIN(CASE status WHEN 'pending' THEN next_attempt_at ELSE lease_until END), "
+            "       MIN(priority) "
+            "FROM notifications "
+            "WHERE (status = 'pending' AND next_attempt_at <= ?) OR (status = 'in_flight' AND lease_until <= ?) "
+            "GROUP BY channel ORDER BY MIN(priority)", (now, now)).fetchall()
+        return {channel: (count, oldest, priority) for channel, count, oldest, priority in rows}
+
+    def drop_overdue(self, channel: str, due_before: float) -> int:
+        """Give up on pending ``channel`` notifications due before ``due_before``"""
+        return self._connection().execute(
+            "UPDATE notifications SET status = 'dropped', last_error = 'dropped: queue lag over limit' "
+            "WHERE channel = ? AND status = 'pending' AND next_attempt_at < ?", (channel, due_before)).rowcount
+
+    def mark_sent(self, notification_id: str, result: Optional[Dict[str, Any]]):
+        self.mark_sent_many([(notification_id, result)])
+
+    def mark_sent_many(self, sent: List[Tuple[str, Optional[Dict[str, Any]]]]):
+        """Record deliveries in one transaction"""
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                "UPDATE notifications SET status = 'sent', sent_at = ?, lease_until = NULL, result = ?, last_error = NULL "
+                "WHERE id = ? AND status = 'in_flight'",
+                [(now, json.dumps(result, default=str) if result is not None else None, notification_id)
+                 for notification_id, result in sent])
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def mark_failed(self, notification_id: str, error: str, retry_at: Optional[float]):
+        """Schedule another attempt at ``retry_at``, or give up when it is None"""
+        if retry_at is None:
+            self._connection().execute(
+                "UPDATE notifications SET status = 'dead', lease_until = NULL, last_error = ? "
+                "WHERE id = ? AND status = 'in_flight'", (error, notification_id))
+        else:
+            self._connection().execute(
+                "UPDATE notifications SET status = 'pending', lease_until = NULL, last_error = ?, next_attempt_at = ? "
+                "WHERE id = ? AND status = 'in_flight'", (error, retry_at, notification_id))
+
+    def get(self, notification_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            "SELECT id, channel, status, attempts, created_at, sent_at, last_error, result, priority "
+            "FROM notifications WHERE id = ?", (notification_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            'notification_id': row[0], 'channel': row[1], 'status': row[2], 'attempts': row[3],
+            'priority': PRIORITIES[row[8]] if 0 <= row[8] < len(PRIORITIES) else row[8],
+            'created_at': row[4], 'sent_at': row[5], 'last_error': row[6],
+            'result': json.loads(row[7]) if row[7] else None
+        }
+
+    def purge(self, finished_before: float) -> int:
+        """Delete notifications sent, declared dead or dropped before ``finished_before``"""
+        # dead and dropped rows keep the time they were last due
+        return self._connection().execute(
+            "DELETE FROM notifications WHERE (status = 'sent' AND sent_at < ?) "
+            "OR (status IN ('dead', 'dropped') AND next_attempt_at < ?)", (finished_before, finished_before)).rowcount
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM notifications GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def oldest_due_age(self) -> float:
+        """Seconds the oldest deliverable notification has been waiting"""
+        row = self._connection().execute(
+            "SELECT MIN(next_attempt_at) FROM notifications WHERE status = 'pending'").fetchone()
+        return max(0.0, time.time() - row[0]) if row and row[0] is not None else 0.0
+
+
+def _channel_settings(value: str) -> Dict[str, str]:
+    """Parse ``channel=value,channel=value``"""
+    settings = {}
+    for item in value.split(','):
+        channel, _, setting = item.partition('=')
+        if channel.strip() and setting.strip():
+            settings[channel.strip()] = setting.strip()
+    return settings
+
+
+def _token_buckets(value: str) -> Dict[str, TokenBucket]:
+    """``channel=rate[:burst]`` pairs to one bucket per channel"""
+    buckets = {}
+    for channel, setting in _channel_settings(value).items():
+        rate, _, burst = setting.partition(':')
+        rate = float(rate)
+        if rate > 0:
+            buckets[channel] = TokenBucket(rate=rate, capacity=max(1.0, float(burst) if burst else rate))
+    return buckets
+
+
+class _Rate:
+    """Events per second over a sliding window"""
+
+    def __init__(self, window: float = 60.0):
+        self.window = window
+        self._events: deque = deque()
+        self._started = time.monotonic()
+
+    def add(self, count: int, now: float):
+        self._events.append((now, count))
+        while self._events and self._events[0][0] < now - self.window:
+            self._events.popleft()
+
+    def per_second(self, now: float) -> float:
+        while self._events and self._events[0][0] < now - self.window:
+            self._events.popleft()
+        span_seconds = min(self.window, now - self._started)
+        return sum(count for _, count in self._events) / span_seconds if span_seconds > 0 else 0.0
+
+
+class NotificationDispatcher:
+    """Background threads draining the outbox through the notification services.
+
+    Channels whose service has ``send_batch`` (email, SMS) are delivered in bulk
+    provider calls of up to ``batch_size`` messages; a batch is sent once it is
+    full or its oldest message has waited ``linger`` seconds. With a coalescing
+    window, messages to the same recipient are held for up to that long and
+    sent as one digest (see the services' ``digest``). Other channels are
+    delivered one ``execute`` call per notification.
+
+    Channels are visited most urgent first. Each claim is capped by the
+    channel's token bucket; a channel without tokens is deferred until the
+    bucket refills, and one with the ``drop`` overload policy discards
+    messages that waited more than ``max_lag`` seconds.
+
+    Every ``purge_interval`` seconds one worker deletes notifications that
+    finished more than ``retention`` seconds ago.
+    """
+
+    def __init__(self, outbox: NotificationOutbox, get_service: Callable[[str], Any], workers: int = None,
+                 max_attempts: int = None, lease_seconds: float = None, batch_size: int = None,
+                 linger: float = None, coalesce_window: float = None, rate_limits: str = None,
+                 overload_policy: str = None, max_lag: float = None, retention: float = None,
+                 poll_interval: float = 0.5, purge_interval: float = 60.0):
+        self.outbox = outbox
+        self.get_service = get_service
+        self.workers = int(os.getenv("OUTBOX_WORKERS", "2")) if workers is None else workers
+        self.max_attempts = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5")) if max_attempts is None else max_attempts
+        self.lease_seconds = float(os.getenv("OUTBOX_LEASE_SECONDS", "30")) if lease_seconds is None else lease_seconds
+        self.batch_size = max(1, int(os.getenv("NOTIFY_BATCH_SIZE", "50")) if batch_size is None else batch_size)
+        self.linger = float(os.getenv("NOTIFY_LINGER_MS", "200")) / 1000 if linger is None else linger
+        self.coalesce_window = (float(os.getenv("NOTIFY_COALESCE_SECONDS", "0"))
+                                if coalesce_window is None else coalesce_window)
+        self.buckets = _token_buckets(os.getenv("NOTIFY_RATE_LIMITS", DEFAULT_RATE_LIMITS)
+                                      if rate_limits is None else rate_limits)
+        self.overload_policy = _channel_settings(os.getenv("NOTIFY_OVERLOAD_POLICY", DEFAULT_OVERLOAD_POLICY)
+                                                 if overload_policy is None else overload_policy)
+        self.max_lag = float(os.getenv("NOTIFY_MAX_LAG_SECONDS", "300")) if max_lag is None else max_lag
+        self.retention = (float(os.getenv("OUTBOX_RETENTION_HOURS", "24")) * 3600
+                          if retention is None else retention)
+        self.poll_interval = poll_interval
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0
+        self._lag: Dict[str, float] = dict.fromkeys(PRIORITIES, 0.0)
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stats = {'delivered': 0, 'failed_attempts': 0, 'dead': 0, 'dropped': 0, 'purged': 0}
+        self._channels: Dict[str, Dict[str, int]] = {}
+        self._rate = _Rate()
+
+    def start(self):
+        """Start the worker threads of this process (again after a fork)"""
+        with self._lock:
+            if self._pid == os.getpid() or self.workers <= 0:
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._threads = [threading.Thread(target=self._run, name=f'outbox-{i}', daemon=True)
+                             for i in range(self.workers)]
+            for thread in self._threads:
+                thread.start()
+
+    def submit(self, notifications: List[Notification]) -> List[ServiceResult]:
+        """Enqueue ``notifications`` and wake the workers; one result per notification.
+
+        The results only report that the notifications were queued (or had been
+        already); delivery status is available from the outbox by id.
+        """
+        try:
+            queued = self.outbox.enqueue_many(notifications)
+        except sqlite3.Error as e:
+            logger.error("Could not enqueue %d notifications: %s", len(notifications), e)
+            return [ServiceResult(False, error_message=f"Notification could not be queued: {e}")
+                    for _ in notifications]
+        self.notify()
+        return [ServiceResult(True, {'notification_id': notification_id, 'channel': notification.channel,
+                                     'status': 'queued' if created else 'duplicate'})
+                for notification, (notification_id, created) in zip(notifications, queued)]
+
+    def notify(self):
+        """Wake the workers after an enqueue instead of waiting for the next poll"""
+        if self._pid != os.getpid():
+            self.start()
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                processed, wait = self._dispatch()
+            except Exception as e:
+                logger.error("Outbox dispatch failed: %s", e)
+                processed, wait = 0, self.poll_interval
+            self._purge_if_due()
+            if not processed:
+                self._wakeup.wait(wait)
+                self._wakeup.clear()
+
+    def _purge_if_due(self):
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_purge:
+                return
+            self._next_purge = now + self.purge_interval
+        try:
+            purged = self.outbox.purge(time.time() - self.retention)
+        except sqlite3.Error as e:
+            logger.error("Outbox purge failed: %s", e)
+            return
+        if purged:
+            with self._lock:
+                self._stats['purged'] += purged
+            logger.info("Purged %d finished notifications older than %.0fh", purged, self.retention / 3600)
+
+    def dispatch_once(self) -> int:
+        """Deliver what is due on the calling thread; returns the number of notifications claimed"""
+        return self._dispatch()[0]
+
+    def _hold(self, service) -> float:
+        """How long a channel's oldest message may wait for its batch to fill"""
+        if self.coalesce_window > 0 and getattr(service, 'recipient_field', None):
+            return max(self.linger, self.coalesce_window)
+        return self.linger
+
+    def _dispatch(self) -> Tuple[int, float]:
+        """Deliver due notifications; returns (claimed, seconds until a held batch or a token is due)"""
+        processed, wait = 0, self.poll_interval
+        due_channels = self.outbox.due_by_channel()
+        self._update_lag(due_channels)
+        for channel, (due, oldest, _) in due_channels.items():
+            if self.overload_policy.get(channel) == 'drop' and time.time() - oldest > self.max_lag:
+                dropped = self.outbox.drop_overdue(channel, time.time() - self.max_lag)
+                if dropped:
+                    self._count_channel(channel, 'dropped', dropped)
+                    logger.warning("Dropped %d %s notifications queued longer than %.0fs",
+                                   dropped, channel, self.max_lag)
+
+            limit = self.batch_size
+            bucket = self.buckets.get(channel)
+            if bucket is not None:
+                tokens = bucket.available
+                if tokens < 1:
+                    self._count_channel(channel, 'deferred', 1)
+                    wait = min(wait, (1 - tokens) / bucket.rate)
+                    continue
+                limit = min(limit, int(tokens))
+
+            service = self.get_service(CHANNEL_SERVICES.get(channel, ''))
+            if service is None or self.batch_size == 1 or not hasattr(service, 'send_batch'):
+                claimed = self._claim(channel, limit, bucket)
+                for notification in claimed:
+                    self._deliver(service, notification)
+            else:
+                remaining = oldest + self._hold(service) - time.time()
+                if due < self.batch_size and remaining > 0:
+                    wait = min(wait, remaining)
+                    continue
+                claimed = self._claim(channel, limit, bucket)
+                if claimed:
+                    self._deliver_batch(service, channel, claimed)
+            processed += len(claimed)
+        return processed, wait
+
+    def _claim(self, channel: str, limit: int, bucket: Optional[TokenBucket]) -> List[ClaimedNotification]:
+        claimed = self.outbox.claim(limit, self.lease_seconds, channel)
+        if claimed and bucket is not None:
+            # another worker may have taken tokens since they were counted; wait for the shortfall
+            bucket.acquire(len(claimed))
+        return claimed
+
+    def _update_lag(self, due_channels: Dict[str, Tuple[int, float, int]]):
+        now = time.time()
+        lag = dict.fromkeys(PRIORITIES, 0.0)
+        for _, oldest, priority in due_channels.values():
+            name = PRIORITIES[min(max(priority, 0), len(PRIORITIES) - 1)]
+            lag[name] = max(lag[name], now - oldest)
+        for name, seconds in lag.items():
+            QUEUE_LAG.labels(name).set(round(seconds, 3))
+        self._lag = lag
+
+    def _deliver(self, service, notification: ClaimedNotification):
+        with span("notification.deliver", {'notification.channel': notification.channel,
+                                           'notification.attempt': notification.attempts},
+                  traceparent=notification.traceparent) as current:
+            try:
+                if service is None:
+                    raise ValueError(f"No service for channel {notification.channel}")
+                result = service.execute(notification_id=notification.id, **notification.payload)
+                error = None if result.success else (result.error_message or 'delivery failed')
+            except Exception as e:
+                result, error = None, f"{type(e).__name__}: {e}"
+            self._record_calls(notification.channel, messages=1, calls=1, digested=0)
+
+            if error is None:
+                self.outbox.mark_sent(notification.id, result.data)
+                self._record_delivered(1)
+                return
+            current.set_error(error)
+            self._failed(notification, error)
+
+    def _coalesce(self, service, claimed: List[ClaimedNotification]) -> List[Tuple[Dict[str, Any], List[ClaimedNotification]]]:
+        """Group claimed notifications into outgoing messages, one digest per recipient when coalescing"""
+        field = getattr(service, 'recipient_field', None)
+        if self.coalesce_window <= 0 or not field:
+            return [(dict(n.payload, notification_id=n.id), [n]) for n in claimed]
+        groups: Dict[Any, List[ClaimedNotification]] = {}
+        for notification in claimed:
+            groups.setdefault(notification.payload.get(field), []).append(notification)
+        messages = []
+        for members in groups.values():
+            if len(members) == 1:
+                messages.append((dict(members[0].payload, notification_id=members[0].id), members))
+            else:
+                digest = service.digest([member.payload for member in members])
+                messages.append((dict(digest, notification_ids=[member.id for member in members]), members))
+        return messages
+
+    def _deliver_batch(self, service, channel: str, claimed: List[ClaimedNotification]):
+        messages = self._coalesce(service, claimed)
+        calls = 0
+        sent: List[Tuple[str, Optional[Dict[str, Any]]]] = []
+        with span("notification.send_batch", {'notification.channel': channel, 'notification.count': len(claimed),
+                                              'notification.messages': len(messages)}) as current:
+            limit = getattr(service, 'max_batch_size', len(messages)) or len(messages)
+            for start in range(0, len(messages), limit):
+                chunk = messages[start:start + limit]
+                calls += 1
+                try:
+                    results = service.send_batch([payload for payload, _ in chunk])
+                except Exception as e:
+                    results = [ServiceResult(False, error_message=f"{type(e).__name__}: {e}") for _ in chunk]
+                for (_, members), result in zip(chunk, results):
+                    if result.success:
+                        data = dict(result.data, digest_of=len(members)) if len(members) > 1 else result.data
+                        sent.extend((member.id, data) for member in members)
+                    else:
+                        current.set_error(result.error_message or 'delivery failed')
+                        for member in members:
+                            self._failed(member, result.error_message or 'delivery failed')
+            current.set_attribute('notification.provider_calls', calls)
+        if sent:
+            self.outbox.mark_sent_many(sent)
+            self._record_delivered(len(sent))
+        self._record_calls(channel, messages=len(claimed), calls=calls, digested=len(claimed) - len(messages))
+
+    def _failed(self, notification: ClaimedNotification, error: str):
+        if notification.attempts >= self.max_attempts:
+            self.outbox.mark_failed(notification.id, error, None)
+            self._count('dead')
+            logger.error("Notification %s (%s) dead after %d attempts: %s",
+                         notification.id, notification.channel, notification.attempts, error)
+        else:
+            backoff = min(60.0, 0.5 * 2 ** (notification.attempts - 1)) * random.uniform(0.8, 1.2)
+            self.outbox.mark_failed(notification.id, error, time.time() + backoff)
+            self._count('failed_attempts')
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _record_delivered(self, count: int):
+        with self._lock:
+            self._stats['delivered'] += count
+            self._rate.add(count, time.monotonic())
+
+    def _channel_counters(self, channel: str) -> Dict[str, int]:
+        counters = self._channels.get(channel)
+        if counters is None:
+            counters = self._channels[channel] = {'messages': 0, 'provider_calls': 0, 'coalesced': 0,
+                                                  'deferred': 0, 'dropped': 0}
+        return counters
+
+    def _record_calls(self, channel: str, messages: int, calls: int, digested: int):
+        with self._lock:
+            counters = self._channel_counters(channel)
+            counters['messages'] += messages
+            counters['provider_calls'] += calls
+            counters['coalesced'] += digested
+
+    def _count_channel(self, channel: str, key: str, amount: int):
+        with self._lock:
+            self._channel_counters(channel)[key] += amount
+            if key == 'dropped':
+                self._stats['dropped'] += amount
+
+    def shutdown(self, wait: bool = True, timeout: float = 5.0):
+        """Stop the workers; undelivered notifications stay in the outbox"""
+        self._stop.set()
+        self._wakeup.set()
+        if wait:
+            for thread in self._threads:
+                thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            report = dict(self._stats)
+            report['sends_per_second'] = round(self._rate.per_second(time.monotonic()), 3)
+            channels = {}
+            for channel, counters in self._channels.items():
+                channels[channel] = dict(counters, provider_calls_per_message=round(
+                    counters['provider_calls'] / counters['messages'], 4) if counters['messages'] else 0.0)
+            for channel, priority in CHANNEL_PRIORITY.items():
+                bucket = self.buckets.get(channel)
+                channels.setdefault(channel, {}).update(
+                    priority=priority, overload_policy=self.overload_policy.get(channel, 'defer'),
+                    rate_limit_per_second=bucket.rate if bucket else None)
+            report['queue_lag_seconds'] = {name: round(seconds, 3) for name, seconds in self._lag.items()}
+        report.update(workers=self.workers, batch_size=self.batch_size, linger_ms=round(self.linger * 1000, 1),
+                      retention_hours=round(self.retention / 3600, 2),
+                      coalesce_seconds=self.coalesce_window, channels=channels, outbox=self.outbox.counts(),
+                      oldest_pending_seconds=round(self.outbox.oldest_due_age(), 3))
+        return report
@@ -0,0 +1,247 @@
+"""
+Speculative prefetch of downstream dependencies while the LLM parse is in flight.
+
+Cheap hints (currency codes, city names, quantities) are pulled from the raw
+user input with regular expressions and used to warm the exchange rate cache in
+parallel with the Groq call. Speculative rates are held per session and only
+committed to the shared cache once the parsed configuration confirms them;
+everything else is discarded.
+
+Confirming waits at most ``PREFETCH_WAIT_MS`` (default 300) for the needed
+rate, and not at all for a fetch that already failed; on a miss the workflow
+fetches the rate itself.
+"""
+
+import concurrent.futures
+import os
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    from .base_service import logger
+    from .tracing import propagating
+except ImportError:
+    from base_service import logger
+    from tracing import propagating
+
+CURRENCY_CODES = ('USD', 'EUR', 'GBP', 'JPY', 'CAD', 'AUD', 'CHF', 'CNY', 'INR')
+
+CURRENCY_SYMBOLS = {'$': 'USD', '€': 'EUR', '£': 'GBP', '¥': 'JPY'}
+
+CURRENCY_WORDS = {
+    'dollar': 'USD', 'dollars': 'USD', 'euro': 'EUR', 'euros': 'EUR',
+    'pound': 'GBP', 'pounds': 'GBP', 'sterling': 'GBP', 'yen': 'JPY',
+    'franc': 'CHF', 'francs': 'CHF', 'yuan': 'CNY', 'rupee': 'INR', 'rupees': 'INR'
+}
+
+CITY_CURRENCIES = {
+    'nyc': 'USD', 'new york': 'USD', 'san francisco': 'USD', 'chicago': 'USD', 'los angeles': 'USD',
+    'paris': 'EUR', 'berlin': 'EUR', 'rome': 'EUR', 'madrid': 'EUR', 'amsterdam': 'EUR', 'frankfurt': 'EUR',
+    'london': 'GBP', 'manchester': 'GBP', 'edinburgh': 'GBP',
+    'tokyo': 'JPY', 'osaka': 'JPY',
+    'toronto': 'CAD', 'vancouver': 'CAD', 'montreal': 'CAD',
+    'sydney': 'AUD', 'melbourne': 'AUD',
+    'zurich': 'CHF', 'geneva': 'CHF', 'shanghai': 'CNY', 'beijing': 'CNY',
+    'mumbai': 'INR', 'delhi': 'INR', 'bangalore': 'INR'
+}
+
+# Nationality / country words usually describe the payment side of a transaction
+COUNTRY_CURRENCIES = {
+    'american': 'USD', 'british': 'GBP',
+    'german': 'EUR', 'germany': 'EUR', 'french': 'EUR', 'france': 'EUR', 'italian': 'EUR',
+    'spanish': 'EUR', 'japanese': 'JPY', 'japan': 'JPY', 'canadian': 'CAD', 'canada': 'CAD',
+    'australian': 'AUD', 'australia': 'AUD', 'swiss': 'CHF', 'chinese': 'CNY', 'indian': 'INR'
+}
+# Country abbreviations only count in capitals: "send us the invoice" is not the US
+COUNTRY_ABBREVIATIONS = {'US': 'USD', 'USA': 'USD', 'UK': 'GBP'}
+
+_CODE_RE = re.compile(r'\b(' + '|'.join(CURRENCY_CODES) + r')\b', re.IGNORECASE)
+_SYMBOL_RE = re.compile('[' + re.escape(''.join(CURRENCY_SYMBOLS)) + ']')
+_WORD_RE = re.compile(r'\b(' + '|'.join(CURRENCY_WORDS) + r')\b', re.IGNORECASE)
+_CITY_RE = re.compile(r'\b(' + '|'.join(sorted(CITY_CURRENCIES, key=len, reverse=True)) + r')\b', re.IGNORECASE)
+_COUNTRY_RE = re.compile(r'\b(' + '|'.join(COUNTRY_CURRENCIES) + r')\b', re.IGNORECASE)
+_COUNTRY_ABBREVIATION_RE = re.compile(r'\b(' + '|'.join(COUNTRY_ABBREVIATIONS) + r')\b')
+_QUANTITY_RE = re.compile(r'\b(\d{1,5})\s*(?:x\s+)?([a-zA-Z][a-zA-Z-]+)')
+
+
+@dataclass
+class PrefetchHints:
+    """Hints extracted from raw user input"""
+    currencies: List[str] = field(default_factory=list)
+    payment_currencies: List[str] = field(default_factory=list)
+    cities: List[str] = field(default_factory=list)
+    quantities: List[Tuple[int, str]] = field(default_factory=list)
+
+    def candidate_pairs(self, max_pairs: int = 4) -> List[Tuple[str, str]]:
+        """Most likely (from, to) conversion pairs, in priority order"""
+        pairs: List[Tuple[str, str]] = []
+        sources = self.currencies or ['USD']
+        targets = self.payment_currencies or [c for c in self.currencies if c != sources[0]] or ['USD']
+        for source in sources:
+            for target in targets:
+                if source != target and (source, target) not in pairs:
+                    pairs.append((source, target))
+        return pairs[:max_pairs]
+
+
+def _append_unique(values: List[str], value: str):
+    if value not in values:
+        values.append(value)
+
+
+def extract_hints(user_input: str) -> PrefetchHints:
+    """Extract currency, city and quantity hints from raw input (no LLM involved)"""
+    hints = PrefetchHints()
+
+    for match in _CODE_RE.finditer(user_input):
+        _append_unique(hints.currencies, match.group(1).upper())
+    for match in _SYMBOL_RE.finditer(user_input):
+        _append_unique(hints.currencies, CURRENCY_SYMBOLS[match.group()])
+    for match in _WORD_RE.finditer(user_input):
+        _append_unique(hints.currencies, CURRENCY_WORDS[match.group(1).lower()])
+    for match in _CITY_RE.finditer(user_input):
+        city = match.group(1).lower()
+        _append_unique(hints.cities, city)
+        _append_unique(hints.currencies, CITY_CURRENCIES[city])
+    for match in _COUNTRY_RE.finditer(user_input):
+        _append_unique(hints.payment_currencies, COUNTRY_CURRENCIES[match.group(1).lower()])
+    for match in _COUNTRY_ABBREVIATION_RE.finditer(user_input):
+        _append_unique(hints.payment_currencies, COUNTRY_ABBREVIATIONS[match.group(1)])
+
+    # "500 EUR" is an amount, not a quantity
+    hints.quantities = [
+        (int(qty), noun.lower()) for qty, noun in _QUANTITY_RE.findall(user_input)
+        if noun.upper() not in CURRENCY_CODES and noun.lower() not in CURRENCY_WORDS
+    ]
+    return hints
+
+
+class PrefetchSession:
+    """Speculative work started for a single workflow run"""
+
+    def __init__(self, prefetcher: 'SpeculativePrefetcher', hints: PrefetchHints):
+        self.prefetcher = prefetcher
+        self.hints = hints
+        self._futures: Dict[Tuple[str, str], Future] = {}
+        self._streamed: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._resolved = False
+
+    def speculate_pair(self, from_currency: str, to_currency: str):
+        """Start fetching a rate unless it is cached or already in flight"""
+        if not from_currency or not to_currency or from_currency == to_currency:
+            return
+        pair = (from_currency, to_currency)
+        with self._lock:
+            if self._resolved or pair in self._futures:
+                return
+            if self.prefetcher.currency_service.rate_cache.get(*pair) is not None:
+                return
+            self._futures[pair] = self.prefetcher.submit(pair)
+
+    def on_field(self, name: str, value: Any):
+        """Streamed-field callback: speculate on the exact pair once the LLM names it"""
+        if name not in ('currency', 'target_currency'):
+            return
+        self._streamed[name] = value
+        if 'currency' in self._streamed and 'target_currency' in self._streamed:
+            self.speculate_pair(self._streamed['currency'], self._streamed['target_currency'])
+
+    def resolve(self, from_currency: Optional[str], to_currency: Optional[str], timeout: float = None) -> bool:
+        """Confirm the pair the workflow actually needs.
+
+        Waits (up to ``timeout``, default the prefetcher's ``wait``) for a matching
+        in-flight fetch and commits its rate to the shared cache. All other
+        speculative results are discarded. Returns True on a speculative hit.
+        """
+        timeout = self.prefetcher.wait if timeout is None else timeout
+        with self._lock:
+            self._resolved = True
+            futures = dict(self._futures)
+
+        needed = (from_currency, to_currency) if from_currency and to_currency and from_currency != to_currency else None
+        hit = False
+
+        for pair, future in futures.items():
+            if pair == needed:
+                try:
+                    rate = future.result(timeout=timeout)
+                except concurrent.futures.TimeoutError:
+                    logger.info("Speculative rate fetch for %s->%s still running after %.0f ms",
+                                pair[0], pair[1], timeout * 1000)
+                except Exception as e:
+                    logger.warning("Speculative rate fetch for %s->%s failed: %s", pair[0], pair[1], e)
+                else:
+                    self.prefetcher.currency_service.rate_cache.put(pair[0], pair[1], rate)
+                    hit = True
+            else:
+                future.cancel()
+
+        self.prefetcher._record(speculated=len(futures), hit=hit, needed=needed is not None)
+        return hit
+
+
+class SpeculativePrefetcher:
+    """Warms the exchange rate cache in parallel with the LLM parse.
+
+    ``get_currency_service`` returns the conversion service whose cache is
+    warmed; it is called on use, so the service can come from the registry.
+    """
+
+    def __init__(self, get_currency_service: Callable[[], Any], max_workers: int = 4, max_pairs: int = 4,
+                 wait: float = None):
+        self._get_currency_service = get_currency_service
+        self.max_pairs = max_pairs
+        self.wait = float(os.getenv("PREFETCH_WAIT_MS", "300")) / 1000 if wait is None else wait
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='prefetch')
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'sessions': 0,
+            'speculative_fetches': 0,
+            'conversions_needed': 0,
+            'hits': 0,
+            'discarded': 0
+        }
+
+    @property
+    def currency_service(self):
+        return self._get_currency_service()
+
+    def start(self, user_input: str) -> PrefetchSession:
+        """Extract hints from the raw input and start speculative fetches"""
+        session = PrefetchSession(self, extract_hints(user_input))
+        for from_currency, to_currency in session.hints.candidate_pairs(self.max_pairs):
+            session.speculate_pair(from_currency, to_currency)
+        return session
+
+    def submit(self, pair: Tuple[str, str]) -> Future:
+        # the fetch's spans belong to the workflow run that speculated on it
+        return self._executor.submit(propagating(self.currency_service.fetch_live_rate), pair[0], pair[1], False)
+
+    def _record(self, speculated: int, hit: bool, needed: bool):
+        with self._stats_lock:
+            self._stats['sessions'] += 1
+            self._stats['speculative_fetches'] += speculated
+            self._stats['conversions_needed'] += int(needed)
+            self._stats['hits'] += int(hit)
+            self._stats['discarded'] += speculated - int(hit)
+
+    @property
+    def queue_depth(self) -> int:
+        """Speculative fetches waiting for a pool thread"""
+        return self._executor._work_queue.qsize()
+
+    def shutdown(self, wait: bool = True):
+        """Stop the fetch pool (pending speculative fetches are cancelled)"""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Speculation counters and hit rates"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['hit_rate'] = round(stats['hits'] / stats['conversions_needed'], 3) if stats['conversions_needed'] else 0.0
+        stats['precision'] = round(stats['hits'] / stats['speculative_fetches'], 3) if stats['speculative_fetches'] else 0.0
+        return stats
@@ -0,0 +1,280 @@
+"""
+Profiling a live process.
+
+- ``SamplingProfiler`` samples the stacks of every thread at a fixed interval
+  using ``sys._current_frames()``, so the profiled code runs unmodified. The
+  output is collapsed stacks (for ``flamegraph.pl`` and similar tools) or a
+  speedscope file.
+- ``SlowRequestRecorder`` runs ``cProfile`` around a request and keeps the
+  profile only when the request was slower than a threshold, in a bounded
+  ring buffer.
+
+The ``/debug`` endpoints that expose them are wrapped in ``admin_only``. They
+are disabled unless ``ADMIN_TOKEN`` is set, and callers must send the token as
+``Authorization: Bearer <token>`` or in ``X-Admin-Token``.
+
+Configuration (environment):
+
+- ``ADMIN_TOKEN``                  token for ``/debug`` endpoints (unset: endpoints return 404)
+- ``SLOW_REQUEST_PROFILE_MS``      profile requests slower than this (default 0, off)
+- ``SLOW_REQUEST_PROFILE_RATE``    fraction of requests run under cProfile (default 1.0)
+- ``SLOW_REQUEST_PROFILES``        profiles kept (default 20)
+"""
+
+import cProfile
+import functools
+import hmac
+import io
+import itertools
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from flask import abort, has_request_context, request
+
+MAX_PROFILE_SECONDS = 60.0
+DEFAULT_INTERVAL = 0.01
+
+# one sampling profile per process at a time
+_sampling_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """Raised when a sampling profile is already running"""
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler over all threads of the process.
+
+    Each sample records the code objects on every thread's stack. Labels are
+    formatted once per distinct code object, after sampling ends.
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL):
+        self.interval = max(0.001, interval)
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.duration = 0.0
+        self.thread_names: Dict[int, str] = {}
+
+    def run(self, seconds: float, exclude_thread: Optional[int] = None) -> 'SamplingProfiler':
+        """Sample for ``seconds`` on the calling thread; ``exclude_thread`` is left out"""
+        if not _sampling_lock.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already running")
+        try:
+            seconds = min(max(seconds, self.interval), MAX_PROFILE_SECONDS)
+            own = threading.get_ident()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            started = time.perf_counter()
+            deadline = started + seconds
+            next_sample = started
+            while True:
+                for ident, frame in sys._current_frames().items():
+                    if ident == own or ident == exclude_thread:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(frame.f_code)
+                        frame = frame.f_back
+                    self.samples[(ident, tuple(reversed(stack)))] += 1
+                self.sample_count += 1
+                next_sample += self.interval
+                now = time.perf_counter()
+                if next_sample >= deadline:
+                    break
+                if next_sample > now:
+                    time.sleep(next_sample - now)
+                else:
+                    # fell behind (e.g. GIL contention); resume from now rather than burst
+                    next_sample = now
+            self.duration = time.perf_counter() - started
+            for thread in threading.enumerate():
+                names.setdefault(thread.ident, thread.name)
+            self.thread_names = names
+            return self
+        finally:
+            _sampling_lock.release()
+
+    def _thread_name(self, ident: int) -> str:
+        return self.thread_names.get(ident, f"thread-{ident}")
+
+    def collapsed(self) -> str:
+        """One ``thread;root;...;leaf count`` line per distinct stack"""
+        labels: Dict[Any, str] = {}
+        lines = []
+        for (ident, stack), count in self.samples.most_common():
+            frames = [labels.get(code) or labels.setdefault(code, _frame_label(code)) for code in stack]
+            lines.append(';'.join([self._thread_name(ident).replace(';', ':')] + frames) + f" {count}")
+        return '\n'.join(lines) + '\n'
+
+    def speedscope(self) -> Dict[str, Any]:
+        """A speedscope file with one sampled profile per thread"""
+        frames: List[Dict[str, Any]] = []
+        index: Dict[Any, int] = {}
+        per_thread: Dict[int, Tuple[List[List[int]], List[float]]] = {}
+        for (ident, stack), count in self.samples.items():
+            sample = []
+            for code in stack:
+                position = index.get(code)
+                if position is None:
+                    position = index[code] = len(frames)
+                    frames.append({'name': code.co_name, 'file': code.co_filename, 'line': code.co_firstlineno})
+                sample.append(position)
+            stacks, weights = per_thread.setdefault(ident, ([], []))
+            stacks.append(sample)
+            weights.append(round(count * self.interval, 6))
+
+        profiles = []
+        for ident, (stacks, weights) in per_thread.items():
+            profiles.append({
+                'type': 'sampled',
+                'name': self._thread_name(ident),
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': round(sum(weights), 6),
+                'samples': stacks,
+                'weights': weights
+            })
+        profiles.sort(key=lambda profile: profile['endValue'], reverse=True)
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': f"workflow-orchestrator pid {os.getpid()} ({self.duration:.1f}s)",
+            'exporter': 'workflow-orchestrator',
+            'activeProfileIndex': 0,
+            'shared': {'frames': frames},
+            'profiles': profiles
+        }
+
+
+class SlowRequestRecorder:
+    """Keeps cProfile profiles of the last ``capacity`` slow requests"""
+
+    def __init__(self, threshold_ms: float = None, sample_rate: float = None, capacity: int = None):
+        self.threshold_ms = float(os.getenv("SLOW_REQUEST_PROFILE_MS", "0")) if threshold_ms is None else threshold_ms
+        self.sample_rate = float(os.getenv("SLOW_REQUEST_PROFILE_RATE", "1.0")) if sample_rate is None else sample_rate
+        capacity = int(os.getenv("SLOW_REQUEST_PROFILES", "20")) if capacity is None else capacity
+        self._profiles: deque = deque(maxlen=max(1, capacity))
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.profiled = 0
+        self.captured = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms > 0
+
+    def record(self, endpoint: str) -> Callable:
+        """Decorator profiling a view and keeping the profile when it ran slower than the threshold"""
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or (self.sample_rate < 1.0 and random.random() >= self.sample_rate):
+                    return func(*args, **kwargs)
+                profile = cProfile.Profile()
+                started = time.perf_counter()
+                try:
+                    # another profiler already active on this thread (e.g. a debugger)
+                    profile.enable()
+                except ValueError:
+                    return func(*args, **kwargs)
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    profile.disable()
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    if elapsed_ms >= self.threshold_ms:
+                        self._keep(endpoint, elapsed_ms, profile)
+                    else:
+                        with self._lock:
+                            self.profiled += 1
+            return wrapper
+        return decorator
+
+    def _keep(self, endpoint: str, elapsed_ms: float, profile: cProfile.Profile):
+        profile.create_stats()
+        entry = {
+            'id': next(self._ids),
+            'endpoint': endpoint,
+            'path': request.full_path.rstrip('?') if has_request_context() else endpoint,
+            'recorded_at': time.time(),
+            'duration_ms': round(elapsed_ms, 1),
+            'stats': profile.stats
+        }
+        with self._lock:
+            self._profiles.append(entry)
+            self.profiled += 1
+            self.captured += 1
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{key: value for key, value in entry.items() if key != 'stats'} for entry in reversed(self._profiles)]
+
+    def get(self, profile_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            for entry in self._profiles:
+                if entry['id'] == profile_id:
+                    return entry
+        return None
+
+    @staticmethod
+    def report(entry: Dict[str, Any], sort: str = 'cumulative', limit: int = 40) -> str:
+        """pstats text report of a kept profile"""
+        output = io.StringIO()
+        stats = pstats.Stats(_StatsSource(entry['stats']), stream=output)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+    @staticmethod
+    def dump(entry: Dict[str, Any]) -> bytes:
+        """The profile in ``pstats`` file format (for snakeviz, ``python -m pstats``)"""
+        return marshal.dumps(entry['stats'])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            kept = len(self._profiles)
+        return {
+            'enabled': self.enabled,
+            'threshold_ms': self.threshold_ms,
+            'sample_rate': self.sample_rate,
+            'profiled': self.profiled,
+            'captured': self.captured,
+            'kept': kept,
+            'capacity': self._profiles.maxlen
+        }
+
+
+class _StatsSource:
+    """Lets ``pstats.Stats`` load a stats dict without a profiler or file"""
+
+    def __init__(self, stats: Dict):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def admin_only(view: Callable) -> Callable:
+    """Restrict a view to callers presenting ``ADMIN_TOKEN``; 404 while no token is configured"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        token = os.getenv("ADMIN_TOKEN", "")
+        if not token:
+            abort(404)
+        presented = request.headers.get('X-Admin-Token', '')
+        authorization = request.headers.get('Authorization', '')
+        if authorization.startswith('Bearer '):
+            presented = authorization[len('Bearer '):].strip()
+        if not hmac.compare_digest(presented.encode('utf-8'), token.encode('utf-8')):
+            abort(403)
+        return view(*args, **kwargs)
+    return wrapper
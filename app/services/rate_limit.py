@@ -0,0 +1,223 @@
+"""
+Client-side rate limiting and adaptive concurrency for outbound calls.
+
+``TokenBucket`` enforces a request quota (e.g. Groq requests per minute),
+``AdaptiveConcurrencyLimiter`` adjusts the number of concurrent calls with an
+AIMD policy driven by observed latency and throttling responses, and
+``AdmissionController`` combines the two into a queue with a deadline.
+
+All three read time from an injectable ``clock`` (default ``time.monotonic``);
+deadlines are values of that clock.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+Clock = Callable[[], float]
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a request could not be admitted before its deadline"""
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at ``rate`` tokens per second"""
+
+    def __init__(self, rate: float, capacity: float, clock: Clock = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take tokens if available, without waiting"""
+        with self._lock:
+            self._refill(self._clock())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0, deadline: Optional[float] = None) -> bool:
+        """Wait for tokens until ``deadline`` (a value of the bucket's clock)"""
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            self._sleep(wait)
+
+    @property
+    def available(self) -> float:
+        with self._lock:
+            self._refill(self._clock())
+            return self._tokens
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD concurrency limit.
+
+    Every call that completes under ``latency_target`` grows the limit by
+    ``1 / limit`` (about +1 per window of calls); a throttled call or one over
+    the target shrinks it multiplicatively.
+    """
+
+    def __init__(self, initial_limit: int = 4, min_limit: int = 1, max_limit: int = 32,
+                 latency_target: float = 10.0, backoff_ratio: float = 0.5, slow_ratio: float = 0.9,
+                 clock: Clock = time.monotonic):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff_ratio = backoff_ratio
+        self.slow_ratio = slow_ratio
+        self._clock = clock
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._waiting = 0
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    def acquire(self, deadline: Optional[float] = None) -> bool:
+        """Wait for a concurrency slot until ``deadline``"""
+        with self._cond:
+            self._waiting += 1
+            try:
+                while self._in_flight >= self.limit:
+                    timeout = None if deadline is None else deadline - self._clock()
+                    if timeout is not None and timeout <= 0:
+                        return False
+                    self._cond.wait(timeout)
+                self._in_flight += 1
+                return True
+            finally:
+                self._waiting -= 1
+
+    def release(self, latency: Optional[float] = None, overloaded: bool = False):
+        """Free a slot and adapt the limit to the call's outcome"""
+        with self._cond:
+            self._in_flight -= 1
+            if overloaded:
+                self._limit = max(self.min_limit, self._limit * self.backoff_ratio)
+            elif latency is not None and latency > self.latency_target:
+                self._limit = max(self.min_limit, self._limit * self.slow_ratio)
+            elif latency is not None:
+                self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+            self._cond.notify_all()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'limit': self.limit,
+                'in_flight': self._in_flight,
+                'waiting': self._waiting
+            }
+
+
+class AdmissionTicket:
+    """Outcome of an admitted request"""
+
+    def __init__(self, queue_wait: float, started: float):
+        self.queue_wait = queue_wait
+        self.started = started
+        self.overloaded = False
+
+
+class AdmissionController:
+    """Queue requests behind a token bucket and an adaptive concurrency limit"""
+
+    def __init__(self, bucket: Optional[TokenBucket], limiter: AdaptiveConcurrencyLimiter,
+                 clock: Clock = time.monotonic):
+        self.bucket = bucket  # None: no request quota, only the concurrency limit
+        self.limiter = limiter
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._stats = {'admitted': 0, 'timed_out': 0, 'throttled': 0, 'queue_wait_total': 0.0}
+
+    @classmethod
+    def from_env(cls, prefix: str = "GROQ", requests_per_minute: str = "30",
+                 burst: str = "5") -> 'AdmissionController':
+        """Build a controller from ``<prefix>_REQUESTS_PER_MINUTE``, ``<prefix>_BURST``,
+        ``<prefix>_MAX_CONCURRENCY`` and ``<prefix>_LATENCY_TARGET``.
+
+        A requests-per-minute of 0 disables the token bucket. The quota is for
+        the whole server: every process gets an equal share of it, the number of
+        processes being ``WEB_CONCURRENCY`` (set by ``start.py --workers``).
+        """
+        processes = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+        rpm = float(os.getenv(f"{prefix}_REQUESTS_PER_MINUTE", requests_per_minute)) / processes
+        burst = max(1.0, float(os.getenv(f"{prefix}_BURST", burst)) / processes)
+        max_concurrency = int(os.getenv(f"{prefix}_MAX_CONCURRENCY", "16"))
+        latency_target = float(os.getenv(f"{prefix}_LATENCY_TARGET", "10"))
+        return cls(
+            TokenBucket(rate=rpm / 60.0, capacity=burst) if rpm > 0 else None,
+            AdaptiveConcurrencyLimiter(initial_limit=min(4, max_concurrency), max_limit=max_concurrency,
+                                       latency_target=latency_target)
+        )
+
+    @contextmanager
+    def admit(self, deadline: float):
+        """Wait for quota and a concurrency slot, then run the block.
+
+        Raises ``RateLimitTimeout`` if the deadline passes while queued. Set
+        ``ticket.overloaded`` inside the block when the upstream throttled the
+        call so the concurrency limit backs off.
+        """
+        queued_at = self._clock()
+        if not self.limiter.acquire(deadline):
+            self._count('timed_out')
+            raise RateLimitTimeout("Timed out waiting for an LLM concurrency slot")
+        if self.bucket is not None and not self.bucket.acquire(deadline=deadline):
+            self.limiter.release()
+            self._count('timed_out')
+            raise RateLimitTimeout("Timed out waiting for LLM rate limit quota")
+
+        started = self._clock()
+        ticket = AdmissionTicket(started - queued_at, started)
+        with self._lock:
+            self._stats['admitted'] += 1
+            self._stats['queue_wait_total'] += ticket.queue_wait
+        try:
+            yield ticket
+        except BaseException:
+            if ticket.overloaded:
+                self._count('throttled')
+                self.limiter.release(overloaded=True)
+            else:
+                self.limiter.release()
+            raise
+        else:
+            self.limiter.release(latency=self._clock() - ticket.started)
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        admitted = stats.pop('admitted')
+        queue_wait_total = stats.pop('queue_wait_total')
+        stats.update(self.limiter.snapshot())
+        stats['admitted'] = admitted
+        stats['avg_queue_wait_ms'] = round(queue_wait_total / admitted * 1000, 1) if admitted else 0.0
+        stats['tokens_available'] = round(self.bucket.available, 2) if self.bucket is not None else None
+        return stats
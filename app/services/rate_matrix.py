@@ -0,0 +1,62 @@
+"""
+The exchange rate matrix shared by payment settlement and currency conversion.
+
+``RateMatrix`` holds the rate between every pair of known currencies in one
+flat ``array``. It is built from reference rates (units per US dollar),
+overlaid with whatever live rates the conversion service has cached. A
+settlement batch looks up one column, e.g. every currency to USD, instead of
+converting payment by payment.
+"""
+
+from array import array
+from typing import Dict, Iterable, Optional, Tuple
+
+# Units per US dollar, used until a live rate is cached
+REFERENCE_USD_RATES = {'USD': 1.0, 'EUR': 0.85, 'GBP': 0.73, 'JPY': 110.0, 'CAD': 1.25,
+                       'AUD': 1.35, 'CHF': 0.92, 'CNY': 6.45, 'INR': 74.5}
+
+
+class RateMatrix:
+    """Immutable cross rates; ``rate(a, b)`` converts one unit of ``a`` into ``b``"""
+
+    __slots__ = ('currencies', 'index', 'rates', 'live_pairs')
+
+    def __init__(self, usd_rates: Dict[str, float], live: Dict[Tuple[str, str], float] = None):
+        live = live or {}
+        usd_rates = dict(usd_rates)
+        # live dollar rates move the currency's whole row and column
+        for (from_currency, to_currency), rate in live.items():
+            if from_currency == 'USD':
+                usd_rates[to_currency] = rate
+            elif to_currency == 'USD':
+                usd_rates[from_currency] = 1 / rate
+        self.currencies = tuple(sorted(usd_rates))
+        self.index = {currency: i for i, currency in enumerate(self.currencies)}
+        per_usd = [usd_rates[currency] for currency in self.currencies]
+        self.rates = array('d', (to / frm for frm in per_usd for to in per_usd))
+        # other live cross rates are taken as quoted, and their inverse unless that is quoted too
+        size = len(self.currencies)
+        for (from_currency, to_currency), rate in live.items():
+            if from_currency in self.index and to_currency in self.index:
+                i, j = self.index[from_currency], self.index[to_currency]
+                self.rates[i * size + j] = rate
+                if (to_currency, from_currency) not in live:
+                    self.rates[j * size + i] = 1 / rate
+        self.live_pairs = len(live)
+
+    def rate(self, from_currency: str, to_currency: str) -> Optional[float]:
+        """None when either currency is unknown"""
+        i, j = self.index.get(from_currency), self.index.get(to_currency)
+        if i is None or j is None:
+            return None
+        return self.rates[i * len(self.currencies) + j]
+
+    def column(self, to_currency: str) -> array:
+        """Rates from every currency (in ``currencies`` order) into ``to_currency``"""
+        j = self.index[to_currency]
+        return self.rates[j::len(self.currencies)]
+
+    def indices(self, currencies: Iterable[str], default: str = 'USD') -> array:
+        """Matrix positions of ``currencies``; unknown ones trade at par with ``default``"""
+        fallback = self.index[default]
+        return array('l', (self.index.get(currency, fallback) for currency in currencies))
@@ -0,0 +1,411 @@
+"""
+Sagas: multi-step workflows whose completed steps are undone when a later one fails.
+
+A ``Saga`` is an ordered list of ``SagaStep``. Each step has an action and,
+optionally, a compensating action (refund a payment, restore a wallet, cancel
+an order). ``SagaEngine.run`` executes the actions in order. When a *critical*
+step fails, the completed steps are compensated in reverse order:
+
+- a step's compensation starts only after the compensations of every
+  completed step that ``depends_on`` it have finished; by default a step
+  depends on all earlier steps, which gives strict reverse order
+- compensations whose steps do not depend on each other run concurrently
+- a failing compensation is retried (``compensation_attempts``); if it keeps
+  failing the saga ends ``failed`` and can be resumed later
+
+Every step outcome is checkpointed in SQLite (``SAGA_PATH``, default
+``data/sagas.sqlite3`` in the repository) before the next one starts. After a
+crash, ``resume_incomplete`` compensates any saga that was still running or
+compensating and skips the undo steps that had already completed. Only sagas
+untouched for ``SAGA_RESUME_AFTER_SECONDS`` are resumed, and each is claimed
+first, so a process never takes over a saga another one is still running.
+A saga is resumed at most ``SAGA_RESUME_ATTEMPTS`` times; after that it is
+left ``failed`` for an operator instead of being retried on every start.
+Only the ``SAGA_RETENTION`` most recently finished (completed or compensated)
+sagas are kept; older ones are deleted with their steps as new ones finish.
+Saga contexts and step results must be JSON-serialisable.
+
+Configuration (environment):
+
+- ``SAGA_PATH``                   SQLite file
+- ``SAGA_COMPENSATION_WORKERS``   threads running compensations (default 4)
+- ``SAGA_COMPENSATION_ATTEMPTS``  attempts per compensation (default 3)
+- ``SAGA_RESUME_AFTER_SECONDS``   age of an unfinished saga before it is resumed (default 60)
+- ``SAGA_RESUME_ATTEMPTS``        resumes of one saga before giving up (default 5)
+- ``SAGA_RETENTION``              finished sagas kept in the log (default 10000)
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    from .base_service import ServiceResult
+    from .tracing import propagating, span
+except ImportError:
+    from base_service import ServiceResult
+    from tracing import propagating, span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = Path(__file__).resolve().parent.parent.parent / "data" / "sagas.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sagas (
+    id          TEXT PRIMARY KEY,
+    name        TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    context     TEXT NOT NULL,
+    failed_step TEXT,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sagas_status ON sagas (status);
+CREATE TABLE IF NOT EXISTS saga_steps (
+    saga_id     TEXT NOT NULL,
+    step        TEXT NOT NULL,
+    position    INTEGER NOT NULL,
+    status      TEXT NOT NULL,
+    result      TEXT,
+    compensation TEXT,
+    updated_at  REAL NOT NULL,
+    PRIMARY KEY (saga_id, step)
+);
+"""
+
+# saga statuses
+RUNNING, COMPENSATING, COMPLETED, COMPENSATED, FAILED = 'running', 'compensating', 'completed', 'compensated', 'failed'
+# step statuses
+DONE, STEP_FAILED, UNDONE, UNDO_FAILED = 'done', 'failed', 'compensated', 'compensation_failed'
+
+Action = Callable[[Dict[str, Any], Dict[str, ServiceResult]], ServiceResult]
+Compensation = Callable[[Dict[str, Any], ServiceResult], ServiceResult]
+
+
+@dataclass(slots=True)
+class SagaStep:
+    """One saga step.
+
+    ``action(context, results)`` gets the results of the earlier steps by name;
+    ``compensate(context, result)`` gets the step's own result. ``depends_on``
+    names the earlier steps whose compensation must wait for this one's (None:
+    all earlier steps). A failed non-critical step is recorded and the saga
+    carries on.
+    """
+    name: str
+    action: Action
+    compensate: Optional[Compensation] = None
+    depends_on: Optional[Tuple[str, ...]] = None
+    critical: bool = True
+
+
+@dataclass(slots=True)
+class Saga:
+    name: str
+    steps: List[SagaStep]
+
+    def step(self, name: str) -> SagaStep:
+        return next(step for step in self.steps if step.name == name)
+
+    def dependencies(self, name: str) -> Tuple[str, ...]:
+        names = [step.name for step in self.steps]
+        step = self.step(name)
+        return tuple(names[:names.index(name)]) if step.depends_on is None else step.depends_on
+
+
+@dataclass(slots=True)
+class SagaOutcome:
+    saga_id: str
+    status: str
+    results: Dict[str, ServiceResult] = field(default_factory=dict)
+    compensations: Dict[str, ServiceResult] = field(default_factory=dict)
+    failed_step: Optional[str] = None
+
+    def __json__(self) -> Dict[str, Any]:
+        return {'saga_id': self.saga_id, 'status': self.status, 'failed_step': self.failed_step,
+                'compensations': self.compensations}
+
+
+def _dump(result: Optional[ServiceResult]) -> Optional[str]:
+    return json.dumps(result.__json__(), default=str) if result is not None else None
+
+
+def _load(text: Optional[str]) -> Optional[ServiceResult]:
+    if not text:
+        return None
+    fields = json.loads(text)
+    return ServiceResult(fields['success'], fields.get('data'), fields.get('error_message'), fields.get('retry_count', 0))
+
+
+class SagaLog:
+    """SQLite checkpoints of saga progress; safe to share between threads"""
+
+    def __init__(self, path: str = None, retention: int = None):
+        self.path = str(path or os.getenv("SAGA_PATH", DEFAULT_PATH))
+        self.retention = max(1, int(os.getenv("SAGA_RETENTION", "10000")) if retention is None else retention)
+        if self.path != ':memory:':
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.executescript(SCHEMA)
+            # logs written before resumes were counted
+            if 'attempts' not in {row[1] for row in connection.execute("PRAGMA table_info(sagas)")}:
+                connection.execute("ALTER TABLE sagas ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def start(self, saga_id: str, name: str, context: Dict[str, Any]):
+        now = time.time()
+        self._connection().execute(
+            "INSERT INTO sagas (id, name, status, context, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (saga_id, name, RUNNING, json.dumps(context, default=str), now, now))
+
+    def set_status(self, saga_id: str, status: str, failed_step: str = None):
+        self._connection().execute(
+            "UPDATE sagas SET status = ?, failed_step = COALESCE(?, failed_step), updated_at = ? WHERE id = ?",
+            (status, failed_step, time.time(), saga_id))
+        if status in (COMPLETED, COMPENSATED):
+            self._prune()
+
+    def _prune(self):
+        """Delete the oldest finished sagas beyond ``retention``"""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            excess = connection.execute("SELECT COUNT(*) FROM sagas WHERE status IN (?, ?)",
+                                        (COMPLETED, COMPENSATED)).fetchone()[0] - self.retention
+            if excess > 0:
+                oldest = ("SELECT id FROM sagas WHERE status IN (?, ?) ORDER BY updated_at LIMIT ?",
+                          (COMPLETED, COMPENSATED, excess))
+                connection.execute(f"DELETE FROM saga_steps WHERE saga_id IN ({oldest[0]})", oldest[1])
+                connection.execute(f"DELETE FROM sagas WHERE id IN ({oldest[0]})", oldest[1])
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def record_step(self, saga_id: str, step: str, position: int, status: str, result: ServiceResult):
+        # touching the saga keeps claim_stale away from one that is still making progress
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "INSERT OR REPLACE INTO saga_steps (saga_id, step, position, status, result, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)", (saga_id, step, position, status, _dump(result), now))
+            connection.execute("UPDATE sagas SET updated_at = ? WHERE id = ?", (now, saga_id))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def record_compensation(self, saga_id: str, step: str, status: str, compensation: ServiceResult):
+        self._connection().execute(
+            "UPDATE saga_steps SET status = ?, compensation = ?, updated_at = ? WHERE saga_id = ? AND step = ?",
+            (status, _dump(compensation), time.time(), saga_id, step))
+
+    def load(self, saga_id: str) -> Optional[Dict[str, Any]]:
+        connection = self._connection()
+        row = connection.execute("SELECT name, status, context, failed_step, attempts FROM sagas WHERE id = ?",
+                                 (saga_id,)).fetchone()
+        if row is None:
+            return None
+        steps = connection.execute(
+            "SELECT step, status, result, compensation FROM saga_steps WHERE saga_id = ? ORDER BY position",
+            (saga_id,)).fetchall()
+        return {
+            'saga_id': saga_id, 'name': row[0], 'status': row[1], 'context': json.loads(row[2]), 'failed_step': row[3],
+            'attempts': row[4],
+            'steps': {step: {'status': status, 'result': _load(result), 'compensation': _load(compensation)}
+                      for step, status, result, compensation in steps}
+        }
+
+    def claim_stale(self, older_than: float, max_attempts: int) -> Tuple[List[str], int]:
+        """Unfinished sagas not updated for ``older_than`` seconds and resumed fewer than
+        ``max_attempts`` times, each claimed by touching it and counting the attempt.
+
+        Also returns how many stale sagas had used up their attempts; those still
+        running or compensating are marked failed.
+        """
+        connection = self._connection()
+        now = time.time()
+        exhausted = connection.execute(
+            "UPDATE sagas SET status = ? WHERE status IN (?, ?) AND updated_at <= ? AND attempts >= ?",
+            (FAILED, RUNNING, COMPENSATING, now - older_than, max_attempts)).rowcount
+        rows = connection.execute(
+            "SELECT id, updated_at FROM sagas WHERE status IN (?, ?, ?) AND updated_at <= ? AND attempts < ? "
+            "ORDER BY created_at", (RUNNING, COMPENSATING, FAILED, now - older_than, max_attempts)).fetchall()
+        claimed = []
+        for saga_id, updated_at in rows:
+            # only one process wins the conditional update
+            if connection.execute("UPDATE sagas SET updated_at = ?, attempts = attempts + 1 "
+                                  "WHERE id = ? AND updated_at = ?", (now, saga_id, updated_at)).rowcount:
+                claimed.append(saga_id)
+        return claimed, exhausted
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM sagas GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+
+class SagaEngine:
+    """Runs registered sagas and compensates them, checkpointing every step"""
+
+    def __init__(self, log: SagaLog, workers: int = None, compensation_attempts: int = None,
+                 resume_attempts: int = None):
+        self.log = log
+        workers = int(os.getenv("SAGA_COMPENSATION_WORKERS", "4")) if workers is None else workers
+        self.compensation_attempts = (int(os.getenv("SAGA_COMPENSATION_ATTEMPTS", "3"))
+                                      if compensation_attempts is None else compensation_attempts)
+        self.resume_attempts = max(1, int(os.getenv("SAGA_RESUME_ATTEMPTS", "5"))
+                                   if resume_attempts is None else resume_attempts)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='saga-compensation')
+        self._sagas: Dict[str, Saga] = {}
+        self._lock = threading.Lock()
+        self._stats = {'started': 0, 'completed': 0, 'compensated': 0, 'failed': 0, 'resumed': 0,
+                       'given_up': 0, 'compensations_run': 0, 'compensations_skipped': 0}
+
+    def register(self, saga: Saga):
+        self._sagas[saga.name] = saga
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def run(self, name: str, context: Dict[str, Any]) -> SagaOutcome:
+        """Run saga ``name`` forward; compensate it if a critical step fails"""
+        saga = self._sagas[name]
+        outcome = SagaOutcome(str(uuid.uuid4()), RUNNING)
+        self.log.start(outcome.saga_id, name, context)
+        self._count('started')
+        for position, step in enumerate(saga.steps):
+            try:
+                result = step.action(context, outcome.results)
+            except Exception as e:
+                logger.error("Saga %s step %s raised: %s", outcome.saga_id, step.name, e)
+                result = ServiceResult(False, error_message=f"{type(e).__name__}: {e}")
+            outcome.results[step.name] = result
+            self.log.record_step(outcome.saga_id, step.name, position, DONE if result.success else STEP_FAILED, result)
+            if not result.success and step.critical:
+                outcome.failed_step = step.name
+                done = {name: result for name, result in outcome.results.items() if result.success}
+                return self._compensate(saga, outcome, context, done, already_undone=set())
+
+        self.log.set_status(outcome.saga_id, COMPLETED)
+        outcome.status = COMPLETED
+        self._count('completed')
+        return outcome
+
+    def _compensate(self, saga: Saga, outcome: SagaOutcome, context: Dict[str, Any],
+                    done: Dict[str, ServiceResult], already_undone: set) -> SagaOutcome:
+        self.log.set_status(outcome.saga_id, COMPENSATING, outcome.failed_step)
+        outcome.status = COMPENSATING
+        pending = {name for name in done if name not in already_undone and saga.step(name).compensate is not None}
+        self._count('compensations_skipped', len(already_undone))
+        failed = False
+        with span("saga.compensate", {'saga.name': saga.name, 'saga.id': outcome.saga_id,
+                                      'saga.failed_step': outcome.failed_step or ''}):
+            while pending and not failed:
+                # steps no other pending compensation is waiting on
+                blocked = {dependency for name in pending for dependency in saga.dependencies(name)}
+                wave = sorted(pending - blocked) or sorted(pending)
+                futures = {name: self._executor.submit(propagating(self._undo), saga, outcome.saga_id, context,
+                                                       name, done[name]) for name in wave}
+                for name, future in futures.items():
+                    compensation = future.result()
+                    outcome.compensations[name] = compensation
+                    failed = failed or not compensation.success
+                pending.difference_update(wave)
+
+        outcome.status = FAILED if failed else COMPENSATED
+        self.log.set_status(outcome.saga_id, outcome.status)
+        self._count('failed' if failed else 'compensated')
+        return outcome
+
+    def _undo(self, saga: Saga, saga_id: str, context: Dict[str, Any], name: str,
+              result: ServiceResult) -> ServiceResult:
+        step = saga.step(name)
+        compensation = ServiceResult(False, error_message="not attempted")
+        for attempt in range(max(1, self.compensation_attempts)):
+            try:
+                compensation = step.compensate(context, result)
+            except Exception as e:
+                compensation = ServiceResult(False, error_message=f"{type(e).__name__}: {e}")
+            if compensation.success:
+                break
+            logger.warning("Saga %s: compensating %s failed (attempt %d): %s",
+                           saga_id, name, attempt + 1, compensation.error_message)
+            time.sleep(min(2.0, 0.1 * 2 ** attempt))
+        self.log.record_compensation(saga_id, name, UNDONE if compensation.success else UNDO_FAILED, compensation)
+        self._count('compensations_run')
+        return compensation
+
+    def resume(self, saga_id: str) -> Optional[SagaOutcome]:
+        """Finish compensating a saga left running, compensating or failed"""
+        state = self.log.load(saga_id)
+        if state is None or state['name'] not in self._sagas or state['status'] in (COMPLETED, COMPENSATED):
+            return None
+        saga = self._sagas[state['name']]
+        outcome = SagaOutcome(saga_id, state['status'], failed_step=state['failed_step'] or 'interrupted')
+        done, undone = {}, set()
+        for name, step_state in state['steps'].items():
+            outcome.results[name] = step_state['result']
+            if step_state['status'] in (DONE, UNDONE, UNDO_FAILED) and step_state['result'] is not None \
+                    and step_state['result'].success:
+                done[name] = step_state['result']
+            if step_state['status'] == UNDONE:
+                undone.add(name)
+                outcome.compensations[name] = step_state['compensation']
+        self._count('resumed')
+        logger.info("Resuming saga %s (%s, attempt %d): %d steps to compensate, %d already compensated",
+                    saga_id, state['name'], state['attempts'], len(set(done) - undone), len(undone))
+        outcome = self._compensate(saga, outcome, state['context'], done, undone)
+        if outcome.status == FAILED and state['attempts'] >= self.resume_attempts:
+            logger.error("Saga %s still failed after %d resumes, giving up", saga_id, state['attempts'])
+            self._count('given_up')
+        return outcome
+
+    def resume_incomplete(self, older_than: float = None) -> List[SagaOutcome]:
+        """Resume every saga left unfinished (by a crashed process) for ``older_than`` seconds"""
+        older_than = float(os.getenv("SAGA_RESUME_AFTER_SECONDS", "60")) if older_than is None else older_than
+        outcomes = []
+        claimed, exhausted = self.log.claim_stale(older_than, self.resume_attempts)
+        if exhausted:
+            logger.error("%d unfinished sagas used up their %d resume attempts and were marked failed",
+                         exhausted, self.resume_attempts)
+            self._count('given_up', exhausted)
+        for saga_id in claimed:
+            try:
+                outcome = self.resume(saga_id)
+            except Exception as e:
+                logger.error("Could not resume saga %s: %s", saga_id, e)
+                continue
+            if outcome is not None:
+                outcomes.append(outcome)
+        return outcomes
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            report = dict(self._stats)
+        report['sagas'] = self.log.counts()
+        return report
@@ -0,0 +1,267 @@
+"""
+Batched settlement of authorized payments.
+
+``PaymentProcessingService.execute`` only *authorizes* a payment: a velocity
+check and a payment id. It then hands the payment to a ``SettlementPipeline``.
+A background worker settles whatever is waiting every
+``SETTLEMENT_INTERVAL_SECONDS``, or as soon as ``SETTLEMENT_BATCH_SIZE``
+payments have queued. For each batch it:
+
+- takes one ``RateMatrix`` snapshot, so every payment in the batch is
+  normalised to USD at the same rates
+- computes fees, net amounts and USD amounts a column at a time over the
+  batch (``array`` columns and ``map``), not payment by payment
+- writes the ledger entries and a batch record to SQLite in one transaction
+
+Refunds are queued the same way and settle as negative ledger entries. A
+payment and its refund each settle once: re-queued entries are ignored.
+
+Payments authorized but not yet settled live in memory. ``shutdown`` settles
+them, but a crash loses them (the authorizations themselves are in memory too).
+
+Configuration (environment):
+
+- ``SETTLEMENT_PATH``              SQLite ledger (default ``data/settlements.sqlite3`` in the repository)
+- ``SETTLEMENT_BATCH_SIZE``        settle as soon as this many entries wait (default 500)
+- ``SETTLEMENT_INTERVAL_SECONDS``  settle at least this often (default 2)
+- ``SETTLEMENT_FEE_RATE``          processing fee per charge (default 0.029)
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from array import array
+from collections import deque
+from dataclasses import dataclass
+from itertools import compress
+from operator import mul, sub
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from .metrics import Counter, Histogram
+    from .rate_matrix import RateMatrix
+except ImportError:
+    from metrics import Counter, Histogram
+    from rate_matrix import RateMatrix
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = Path(__file__).resolve().parent.parent.parent / "data" / "settlements.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS settlement_entries (
+    payment_id    TEXT NOT NULL,
+    kind          TEXT NOT NULL,
+    batch_id      TEXT NOT NULL,
+    customer_id   TEXT NOT NULL,
+    amount        REAL NOT NULL,
+    currency      TEXT NOT NULL,
+    fee           REAL NOT NULL,
+    net           REAL NOT NULL,
+    usd_rate      REAL NOT NULL,
+    usd_amount    REAL NOT NULL,
+    usd_fee       REAL NOT NULL,
+    authorized_at REAL NOT NULL,
+    settled_at    REAL NOT NULL,
+    PRIMARY KEY (payment_id, kind)
+);
+CREATE TABLE IF NOT EXISTS settlement_batches (
+    batch_id    TEXT PRIMARY KEY,
+    entries     INTEGER NOT NULL,
+    usd_amount  REAL NOT NULL,
+    usd_fees    REAL NOT NULL,
+    started_at  REAL NOT NULL,
+    settled_at  REAL NOT NULL
+);
+"""
+
+BATCH_SIZE = Histogram('settlement_batch_entries', 'Ledger entries per settlement batch',
+                       buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500))
+SETTLEMENT_LAG = Histogram('settlement_lag_seconds', 'Time from authorization to settlement')
+SETTLED = Counter('settlement_entries_total', 'Settled ledger entries by kind', ['kind'])
+
+
+@dataclass(slots=True)
+class PendingEntry:
+    payment_id: str
+    kind: str  # charge or refund
+    customer_id: str
+    amount: float  # negative for refunds
+    currency: str
+    authorized_at: float
+
+
+class SettlementPipeline:
+    """Queues authorized payments and settles them in batches on a background thread.
+
+    With ``background=False`` nothing settles until ``settle_pending`` is called.
+    """
+
+    def __init__(self, rates: Callable[[], RateMatrix], path: str = None, batch_size: int = None,
+                 interval: float = None, fee_rate: float = None, background: bool = True):
+        self.rates = rates
+        self.background = background
+        self.path = str(path or os.getenv("SETTLEMENT_PATH", DEFAULT_PATH))
+        if self.path != ':memory:':
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = max(1, int(os.getenv("SETTLEMENT_BATCH_SIZE", "500")) if batch_size is None else batch_size)
+        self.interval = float(os.getenv("SETTLEMENT_INTERVAL_SECONDS", "2")) if interval is None else interval
+        self.fee_rate = float(os.getenv("SETTLEMENT_FEE_RATE", "0.029")) if fee_rate is None else fee_rate
+        self._connection = sqlite3.connect(self.path, timeout=10.0, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+        self._db_lock = threading.Lock()
+        self._queue: deque = deque()
+        self._queued: Dict[str, PendingEntry] = {}  # "payment_id:kind" -> entry, for status lookups
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self._stats = {'batches': 0, 'charges': 0, 'refunds': 0, 'duplicates': 0, 'usd_settled': 0.0,
+                       'usd_fees': 0.0, 'last_batch_entries': 0, 'last_batch_ms': 0.0, 'max_lag_seconds': 0.0}
+
+    def start(self):
+        """Start the settlement worker of this process (again after a fork)"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='settlement', daemon=True)
+            self._thread.start()
+
+    def submit(self, payment_id: str, customer_id: str, amount: float, currency: str, kind: str = 'charge'):
+        """Queue a charge (or a refund, with a positive ``amount``) for the next batch"""
+        if self.background and self._pid != os.getpid():
+            self.start()
+        entry = PendingEntry(payment_id, kind, customer_id, -amount if kind == 'refund' else amount,
+                             currency, time.time())
+        with self._lock:
+            self._queue.append(entry)
+            self._queued[f"{payment_id}:{kind}"] = entry
+            full = len(self._queue) >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.settle_pending()
+
+    def settle_pending(self) -> int:
+        """Settle everything queued, in batches; returns the number of entries settled"""
+        settled = 0
+        while True:
+            with self._lock:
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            if not batch:
+                return settled
+            try:
+                settled += self._settle(batch)
+            except Exception as e:
+                logger.error("Settlement batch of %d entries failed, requeued: %s", len(batch), e)
+                with self._lock:
+                    self._queue.extendleft(reversed(batch))
+                return settled
+
+    def _settle(self, batch: List[PendingEntry]) -> int:
+        started = time.time()
+        batch_id = str(uuid.uuid4())
+        matrix = self.rates()
+
+        # columns over the whole batch
+        amounts = array('d', (entry.amount for entry in batch))
+        fee_rates = array('d', (self.fee_rate if entry.kind == 'charge' else 0.0 for entry in batch))
+        usd_rates = array('d', map(matrix.column('USD').__getitem__, matrix.indices(entry.currency for entry in batch)))
+        fees = array('d', (round(fee, 2) for fee in map(mul, amounts, fee_rates)))
+        nets = array('d', map(sub, amounts, fees))
+        usd_amounts = array('d', (round(value, 2) for value in map(mul, amounts, usd_rates)))
+        usd_fees = array('d', (round(value, 2) for value in map(mul, fees, usd_rates)))
+
+        settled_at = time.time()
+        rows = [(entry.payment_id, entry.kind, batch_id, entry.customer_id, entry.amount, entry.currency,
+                 fees[i], round(nets[i], 2), usd_rates[i], usd_amounts[i], usd_fees[i], entry.authorized_at, settled_at)
+                for i, entry in enumerate(batch)]
+        with self._db_lock:
+            connection = self._connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                # an entry settled by an earlier batch is ignored, and left out of this batch's totals
+                inserted = [connection.execute(
+                    "INSERT OR IGNORE INTO settlement_entries (payment_id, kind, batch_id, customer_id, amount, "
+                    "currency, fee, net, usd_rate, usd_amount, usd_fee, authorized_at, settled_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row).rowcount == 1 for row in rows]
+                usd_amount = round(sum(compress(usd_amounts, inserted)), 2)
+                usd_fee = round(sum(compress(usd_fees, inserted)), 2)
+                connection.execute(
+                    "INSERT INTO settlement_batches (batch_id, entries, usd_amount, usd_fees, started_at, settled_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", (batch_id, sum(inserted), usd_amount, usd_fee, started, settled_at))
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+
+        lags = [settled_at - entry.authorized_at for entry in batch]
+        BATCH_SIZE.observe(len(batch))
+        SETTLEMENT_LAG.labels().observe_many(lags)
+        new = list(compress(batch, inserted))
+        refunds = sum(1 for entry in new if entry.kind == 'refund')
+        SETTLED.labels('charge').inc(len(new) - refunds)
+        SETTLED.labels('refund').inc(refunds)
+        with self._lock:
+            for entry in batch:
+                key = f"{entry.payment_id}:{entry.kind}"
+                if self._queued.get(key) is entry:
+                    del self._queued[key]
+            self._stats['batches'] += 1
+            self._stats['charges'] += len(new) - refunds
+            self._stats['refunds'] += refunds
+            self._stats['duplicates'] += len(batch) - len(new)
+            self._stats['usd_settled'] = round(self._stats['usd_settled'] + usd_amount, 2)
+            self._stats['usd_fees'] = round(self._stats['usd_fees'] + usd_fee, 2)
+            self._stats['last_batch_entries'] = len(batch)
+            self._stats['last_batch_ms'] = round((time.time() - started) * 1000, 2)
+            self._stats['max_lag_seconds'] = round(max(self._stats['max_lag_seconds'], max(lags)), 3)
+        return len(batch)
+
+    def status(self, payment_id: str) -> Optional[Dict[str, Any]]:
+        """Settlement of a payment (and its refund, if any); None if it was never queued"""
+        with self._lock:
+            queued = [entry for kind in ('charge', 'refund')
+                      if (entry := self._queued.get(f"{payment_id}:{kind}")) is not None]
+        with self._db_lock:
+            rows = self._connection.execute(
+                "SELECT kind, batch_id, customer_id, amount, currency, fee, net, usd_rate, usd_amount, usd_fee, "
+                "authorized_at, settled_at FROM settlement_entries WHERE payment_id = ? ORDER BY settled_at",
+                (payment_id,)).fetchall()
+        if not rows and not queued:
+            return None
+        columns = ('kind', 'batch_id', 'customer_id', 'amount', 'currency', 'fee', 'net', 'usd_rate',
+                   'usd_amount', 'usd_fee', 'authorized_at', 'settled_at')
+        entries = [dict(zip(columns, row), status='settled') for row in rows]
+        entries += [{'kind': entry.kind, 'customer_id': entry.customer_id, 'amount': entry.amount,
+                     'currency': entry.currency, 'authorized_at': entry.authorized_at, 'status': 'pending'}
+                    for entry in queued]
+        return {'payment_id': payment_id, 'status': 'pending' if queued else 'settled', 'entries': entries}
+
+    def shutdown(self, wait: bool = True, timeout: float = 5.0):
+        """Stop the worker and settle what is still queued"""
+        self._stop.set()
+        self._wakeup.set()
+        if wait and self._thread is not None:
+            self._thread.join(timeout)
+        self.settle_pending()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            report = dict(self._stats, queued=len(self._queue))
+            oldest = self._queue[0].authorized_at if self._queue else None
+        report.update(oldest_queued_seconds=round(time.time() - oldest, 3) if oldest else 0.0,
+                      batch_size=self.batch_size, interval_seconds=self.interval, fee_rate=self.fee_rate)
+        return report
@@ -0,0 +1,177 @@
+"""
+Precompressed, fingerprinted static assets for the web UI.
+
+Everything under ``app/static`` is read once at startup, content-hashed and
+compressed (gzip, plus brotli when the ``brotli`` module is installed). Assets
+are served under fingerprinted URLs (``/static/js/app.<hash>.js``) with
+``Cache-Control: immutable``; the index page is rendered once with those URLs
+and revalidated with a strong ETag, so repeat loads cost a 304 and no request
+does template or compression work.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from typing import Dict
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Content types worth compressing; images and fonts are already compressed
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+
+class StaticAsset:
+    """One asset and its precompressed representations"""
+
+    def __init__(self, path: str, body: bytes, content_type: str, compress_min_size: int = 512):
+        self.path = path
+        self.content_type = content_type
+        self.digest = hashlib.sha256(body).hexdigest()[:16]
+        # encoding -> (body, strong etag); each representation needs its own strong ETag
+        self.representations: Dict[str, tuple] = {'identity': (body, f'"{self.digest}"')}
+
+        if len(body) >= compress_min_size and content_type.startswith(COMPRESSIBLE_TYPES):
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                self.representations['gzip'] = (compressed, f'"{self.digest}-gz"')
+            if brotli is not None:
+                compressed = brotli.compress(body, quality=11)
+                if len(compressed) < len(body):
+                    self.representations['br'] = (compressed, f'"{self.digest}-br"')
+
+    @property
+    def fingerprinted_path(self) -> str:
+        stem, ext = os.path.splitext(self.path)
+        return f"{stem}.{self.digest[:10]}{ext}"
+
+    def select(self, accept_encoding: str) -> str:
+        """Best available encoding for an ``Accept-Encoding`` header"""
+        accepted = set()
+        for part in accept_encoding.split(','):
+            token, _, params = part.strip().partition(';')
+            if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+                continue
+            accepted.add(token.strip().lower())
+        for encoding in ('br', 'gzip'):
+            if encoding in self.representations and (encoding in accepted or '*' in accepted):
+                return encoding
+        return 'identity'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    candidates = {tag.strip()[2:] if tag.strip().startswith('W/') else tag.strip()
+                  for tag in if_none_match.split(',')}
+    return etag in candidates
+
+
+class StaticAssets:
+    """Serves a directory of static files from memory"""
+
+    def __init__(self, root: str, url_prefix: str = '/static', compress_min_size: int = 512):
+        self.root = root
+        self.url_prefix = url_prefix.rstrip('/')
+        self.compress_min_size = compress_min_size
+        self._assets: Dict[str, StaticAsset] = {}
+        self._by_url_path: Dict[str, StaticAsset] = {}
+        self._lock = threading.Lock()
+        self._stats = {'served': 0, 'not_modified': 0, 'compressed': 0}
+        self.load()
+
+    def load(self):
+        """(Re)read every file under ``root``"""
+        assets = {}
+        for directory, _, files in os.walk(self.root):
+            for filename in files:
+                full_path = os.path.join(directory, filename)
+                relative = os.path.relpath(full_path, self.root).replace(os.sep, '/')
+                with open(full_path, 'rb') as f:
+                    body = f.read()
+                assets[relative] = StaticAsset(relative, body, self._content_type(relative), self.compress_min_size)
+
+        by_url_path = {}
+        for asset in assets.values():
+            by_url_path[asset.path] = asset
+            by_url_path[asset.fingerprinted_path] = asset
+        self._assets, self._by_url_path = assets, by_url_path
+
+    @staticmethod
+    def _content_type(path: str) -> str:
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type == 'application/javascript':
+            content_type += '; charset=utf-8'
+        return content_type
+
+    def url_for(self, path: str) -> str:
+        """Fingerprinted URL of an asset, e.g. ``/static/js/app.1a2b3c4d5e.js``"""
+        asset = self._assets.get(path)
+        if asset is None:
+            raise KeyError(f"Unknown static asset: {path}")
+        return f"{self.url_prefix}/{asset.fingerprinted_path}"
+
+    def page(self, body: str, content_type: str = 'text/html; charset=utf-8') -> StaticAsset:
+        """Wrap an already rendered page so it is served like an asset"""
+        return StaticAsset('index.html', body.encode('utf-8'), content_type, self.compress_min_size)
+
+    def respond(self, asset: StaticAsset, cache_control: str) -> Response:
+        """Serve ``asset`` honouring ``Accept-Encoding`` and ``If-None-Match``"""
+        encoding = asset.select(request.headers.get('Accept-Encoding', ''))
+        body, etag = asset.representations[encoding]
+        headers = {'ETag': etag, 'Cache-Control': cache_control}
+        if len(asset.representations) > 1:
+            headers['Vary'] = 'Accept-Encoding'
+
+        if _etag_matches(request.headers.get('If-None-Match', ''), etag):
+            self._count('not_modified')
+            return Response(status=304, headers=headers)
+
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+            self._count('compressed')
+        self._count('served')
+        response = Response(body, status=200, headers=headers, content_type=asset.content_type)
+        response.direct_passthrough = True
+        return response
+
+    def serve(self, filename: str) -> Response:
+        asset = self._by_url_path.get(filename)
+        if asset is None:
+            return Response("Not Found", status=404, content_type='text/plain')
+        # only fingerprinted URLs can be cached forever; the plain path may change
+        immutable = filename == asset.fingerprinted_path
+        return self.respond(asset, IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL)
+
+    def register(self, app, endpoint: str = 'static'):
+        """Add the ``<url_prefix>/<path:filename>`` route to a Flask app"""
+        app.add_url_rule(f"{self.url_prefix}/<path:filename>", endpoint=endpoint, view_func=self.serve)
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['assets'] = len(self._assets)
+        stats['bytes'] = sum(len(a.representations['identity'][0]) for a in self._assets.values())
+        return stats
+
+
+def render_index(app, assets: StaticAssets, template: str = 'index.html') -> StaticAsset:
+    """Render ``template`` once with fingerprinted asset URLs"""
+    body = app.jinja_env.get_template(template).render(asset_url=assets.url_for)
+    return assets.page(body)
@@ -0,0 +1,152 @@
+"""
+Low-overhead logging setup for the services.
+
+Log calls pass a %-style message plus arguments, and the request thread only
+puts the unformatted record on a queue (``DeferredQueueHandler``). A
+``QueueListener`` thread formats it and writes it out, so neither formatting
+nor I/O happens on the request path, and level-gated calls cost a single
+``isEnabledFor`` check.
+
+Configuration (environment):
+
+- ``LOG_LEVEL``         root level (default ``INFO``)
+- ``LOG_FORMAT``        ``text`` (default) or ``json`` (one object per line)
+- ``LOG_ASYNC``         ``1`` (default) to log through the queue, ``0`` to log inline
+- ``LOG_SAMPLE_RATE``   fraction of successful service operations logged (default ``1.0``)
+- ``LOG_SAMPLE_RATES``  per-service overrides, e.g. ``OrderCreationService=0.1,SMSNotificationService=0``
+
+Failures are never sampled out.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+TEXT_FORMAT = "%(levelname)s:%(name)s:%(message)s"
+
+# LogRecord attributes that are not structured fields
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record, including structured ``extra`` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Queue handler that leaves formatting to the listener thread.
+
+    ``QueueHandler.prepare`` formats the record so it can be pickled across
+    processes; within one process the record can be queued as is. Callers must
+    not mutate objects passed as log arguments after the call.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """Parse ``Name=rate,Name=rate`` into a dict"""
+    rates = {}
+    for part in spec.split(','):
+        name, _, rate = part.partition('=')
+        if name.strip() and rate.strip():
+            rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+_default_sample_rate = min(1.0, max(0.0, float(os.getenv("LOG_SAMPLE_RATE", "1.0"))))
+_sample_rates = parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+
+
+def sample_rate_for(service_name: str) -> float:
+    """Fraction of successful operations of ``service_name`` that are logged"""
+    return _sample_rates.get(service_name, _default_sample_rate)
+
+
+_listener: Optional[QueueListener] = None
+_listener_lock = threading.Lock()
+_configured = False
+
+
+def _restart_listener_in_child():
+    """Give a forked child its own listener; the parent's thread was not copied.
+
+    The inherited listener still looks started, so it is replaced rather than
+    started again. The lock may have been held by another parent thread at fork.
+    """
+    global _listener, _listener_lock
+    _listener_lock = threading.Lock()
+    inherited = _listener
+    if inherited is not None:
+        _listener = QueueListener(inherited.queue, *inherited.handlers,
+                                  respect_handler_level=inherited.respect_handler_level)
+        _listener.start()
+
+
+def configure_logging(level: str = None, fmt: str = None, async_io: bool = None):
+    """Install the root handler once, unless the application configured logging already"""
+    global _configured, _listener
+    with _listener_lock:
+        root = logging.getLogger()
+        if _configured or root.handlers:
+            return
+        _configured = True
+
+        level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+        fmt = (fmt or os.getenv("LOG_FORMAT", "text")).lower()
+        if async_io is None:
+            async_io = os.getenv("LOG_ASYNC", "1").lower() not in ("0", "false", "no")
+
+        output = logging.StreamHandler()
+        output.setFormatter(JSONFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+        root.setLevel(level)
+
+        if not async_io:
+            root.addHandler(output)
+            return
+
+        log_queue = queue.SimpleQueue()
+        root.addHandler(DeferredQueueHandler(log_queue))
+        _listener = QueueListener(log_queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+        # threads do not survive fork(); pre-forked workers need their own listener
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=_restart_listener_in_child)
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    with _listener_lock:
+        listener, _listener = _listener, None
+    if listener is None:
+        return
+    if listener._thread is not None:
+        listener.stop()
+    # records logged after shutdown are written inline instead of queued forever
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, DeferredQueueHandler):
+            root.removeHandler(handler)
+    for handler in listener.handlers:
+        root.addHandler(handler)
@@ -0,0 +1,184 @@
+"""
+Markdown templates for ``OrderSummaryService``.
+
+One ``SummaryTemplate`` per workflow domain, built once at import. A template
+is a header and a footer (``str.format`` templates over the summary fields,
+see ``OrderSummaryService``) around the item list. The item line template
+(fields ``quantity``, ``name``, ``currency``, ``price``) is compiled into a
+function rendering every item with an f-string in one list comprehension,
+joined once.
+
+Domains are plugins: ``register_summary_template`` adds or replaces one, and
+modules listed in ``SUMMARY_TEMPLATE_MODULES`` (comma-separated import paths)
+are imported on first use so they can register theirs. Unknown domains use
+the ``general`` template.
+"""
+
+import importlib
+import logging
+import os
+import threading
+from string import Formatter
+from typing import Any, Callable, Dict, Iterable, Mapping
+
+logger = logging.getLogger(__name__)
+
+ITEM_LINE = "- **{quantity}x {name}** - *{currency} {price:.2f}*\n"
+
+# item line field -> expression in the compiled renderer
+ITEM_FIELDS = {
+    'quantity': "item.get('quantity', 1)",
+    'name': "item.get('name', default_name)",
+    'price': "item.get('price', 0)",
+    'currency': "currency"
+}
+
+NOTICE_HEADER = """
+## ⚠️ **Important Notice**
+**{failed_count} service(s) encountered issues:**
+"""
+NOTICE_LINE = "- ❌ {0}\n"
+NOTICE_FOOTER = """
+🔄 **Retry options are available** for failed services using the retry buttons below.
+"""
+COMPLETION = ("\n## 🎉 **Completion Status**\n"
+              "> ✅ **All services completed successfully!**  \n"
+              "> Your {workflow_label} is fully processed and ready.\n")
+
+
+def compile_item_line(item_line: str) -> Callable[[Iterable[Mapping[str, Any]], str, str], str]:
+    """Compile an item line template into ``render(items, currency, default_name) -> str``"""
+    pieces = []
+    for literal, field, spec, conversion in Formatter().parse(item_line):
+        pieces.append(literal.replace('{', '{{').replace('}', '}}'))
+        if field is None:
+            continue
+        if field not in ITEM_FIELDS:
+            raise ValueError(f"Unknown item field {field!r} in {item_line!r}; expected one of {sorted(ITEM_FIELDS)}")
+        if spec and ('{' in spec or '}' in spec):
+            raise ValueError(f"Nested format specs are not supported in item lines: {item_line!r}")
+        pieces.append('{' + ITEM_FIELDS[field] + (f'!{conversion}' if conversion else '')
+                      + (f':{spec}' if spec else '') + '}')
+    source = ("def render_items(items, currency, default_name):\n"
+              f"    return ''.join([f{''.join(pieces)!r} for item in items])\n")
+    namespace: Dict[str, Any] = {}
+    exec(compile(source, f"<summary item line {item_line!r}>", 'exec'), namespace)
+    return namespace['render_items']
+
+
+class SummaryTemplate:
+    """Markdown summary layout of one domain"""
+
+    __slots__ = ('domain', 'header', 'footer', 'item_name', 'item_line', '_format_item')
+
+    def __init__(self, domain: str, header: str, footer: str, item_name: str = 'Service', item_line: str = ITEM_LINE):
+        self.domain = domain
+        self.header = header
+        self.footer = footer
+        self.item_name = item_name
+        self.item_line = item_line
+        # malformed templates fail at registration rather than per request
+        for template in (header, footer):
+            list(Formatter().parse(template))
+        self._format_item = compile_item_line(item_line)
+
+    def render_items(self, items: Iterable[Mapping[str, Any]], currency: str) -> str:
+        return self._format_item(items, currency, self.item_name)
+
+    def render(self, fields: Mapping[str, Any], items: Iterable[Mapping[str, Any]], currency: str) -> str:
+        return ''.join((self.header.format_map(fields), self.render_items(items, currency),
+                        self.footer.format_map(fields)))
+
+
+_templates: Dict[str, SummaryTemplate] = {}
+_plugins_loaded = False
+_plugins_lock = threading.Lock()
+
+
+def register_summary_template(template: SummaryTemplate):
+    """Add (or replace) the template of ``template.domain``"""
+    _templates[template.domain] = template
+
+
+def _load_plugins():
+    global _plugins_loaded
+    with _plugins_lock:
+        if _plugins_loaded:
+            return
+        for module in filter(None, (name.strip() for name in os.getenv("SUMMARY_TEMPLATE_MODULES", "").split(','))):
+            try:
+                importlib.import_module(module)
+            except ImportError as e:
+                logger.error("Could not load summary template module %s: %s", module, e)
+        _plugins_loaded = True
+
+
+def get_summary_template(domain: str) -> SummaryTemplate:
+    if not _plugins_loaded:
+        _load_plugins()
+    return _templates.get(domain) or _templates['general']
+
+
+def summary_templates() -> Dict[str, SummaryTemplate]:
+    if not _plugins_loaded:
+        _load_plugins()
+    return dict(_templates)
+
+
+register_summary_template(SummaryTemplate(
+    'travel',
+    header="""# 🧳 Travel Booking Summary
+
+## ✅ **Service Details**
+- **Service Type**: {workflow_title}
+- **Total Cost**: **{currency_display}**
+- **Processing Status**: {successful_services}/{total_services} services completed successfully
+
+## 📋 **Items Booked**
+""",
+    footer="""
+## 👤 **Customer Information**
+- **Customer ID**: `{customer_id}`
+- **Contact Email**: {customer_email}
+- **Service Level**: {service_level}
+- **Processing Time**: ⚡ Completed in real-time
+"""))
+
+register_summary_template(SummaryTemplate(
+    'ecommerce',
+    header="""# 🛒 Order Summary
+
+## ✅ **Order Details**
+- **Order Type**: {workflow_title}
+- **Total Amount**: **{currency_display}**
+- **Processing Status**: {successful_services}/{total_services} processes completed
+
+## 📦 **Items Ordered**
+""",
+    footer="""
+## 🚚 **Delivery & Payment**
+- **Delivery Timeline**: {delivery_timeline}
+- **Payment Method**: {payment_method}
+- **Customer ID**: `{customer_id}`
+- **Email**: {customer_email}
+""",
+    item_name='Product'))
+
+register_summary_template(SummaryTemplate(
+    'general',
+    header="""# 📋 Service Summary
+
+## ✅ **Service Details**
+- **Service Type**: {workflow_title}
+- **Domain**: {domain_title}
+- **Total Cost**: **{currency_display}**
+- **Processing Status**: {successful_services}/{total_services} services completed
+
+## 📋 **Services Requested**
+""",
+    footer="""
+## 👤 **Customer Information**
+- **Customer ID**: `{customer_id}`
+- **Contact**: {customer_email}
+- **Service Level**: {service_level}
+"""))
@@ -0,0 +1,512 @@
+"""
+Tracing of workflow runs.
+
+Each run gets a span (``workflow.execute`` / ``workflow.retry``). Each service
+``execute`` call and each outbound LLM or exchange-rate request gets a child
+span, so a slow run shows where its time went. The current span is kept in a
+``ContextVar``:
+
+- work handed to another thread carries it with ``propagating(func)``
+- outbound HTTP requests carry it as a W3C ``traceparent`` header (``inject_headers``)
+- Temporal clients and workers carry it with ``temporal_interceptors()``
+
+Backends:
+
+- the OpenTelemetry SDK, when it is installed
+- otherwise a built-in tracer with the same span API. It exports OTLP/JSON,
+  either to a collector over HTTP or to a file (one export request per line,
+  the format read by the collector's ``otlpjsonfile`` receiver).
+
+Configuration (environment):
+
+- ``TRACING``                      ``off`` (default), ``file`` or ``otlp``
+- ``TRACING_FILE``                 file exporter path (default ``traces.jsonl``)
+- ``OTEL_EXPORTER_OTLP_ENDPOINT``  collector endpoint (default ``http://localhost:4318``)
+- ``OTEL_SERVICE_NAME``            service name on exported spans (default ``workflow-orchestrator``)
+
+With ``TRACING=off`` spans are a shared no-op object and services are not wrapped.
+"""
+
+import atexit
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+try:
+    from opentelemetry import propagate as otel_propagate
+    from opentelemetry import trace as otel_trace
+    from opentelemetry.sdk.trace import TracerProvider as OTelTracerProvider
+except ImportError:
+    otel_trace = None
+
+logger = logging.getLogger(__name__)
+
+KINDS = {'internal': 1, 'server': 2, 'client': 3}
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+
+
+class Span:
+    """A span of the built-in tracer"""
+
+    __slots__ = ('name', 'kind', 'trace_id', 'span_id', 'parent_id', 'start_ns', 'end_ns',
+                 'attributes', 'events', 'status', 'status_message')
+
+    def __init__(self, name: str, kind: str, trace_id: str, parent_id: Optional[str],
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = '%016x' % random.getrandbits(64)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = dict(attributes) if attributes else {}
+        self.events: List[Dict[str, Any]] = []
+        self.status = STATUS_UNSET
+        self.status_message = ''
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def add_event(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        self.events.append({'timeUnixNano': str(time.time_ns()), 'name': name,
+                            'attributes': _otlp_attributes(attributes or {})})
+
+    def record_exception(self, exc: BaseException):
+        self.add_event('exception', {'exception.type': type(exc).__name__, 'exception.message': str(exc)})
+
+    def set_error(self, description: str = ''):
+        self.status = STATUS_ERROR
+        self.status_message = description
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': KINDS.get(self.kind, 1),
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': _otlp_attributes(self.attributes),
+            'status': {'code': self.status, 'message': self.status_message}
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        if self.events:
+            span['events'] = self.events
+        return span
+
+
+class _RemoteParent:
+    """Parent span context received in a ``traceparent`` header"""
+
+    __slots__ = ('trace_id', 'span_id')
+
+    def __init__(self, trace_id: str, span_id: str):
+        self.trace_id = trace_id
+        self.span_id = span_id
+
+
+class _NoopSpan:
+    """Span returned while tracing is off"""
+
+    __slots__ = ()
+    traceparent = None
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def add_event(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        pass
+
+    def record_exception(self, exc: BaseException):
+        pass
+
+    def set_error(self, description: str = ''):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{'key': key, 'value': _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[_RemoteParent]:
+    """Parent context from a W3C ``traceparent`` header, or None when it is malformed"""
+    if not header:
+        return None
+    parts = header.strip().split('-')
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        if int(parts[1], 16) == 0 or int(parts[2], 16) == 0:
+            return None
+    except ValueError:
+        return None
+    return _RemoteParent(parts[1].lower(), parts[2].lower())
+
+
+class _BatchExporter(ABC):
+    """Exports finished spans in batches from a background thread"""
+
+    MAX_BATCH = 512
+    INTERVAL = 1.0
+
+    def __init__(self, service_name: str):
+        self.resource = {'attributes': _otlp_attributes({'service.name': service_name})}
+        self._queue = queue.SimpleQueue()
+        self._pid = None
+        self._lock = threading.Lock()
+        self.exported = 0
+        self.failed = 0
+
+    def submit(self, span: Span):
+        # threads do not survive fork(); each worker process starts its own
+        if self._pid != os.getpid():
+            self._start()
+        self._queue.put(span)
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='trace-exporter', daemon=True).start()
+
+    def _drain(self, first: Optional[Span]) -> List[Span]:
+        batch = [first] if first is not None else []
+        while len(batch) < self.MAX_BATCH:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=self.INTERVAL)
+            except queue.Empty:
+                continue
+            self._export_batch(self._drain(first))
+
+    def flush(self):
+        """Export everything queued so far on the calling thread"""
+        while True:
+            batch = self._drain(None)
+            if not batch:
+                return
+            self._export_batch(batch)
+
+    def _export_batch(self, batch: List[Span]):
+        request = {'resourceSpans': [{
+            'resource': self.resource,
+            'scopeSpans': [{'scope': {'name': __name__}, 'spans': [span.to_otlp() for span in batch]}]
+        }]}
+        try:
+            self.export(json.dumps(request, separators=(',', ':')).encode('utf-8'))
+            self.exported += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.warning("Dropped %d spans: %s", len(batch), e)
+
+    @abstractmethod
+    def export(self, body: bytes):
+        """Send one OTLP/JSON export request"""
+
+
+class FileExporter(_BatchExporter):
+    """Appends one OTLP/JSON export request per line to a file"""
+
+    def __init__(self, service_name: str, path: str):
+        super().__init__(service_name)
+        self.path = path
+        self._write_lock = threading.Lock()
+
+    def export(self, body: bytes):
+        with self._write_lock, open(self.path, 'ab') as output:
+            output.write(body + b'\n')
+
+
+class OTLPHTTPExporter(_BatchExporter):
+    """Posts OTLP/JSON export requests to a collector's ``/v1/traces``"""
+
+    def __init__(self, service_name: str, endpoint: str, timeout: float = 5.0):
+        super().__init__(service_name)
+        self.url = endpoint.rstrip('/') + '/v1/traces'
+        self.timeout = timeout
+
+    def export(self, body: bytes):
+        import urllib.request  # deferred: only needed when exporting to a collector
+        request = urllib.request.Request(self.url, data=body, method='POST',
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar('current_span', default=None)
+
+
+class BuiltinTracer:
+    """Tracer used when the OpenTelemetry SDK is not installed"""
+
+    backend = 'builtin'
+
+    def __init__(self, exporter: _BatchExporter):
+        self.exporter = exporter
+
+    @contextmanager
+    def start(self, name: str, kind: str, attributes: Optional[Dict[str, Any]],
+              traceparent: Optional[str]) -> Iterator[Span]:
+        parent = _current_span.get() or parse_traceparent(traceparent)
+        if parent is not None:
+            span = Span(name, kind, parent.trace_id, parent.span_id, attributes)
+        else:
+            span = Span(name, kind, '%032x' % random.getrandbits(128), None, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            self.exporter.submit(span)
+
+    def current(self):
+        span = _current_span.get()
+        return span if isinstance(span, Span) else NOOP_SPAN
+
+    def inject(self, headers: Dict[str, str]):
+        span = _current_span.get()
+        if span is not None:
+            headers['traceparent'] = f"00-{span.trace_id}-{span.span_id}-01"
+
+    def flush(self):
+        self.exporter.flush()
+
+
+class _OTelSpan:
+    """Adapts an OpenTelemetry span to the built-in span API"""
+
+    __slots__ = ('_span',)
+
+    def __init__(self, span):
+        self._span = span
+
+    @property
+    def traceparent(self) -> Optional[str]:
+        context = self._span.get_span_context()
+        if not context.is_valid:
+            return None
+        return f"00-{context.trace_id:032x}-{context.span_id:016x}-{int(context.trace_flags):02x}"
+
+    def set_attribute(self, key: str, value: Any):
+        if value is not None:
+            self._span.set_attribute(key, value)
+
+    def add_event(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        self._span.add_event(name, attributes or {})
+
+    def record_exception(self, exc: BaseException):
+        self._span.record_exception(exc)
+
+    def set_error(self, description: str = ''):
+        self._span.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR, description or None))
+
+
+class OTelTracer:
+    """Tracer backed by the OpenTelemetry SDK"""
+
+    backend = 'opentelemetry'
+
+    def __init__(self, mode: str, service_name: str, path: str):
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+        if mode == 'otlp':
+            try:
+                from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            except ImportError:
+                from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+            exporter = OTLPSpanExporter()
+        else:
+            exporter = ConsoleSpanExporter(out=open(path, 'a'),
+                                           formatter=lambda span: span.to_json(indent=None) + os.linesep)
+        self.provider = OTelTracerProvider(resource=Resource.create({'service.name': service_name}))
+        self.provider.add_span_processor(BatchSpanProcessor(exporter))
+        otel_trace.set_tracer_provider(self.provider)
+        self.tracer = otel_trace.get_tracer(__name__)
+        self._kinds = {'internal': otel_trace.SpanKind.INTERNAL, 'server': otel_trace.SpanKind.SERVER,
+                       'client': otel_trace.SpanKind.CLIENT}
+
+    @contextmanager
+    def start(self, name: str, kind: str, attributes: Optional[Dict[str, Any]],
+              traceparent: Optional[str]) -> Iterator[_OTelSpan]:
+        context = None
+        if traceparent and not otel_trace.get_current_span().get_span_context().is_valid:
+            context = otel_propagate.extract({'traceparent': traceparent})
+        attributes = {key: value for key, value in (attributes or {}).items() if value is not None}
+        with self.tracer.start_as_current_span(name, context=context, kind=self._kinds.get(kind),
+                                               attributes=attributes, record_exception=False,
+                                               set_status_on_exception=False) as span:
+            yield _OTelSpan(span)
+
+    def current(self):
+        span = otel_trace.get_current_span()
+        return _OTelSpan(span) if span.get_span_context().is_valid else NOOP_SPAN
+
+    def inject(self, headers: Dict[str, str]):
+        otel_propagate.inject(headers)
+
+    def flush(self):
+        self.provider.force_flush()
+
+
+def create_tracer(mode: str = None):
+    """Tracer for ``TRACING`` (``off``, ``file``, ``otlp``); None when tracing is off"""
+    mode = (mode or os.getenv("TRACING", "off")).lower()
+    if mode in ('', '0', 'off', 'false', 'no'):
+        return None
+    if mode not in ('file', 'otlp'):
+        raise ValueError(f"Unknown TRACING mode: {mode} (expected off, file or otlp)")
+
+    service_name = os.getenv("OTEL_SERVICE_NAME", "workflow-orchestrator")
+    path = os.getenv("TRACING_FILE", "traces.jsonl")
+    if otel_trace is not None:
+        return OTelTracer(mode, service_name, path)
+    if mode == 'otlp':
+        endpoint = os.getenv("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT", "").removesuffix('/v1/traces') or \
+            os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318")
+        return BuiltinTracer(OTLPHTTPExporter(service_name, endpoint))
+    return BuiltinTracer(FileExporter(service_name, path))
+
+
+_tracer = create_tracer()
+if _tracer is not None:
+    atexit.register(_tracer.flush)
+
+enabled = _tracer is not None
+
+
+@contextmanager
+def span(name: str, attributes: Optional[Dict[str, Any]] = None, kind: str = 'internal',
+         traceparent: Optional[str] = None):
+    """Run the block in a child of the current span (or of ``traceparent`` when there is none).
+
+    An exception escaping the block is recorded and marks the span as failed.
+    """
+    if _tracer is None:
+        yield NOOP_SPAN
+        return
+    with _tracer.start(name, kind, attributes, traceparent) as current:
+        try:
+            yield current
+        except BaseException as e:
+            current.record_exception(e)
+            current.set_error(f"{type(e).__name__}: {e}")
+            raise
+
+
+def current_span():
+    """The active span, or a no-op span"""
+    return _tracer.current() if _tracer is not None else NOOP_SPAN
+
+
+def inject_headers(headers: Dict[str, str]) -> Dict[str, str]:
+    """Add the ``traceparent`` header of the current span to ``headers`` (in place) and return them"""
+    if _tracer is not None:
+        _tracer.inject(headers)
+    return headers
+
+
+def propagating(func: Callable) -> Callable:
+    """Bind ``func`` to a copy of the caller's context, for running on another thread"""
+    if _tracer is None:
+        return func
+    return functools.partial(contextvars.copy_context().run, func)
+
+
+def traced(name: str, kind: str = 'internal', traceparent: Callable[[], Optional[str]] = None) -> Callable:
+    """Decorator running a function in a span; ``traceparent`` supplies a remote parent"""
+    def decorator(func: Callable) -> Callable:
+        if _tracer is None:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, kind=kind, traceparent=traceparent() if traceparent else None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def trace_service(execute: Callable) -> Callable:
+    """Wrap a service's ``execute`` in a ``service.<name>`` span; unchanged while tracing is off"""
+    if _tracer is None:
+        return execute
+
+    @functools.wraps(execute)
+    def traced_execute(self, *args, **kwargs):
+        with span(f"service.{self.name}", {'service.name': self.name}) as current:
+            result = execute(self, *args, **kwargs)
+            current.set_attribute('service.success', result.success)
+            if not result.success:
+                current.set_error(result.error_message or 'failed')
+            elif result.data:
+                current.set_attribute('service.source', result.data.get('source'))
+            return result
+    return traced_execute
+
+
+def temporal_interceptors() -> list:
+    """Interceptors for ``Client.connect`` and ``Worker`` that carry trace context into Temporal.
+
+    Needs the OpenTelemetry SDK and ``temporalio.contrib.opentelemetry``; empty otherwise.
+    """
+    if not isinstance(_tracer, OTelTracer):
+        return []
+    try:
+        from temporalio.contrib.opentelemetry import TracingInterceptor
+    except ImportError:
+        return []
+    return [TracingInterceptor(_tracer.tracer)]
+
+
+def flush():
+    """Export spans that are still queued"""
+    if _tracer is not None:
+        _tracer.flush()
+
+
+def stats() -> Dict[str, Any]:
+    if _tracer is None:
+        return {'enabled': False}
+    report = {'enabled': True, 'backend': _tracer.backend}
+    if isinstance(_tracer, BuiltinTracer):
+        report.update(exporter=type(_tracer.exporter).__name__, exported=_tracer.exporter.exported,
+                      failed=_tracer.exporter.failed)
+    return report
@@ -4,18 +4,35 @@ Updated Services to Match New Specification
 7 total services: 6 dummy + 1 real (Currency Conversion)
 """
 
+import logging
 import uuid
 import random
-import requests
 import os
-from typing import Dict, Any, Optional
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
 
 try:
     # Try relative imports first (when imported as a package)
-    from .base_service import BaseService, ServiceResult
+    from .alternative_booking import AlternativeBookingService
+    from .base_service import BaseService, ServiceResult, customer_key
+    from .rate_matrix import REFERENCE_USD_RATES, RateMatrix
+    from .settlement import SettlementPipeline
+    from .summary_templates import COMPLETION, NOTICE_FOOTER, NOTICE_HEADER, NOTICE_LINE, get_summary_template
+    from .tracing import inject_headers, span
+    from .velocity import VelocityEngine
+    from .wallet import WalletService
 except ImportError:
     # Fall back to absolute imports (when run as standalone)
-    from base_service import BaseService, ServiceResult
+    from alternative_booking import AlternativeBookingService
+    from base_service import BaseService, ServiceResult, customer_key
+    from rate_matrix import REFERENCE_USD_RATES, RateMatrix
+    from settlement import SettlementPipeline
+    from summary_templates import COMPLETION, NOTICE_FOOTER, NOTICE_HEADER, NOTICE_LINE, get_summary_template
+    from tracing import inject_headers, span
+    from velocity import VelocityEngine
+    from wallet import WalletService
 
 # =============================================================================
 # 1. ORDER CREATION SERVICE (Dummy)
@@ -23,13 +40,14 @@ except ImportError:
 class OrderCreationService(BaseService):
     """🛒 Order Creation - Simulates receiving an order"""
     
-    def __init__(self):
+    def __init__(self, max_orders: int = 10000):
         super().__init__("OrderCreationService", failure_rate=0.1)
-        self.orders = {}  # In-memory order storage
+        self.orders = OrderedDict()  # In-memory order storage, oldest evicted first
+        self.max_orders = max_orders
         
     def execute(self, customer_id: str, items: list, channel: str = "B2C", **kwargs) -> ServiceResult:
         """Create a new order"""
-        self._log_operation("CREATE_ORDER", True, f"Customer: {customer_id}, Channel: {channel}")
+        self._log_operation("CREATE_ORDER", True, "Customer: %s, Channel: %s", customer_id, channel)
         
         # Simulate failure
         if self._simulate_failure():
@@ -53,93 +71,156 @@ class OrderCreationService(BaseService):
         }
         
         self.orders[order_id] = order_data
+        while len(self.orders) > self.max_orders:
+            self.orders.popitem(last=False)
         
-        self._log_operation("CREATE_ORDER", True, f"Order {order_id} created successfully")
+        self._log_operation("CREATE_ORDER", True, "Order %s created successfully", order_id)
         
         return ServiceResult(
             success=True,
             data=order_data
         )
 
+    def cancel(self, order_id: str, reason: str = "compensation") -> ServiceResult:
+        """Cancel an order (saga compensation); cancelling twice is a no-op"""
+        order = self.orders.get(order_id)
+        if order is None:
+            return ServiceResult(success=False, error_message=f"Order {order_id} not found")
+        if order['status'] != 'cancelled':
+            order = self.orders[order_id] = dict(order, status='cancelled', cancel_reason=reason)
+        self._log_operation("CANCEL_ORDER", True, "Order %s cancelled (%s)", order_id, reason)
+        return ServiceResult(success=True, data={'order_id': order_id, 'status': 'cancelled', 'reason': reason})
+
 # =============================================================================
 # 2. PAYMENT PROCESSING SERVICE (Dummy with specific failure logic)
 # =============================================================================
 class PaymentProcessingService(BaseService):
-    """💳 Payment Processing - Simulates payment, can randomly fail"""
+    """💳 Payment Processing - Authorizes payments (with velocity limits) and settles them in batches"""
     
-    def __init__(self):
+    def __init__(self, velocity: VelocityEngine = None, settlement: SettlementPipeline = None):
         super().__init__("PaymentProcessingService", failure_rate=0.0)  # Custom failure logic
-        self.successful_payments = 0  # Track successful payments
-        
-    def execute(self, amount: float, customer_id: str, payment_method: str = "credit_card", currency: str = "USD", **kwargs) -> ServiceResult:
-        """Process payment with specific failure pattern and currency display"""
-        self._log_operation("PROCESS_PAYMENT", True, f"Amount: ${amount}, Customer: {customer_id}, Currency: {currency}")
-        
-        # Specific failure logic: fail after 3-4 successful payments
-        if self.successful_payments >= 3:
-            self._log_operation("PROCESS_PAYMENT", False, f"Payment failed after {self.successful_payments} successful payments")
+        self.velocity = velocity or VelocityEngine()  # per-customer sliding-window limits (VELOCITY_RULES)
+        # fees, USD amounts and ledger entries are computed off the request path
+        self.settlement = settlement or SettlementPipeline(shared_rate_matrix)
+        self.refunds = OrderedDict()  # payment_id -> refund, so a payment is refunded at most once
+        
+    def execute(self, amount: float, customer_id: str, payment_method: str = "credit_card", currency: str = "USD",
+                customer_email: str = None, **kwargs) -> ServiceResult:
+        """Authorize a payment unless it breaks one of the customer's velocity rules; settlement follows in a batch"""
+        self._log_operation("PROCESS_PAYMENT", True, "Amount: $%s, Customer: %s, Currency: %s", amount, customer_id, currency)
+        
+        # Velocity check: too many payments (or too much paid) by this customer recently.
+        # Customer ids are made up per request, so the customer is known by email when possible.
+        # Amounts are limited in USD, at the rates settlement uses; unknown currencies trade at par
+        velocity_customer = customer_key(customer_id, customer_email)
+        usd_amount = amount * (self.settlement.rates().rate(currency, 'USD') or 1.0)
+        decline = self.velocity.check_and_record(velocity_customer, usd_amount)
+        if decline is not None:
+            self._log_operation("PROCESS_PAYMENT", False, "Payment declined for %s: %s", velocity_customer, decline.reason)
             return ServiceResult(
                 success=False,
-                error_message=f"Payment processing failed - card declined after {self.successful_payments} successful transactions"
+                error_message=f"Payment processing failed - card declined: {decline.reason}"
             )
         
-        # Process payment successfully
+        # Authorized: fees, USD amount and the ledger entry come from the settlement batch
         payment_id = str(uuid.uuid4())
-        self.successful_payments += 1
-        
-        # Currency conversion for display (if not USD)
-        usd_amount = amount
-        local_amount = amount
-        exchange_rate = 1.0
-        
-        if currency != "USD":
-            # Simulate currency conversion rates
-            conversion_rates = {
-                'EUR': 0.85, 'GBP': 0.73, 'JPY': 110.0, 'CAD': 1.25, 
-                'AUD': 1.35, 'CHF': 0.92, 'CNY': 6.45, 'INR': 74.5
-            }
-            if currency in conversion_rates:
-                exchange_rate = conversion_rates[currency]
-                local_amount = round(amount * exchange_rate, 2)
+        self.settlement.submit(payment_id, customer_id, amount, currency)
         
         payment_data = {
             'payment_id': payment_id,
             'amount': amount,
-            'local_amount': local_amount,
             'currency': currency,
-            'usd_amount': usd_amount,
-            'exchange_rate': exchange_rate,
-            'currency_display': f"${usd_amount:.2f} USD" + (f" ({currency} {local_amount:.2f})" if currency != "USD" else ""),
             'customer_id': customer_id,
             'payment_method': payment_method,
-            'status': 'completed',
-            'transaction_fee': round(amount * 0.029, 2),
-            'successful_payment_count': self.successful_payments
+            'status': 'authorized',
+            'settlement': 'pending',
+            'velocity': self.velocity.usage(velocity_customer)
         }
         
-        self._log_operation("PROCESS_PAYMENT", True, f"Payment {payment_data['currency_display']} processed successfully (#{self.successful_payments})")
+        self._log_operation("PROCESS_PAYMENT", True, "Payment of %s %s authorized for %s", amount, currency, customer_id)
         
         return ServiceResult(
             success=True,
             data=payment_data
         )
     
-    def reset_counter(self):
-        """Reset payment counter for testing"""
-        old_count = self.successful_payments
-        self.successful_payments = 0
-        self._log_operation("RESET_COUNTER", True, f"Payment counter reset from {old_count} to 0")
+    def refund(self, payment_id: str, amount: float, customer_id: str, currency: str = "USD") -> ServiceResult:
+        """Refund a payment (saga compensation); refunding twice returns the first refund"""
+        refund = self.refunds.get(payment_id)
+        if refund is None:
+            refund = self.refunds.setdefault(payment_id, {
+                'refund_id': str(uuid.uuid4()),
+                'payment_id': payment_id,
+                'amount': amount,
+                'currency': currency,
+                'customer_id': customer_id,
+                'status': 'refunded'
+            })
+            self.settlement.submit(payment_id, customer_id, amount, currency, kind='refund')
+            while len(self.refunds) > 10000:
+                self.refunds.popitem(last=False)
+        self._log_operation("REFUND_PAYMENT", True, "Payment %s refunded: %s %s", payment_id, amount, currency)
+        return ServiceResult(success=True, data=refund)
+
+    def reset_counter(self, customer_id: str = None):
+        """Forget recent payments (of one customer, or all) for testing"""
+        self.velocity.reset(customer_id)
+        self._log_operation("RESET_COUNTER", True, "Payment velocity reset for %s", customer_id or "all customers")
 
 # =============================================================================
 # 3. CURRENCY CONVERSION SERVICE (Real API)
 # =============================================================================
+class ExchangeRateCache:
+    """Thread-safe TTL cache of live exchange rates, shared across requests"""
+    
+    def __init__(self, ttl_seconds: float = 300.0):
+        self.ttl_seconds = ttl_seconds
+        self._rates: Dict[Tuple[str, str], Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, from_currency: str, to_currency: str) -> Optional[float]:
+        """Return a cached rate, or None if missing or expired"""
+        with self._lock:
+            entry = self._rates.get((from_currency, to_currency))
+            if entry is None:
+                return None
+            rate, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._rates[(from_currency, to_currency)]
+                return None
+            return rate
+    
+    def put(self, from_currency: str, to_currency: str, rate: float):
+        """Store a live rate"""
+        with self._lock:
+            self._rates[(from_currency, to_currency)] = (rate, time.monotonic())
+    
+    def clear(self):
+        with self._lock:
+            self._rates.clear()
+    
+    def snapshot(self) -> Dict[Tuple[str, str], float]:
+        """All unexpired live rates"""
+        now = time.monotonic()
+        with self._lock:
+            return {pair: rate for pair, (rate, stored_at) in self._rates.items() if now - stored_at <= self.ttl_seconds}
+
+# Live rates are shared by every CurrencyConversionService instance in the process
+exchange_rate_cache = ExchangeRateCache(ttl_seconds=float(os.getenv("FX_RATE_CACHE_TTL", "300")))
+reference_rate_matrix = RateMatrix(REFERENCE_USD_RATES)
+
+def shared_rate_matrix() -> RateMatrix:
+    """Reference rates overlaid with the live rates currently cached (used by payment settlement)"""
+    return RateMatrix(REFERENCE_USD_RATES, exchange_rate_cache.snapshot())
+
 class CurrencyConversionService(BaseService):
     """💱 Currency Conversion - Calls live exchange rate API"""
     
     def __init__(self):
         super().__init__("CurrencyConversionService", failure_rate=0.1)
-        self.api_base_url = "https://v1.apiplugin.io/v1/currency"
+        self.api_base_url = os.getenv("CURRENCY_API_BASE_URL", "https://v1.apiplugin.io/v1/currency").rstrip("/")
         self.api_key = os.getenv("CURRENCY_API_KEY", "SJOX87Ur")
+        self.rate_cache = exchange_rate_cache
         
         # Fallback rates for when API is unavailable
         self.fallback_rates = {
@@ -150,7 +231,7 @@ class CurrencyConversionService(BaseService):
         
     def execute(self, amount: float, from_currency: str = "USD", to_currency: str = "USD", **kwargs) -> ServiceResult:
         """Convert currency using real API with fallback"""
-        self._log_operation("CONVERT_CURRENCY", True, f"${amount} {from_currency} to {to_currency}")
+        self._log_operation("CONVERT_CURRENCY", True, "$%s %s to %s", amount, from_currency, to_currency)
         
         # If same currency, no conversion needed
         if from_currency == to_currency:
@@ -166,11 +247,29 @@ class CurrencyConversionService(BaseService):
                 }
             )
         
+        # A live rate cached by an earlier call (or a speculative prefetch) needs no API call
+        cached_rate = self.rate_cache.get(from_currency, to_currency)
+        if cached_rate is not None:
+            converted_amount = round(amount * cached_rate, 2)
+            self._log_operation("CONVERT_CURRENCY", True, "Cached live rate %s for %s to %s", cached_rate, from_currency, to_currency)
+            return ServiceResult(
+                success=True,
+                data={
+                    'original_amount': amount,
+                    'converted_amount': converted_amount,
+                    'from_currency': from_currency,
+                    'to_currency': to_currency,
+                    'exchange_rate': cached_rate,
+                    'source': 'live_api',
+                    'rate_cache_hit': True
+                }
+            )
+        
         # Try real API first
         try:
             if not self._simulate_failure():
                 # Make actual API call to currency plugin
-                rate = self._get_exchange_rate_from_api(from_currency, to_currency)
+                rate = self.fetch_live_rate(from_currency, to_currency)
                 converted_amount = round(amount * rate, 2)
                 
                 conversion_data = {
@@ -182,7 +281,7 @@ class CurrencyConversionService(BaseService):
                     'source': 'live_api'
                 }
                 
-                self._log_operation("CONVERT_CURRENCY", True, f"API call successful: Converted ${amount} {from_currency} to ${converted_amount} {to_currency}")
+                self._log_operation("CONVERT_CURRENCY", True, "API call successful: Converted $%s %s to $%s %s", amount, from_currency, converted_amount, to_currency)
                 
                 return ServiceResult(
                     success=True,
@@ -193,10 +292,10 @@ class CurrencyConversionService(BaseService):
                 
         except Exception as e:
             # Fallback to cached rates
-            self._log_operation("CONVERT_CURRENCY", False, f"API failed, using fallback rates: {str(e)}")
+            self._log_operation("CONVERT_CURRENCY", False, "API failed, using fallback rates: %s", e)
             
             try:
-                rate = self.fallback_rates.get(from_currency, {}).get(to_currency, 1.0)
+                rate = self._get_exchange_rate(from_currency, to_currency)
                 converted_amount = round(amount * rate, 2)
                 
                 conversion_data = {
@@ -208,7 +307,7 @@ class CurrencyConversionService(BaseService):
                     'source': 'fallback_rates'
                 }
                 
-                self._log_operation("CONVERT_CURRENCY", True, f"Fallback conversion: ${amount} {from_currency} to ${converted_amount} {to_currency}")
+                self._log_operation("CONVERT_CURRENCY", True, "Fallback conversion: $%s %s to $%s %s", amount, from_currency, converted_amount, to_currency)
                 
                 return ServiceResult(
                     success=True,
@@ -221,17 +320,26 @@ class CurrencyConversionService(BaseService):
                     error_message=f"Currency conversion failed: {str(fallback_error)}"
                 )
     
+    def fetch_live_rate(self, from_currency: str, to_currency: str, cache: bool = True) -> float:
+        """Fetch a rate from the live API, storing it in the shared cache unless ``cache`` is False"""
+        rate = self._get_exchange_rate_from_api(from_currency, to_currency)
+        if cache:
+            self.rate_cache.put(from_currency, to_currency, rate)
+        return rate
+    
     def _get_exchange_rate_from_api(self, from_currency: str, to_currency: str) -> float:
         """Get exchange rate from real API using correct format from API documentation"""
+        import requests  # deferred: only needed once a live rate is fetched
+        
         try:
             # Correct API format from their website documentation
             url = f"{self.api_base_url}/{self.api_key}/convert"
             
-            headers = {
+            headers = inject_headers({
                 'Content-Type': 'application/json',
                 'Accept': 'application/json',
                 'User-Agent': 'ProDT-Currency-Service/1.0'
-            }
+            })
             
             params = {
                 "amount": "1",
@@ -239,14 +347,17 @@ class CurrencyConversionService(BaseService):
                 "to": to_currency
             }
             
-            self._log_operation("API_CALL", True, f"Making API request to: {url} with params: {params}")
+            self._log_operation("API_CALL", True, "Making API request to: %s with params: %s", url, params)
             
             # Make the actual HTTP request using the format from their documentation
-            response = requests.get(url, headers=headers, params=params, timeout=5)
-            response.raise_for_status()  # Raise exception for bad status codes
+            with span("fx.request", {'http.method': 'GET', 'fx.from': from_currency, 'fx.to': to_currency},
+                      kind='client') as fx_span:
+                response = requests.get(url, headers=headers, params=params, timeout=5)
+                fx_span.set_attribute('http.status_code', response.status_code)
+                response.raise_for_status()  # Raise exception for bad status codes
+                data = response.json()
             
-            data = response.json()
-            self._log_operation("API_RESPONSE", True, f"API Response: {data}")
+            self._log_operation("API_RESPONSE", True, "API Response: %s", data, level=logging.DEBUG)
             
             # Extract rate from the known API response format
             # Response format should be similar to: {"query":{"from":"USD","to":"EUR","amount":"1"},"info":{"rate":...},"result":...}
@@ -262,38 +373,43 @@ class CurrencyConversionService(BaseService):
                 rate = float(data['exchange_rate'])
             else:
                 # If response format is unexpected, log it and fall back
-                self._log_operation("API_PARSE_ERROR", False, f"Unexpected API response format: {data}")
+                self._log_operation("API_PARSE_ERROR", False, "Unexpected API response format: %s", data)
                 raise Exception(f"Unexpected API response format: {list(data.keys()) if isinstance(data, dict) else type(data)}")
             
-            self._log_operation("API_SUCCESS", True, f"Retrieved live rate {rate} for {from_currency} to {to_currency}")
+            self._log_operation("API_SUCCESS", True, "Retrieved live rate %s for %s to %s", rate, from_currency, to_currency)
             return rate
             
         except requests.exceptions.RequestException as e:
-            self._log_operation("API_ERROR", False, f"HTTP request failed: {str(e)}")
+            self._log_operation("API_ERROR", False, "HTTP request failed: %s", e)
             raise Exception(f"API request failed: {str(e)}")
         except (KeyError, ValueError, TypeError) as e:
-            self._log_operation("API_PARSE_ERROR", False, f"Failed to parse API response: {str(e)}")
+            self._log_operation("API_PARSE_ERROR", False, "Failed to parse API response: %s", e)
             raise Exception(f"Failed to parse API response: {str(e)}")
         except Exception as e:
-            self._log_operation("API_UNKNOWN_ERROR", False, f"Unknown API error: {str(e)}")
+            self._log_operation("API_UNKNOWN_ERROR", False, "Unknown API error: %s", e)
             raise Exception(f"Unknown API error: {str(e)}")
     
     def _get_exchange_rate(self, from_currency: str, to_currency: str) -> float:
-        """Get exchange rate from fallback rates (for backward compatibility)"""
-        return self.fallback_rates.get(from_currency, {}).get(to_currency, 1.0)
+        """Get exchange rate from fallback rates, then the reference rate matrix; unknown pairs trade at par"""
+        rate = self.fallback_rates.get(from_currency, {}).get(to_currency)
+        return rate or reference_rate_matrix.rate(from_currency, to_currency) or 1.0
 
 # =============================================================================
 # 4. EMAIL NOTIFICATION SERVICE (Dummy)
 # =============================================================================
 class EmailNotificationService(BaseService):
     """✉️ Email Notification - Simulates sending a confirmation email"""
-    
+
+    provider = "smtp"
+    max_batch_size = 100
+    recipient_field = "recipient"
+
     def __init__(self):
         super().__init__("EmailNotificationService", failure_rate=0.15)
         
     def execute(self, recipient: str, subject: str = "Order Confirmation", message: str = "", **kwargs) -> ServiceResult:
         """Send email notification"""
-        self._log_operation("SEND_EMAIL", True, f"To: {recipient}, Subject: {subject}")
+        self._log_operation("SEND_EMAIL", True, "To: %s, Subject: %s", recipient, subject)
         
         # Simulate failure
         if self._simulate_failure():
@@ -314,13 +430,45 @@ class EmailNotificationService(BaseService):
             'sent_at': '2024-01-01T00:00:00Z'
         }
         
-        self._log_operation("SEND_EMAIL", True, f"Email sent successfully to {recipient}")
+        self._log_operation("SEND_EMAIL", True, "Email sent successfully to %s", recipient)
         
         return ServiceResult(
             success=True,
             data=email_data
         )
 
+    def send_batch(self, messages: List[Dict[str, Any]]) -> List[ServiceResult]:
+        """Send several emails in one provider call; one result per message"""
+        started = time.perf_counter()
+        self._log_operation("SEND_EMAIL_BATCH", True, "%d emails via %s", len(messages), self.provider)
+        if self._simulate_failure():
+            results = [ServiceResult(success=False, error_message="Email delivery failed - SMTP server unavailable")
+                       for _ in messages]
+            self._record_batch(time.perf_counter() - started, results)
+            return results
+
+        batch_id = str(uuid.uuid4())
+        results = [ServiceResult(success=True, data={
+            'email_id': str(uuid.uuid4()),
+            'batch_id': batch_id,
+            'recipient': message['recipient'],
+            'subject': message.get('subject', "Order Confirmation"),
+            'status': 'sent',
+            'sent_at': '2024-01-01T00:00:00Z'
+        }) for message in messages]
+        self._record_batch(time.perf_counter() - started, results)
+        return results
+
+    @staticmethod
+    def digest(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Merge several emails to one recipient into a single message"""
+        return {
+            'recipient': messages[0]['recipient'],
+            'subject': f"{len(messages)} updates on your orders",
+            'message': "\n\n".join(f"{message.get('subject', '')}\n{message.get('message', '')}".strip()
+                                     for message in messages)
+        }
+
 # =============================================================================
 # 5. SHIPPING CONFIRMATION SERVICE (Dummy)
 # =============================================================================
@@ -332,7 +480,7 @@ class ShippingConfirmationService(BaseService):
         
     def execute(self, order_id: str, shipping_method: str = "standard", **kwargs) -> ServiceResult:
         """Confirm shipping for an order"""
-        self._log_operation("CONFIRM_SHIPPING", True, f"Order: {order_id}, Method: {shipping_method}")
+        self._log_operation("CONFIRM_SHIPPING", True, "Order: %s, Method: %s", order_id, shipping_method)
         
         # Simulate failure
         if self._simulate_failure():
@@ -353,7 +501,7 @@ class ShippingConfirmationService(BaseService):
             'shipped_at': '2024-01-01T00:00:00Z'
         }
         
-        self._log_operation("CONFIRM_SHIPPING", True, f"Shipping confirmed with tracking {tracking_number}")
+        self._log_operation("CONFIRM_SHIPPING", True, "Shipping confirmed with tracking %s", tracking_number)
         
         return ServiceResult(
             success=True,
@@ -371,7 +519,7 @@ class CallCenterTriggerService(BaseService):
         
     def execute(self, customer_id: str, phone_number: str, reason: str = "payment_failure", **kwargs) -> ServiceResult:
         """Trigger call center to contact customer"""
-        self._log_operation("TRIGGER_CALL", True, f"Customer: {customer_id}, Reason: {reason}")
+        self._log_operation("TRIGGER_CALL", True, "Customer: %s, Reason: %s", customer_id, reason)
         
         # Simulate failure (very low rate for call center)
         if self._simulate_failure():
@@ -393,7 +541,7 @@ class CallCenterTriggerService(BaseService):
             'created_at': '2024-01-01T00:00:00Z'
         }
         
-        self._log_operation("TRIGGER_CALL", True, f"Call center ticket {ticket_id} created")
+        self._log_operation("TRIGGER_CALL", True, "Call center ticket %s created", ticket_id)
         
         return ServiceResult(
             success=True,
@@ -411,7 +559,7 @@ class OrderSummaryService(BaseService):
         
     def execute(self, config: dict, results: dict, **kwargs) -> ServiceResult:
         """Generate order summary using LLM"""
-        self._log_operation("GENERATE_SUMMARY", True, f"Creating summary for workflow")
+        self._log_operation("GENERATE_SUMMARY", True, "Creating summary for workflow")
         
         # Simulate very rare failure
         if self._simulate_failure():
@@ -420,9 +568,11 @@ class OrderSummaryService(BaseService):
                 error_message="Summary generation temporarily unavailable"
             )
         
-        # Calculate totals and gather information
+        # Calculate totals and gather information (execute_workflow has usually done it already)
         items = config.get('items', [])
-        original_amount = config.get('original_amount', sum(item.get('price', 0) * item.get('quantity', 1) for item in items))
+        original_amount = config.get('original_amount')
+        if original_amount is None:
+            original_amount = sum(item.get('price', 0) * item.get('quantity', 1) for item in items)
         converted_amount = config.get('converted_amount', original_amount)
         currency = config.get('currency', 'USD')
         target_currency = config.get('target_currency', currency)
@@ -432,10 +582,12 @@ class OrderSummaryService(BaseService):
         domain = config.get('domain', 'general')
         
         # Get payment details if available
-        payment_data = results.get('payment', {}).get('data', {})
+        payment = results.get('payment')
+        payment_data = payment.data if payment is not None and payment.data else {}
         
         # Get currency conversion details from the currency conversion service
-        currency_data = results.get('currency_conversion', {}).get('data', {})
+        conversion = results.get('currency_conversion')
+        currency_data = conversion.data if conversion is not None and conversion.data else {}
         exchange_rate = currency_data.get('exchange_rate', 1.0)
         conversion_source = currency_data.get('source', 'no_conversion')
         
@@ -454,99 +606,37 @@ class OrderSummaryService(BaseService):
             currency_display = f"**{original_amount:.2f} {currency}**"
         
         # Count successful vs failed services
-        successful_services = sum(1 for result in results.values() if result.get('success', False))
+        successful_services = sum(1 for result in results.values() if result.success)
         total_services = len(results)
         
-        # Generate intelligent summary based on workflow type
-        if domain == 'travel':
-            summary_text = f"""# 🧳 Travel Booking Summary
-
-## ✅ **Service Details**
-- **Service Type**: {workflow_type.replace('_', ' ').title()}
-- **Total Cost**: **{currency_display}**
-- **Processing Status**: {successful_services}/{total_services} services completed successfully
-
-## 📋 **Items Booked**
-"""
-            for item in items:
-                summary_text += f"- **{item.get('quantity', 1)}x {item.get('name', 'Service')}** - *{currency} {item.get('price', 0):.2f}*\n"
-            
-            summary_text += f"""
-## 👤 **Customer Information**
-- **Customer ID**: `{config.get('customer_id', 'N/A')}`
-- **Contact Email**: {config.get('customer_email', 'N/A')}
-- **Service Level**: {config.get('service_level', 'Standard')}
-- **Processing Time**: ⚡ Completed in real-time
-"""
-
-        elif domain == 'ecommerce':
-            summary_text = f"""# 🛒 Order Summary
-
-## ✅ **Order Details**
-- **Order Type**: {workflow_type.replace('_', ' ').title()}
-- **Total Amount**: **{currency_display}**
-- **Processing Status**: {successful_services}/{total_services} processes completed
-
-## 📦 **Items Ordered**
-"""
-            for item in items:
-                summary_text += f"- **{item.get('quantity', 1)}x {item.get('name', 'Product')}** - *{currency} {item.get('price', 0):.2f}*\n"
-            
-            summary_text += f"""
-## 🚚 **Delivery & Payment**
-- **Delivery Timeline**: {config.get('delivery_timeline', 'Standard shipping')}
-- **Payment Method**: {config.get('payment_method', 'Credit Card')}
-- **Customer ID**: `{config.get('customer_id', 'N/A')}`
-- **Email**: {config.get('customer_email', 'N/A')}
-"""
-
-        else:
-            # Generic summary for other domains
-            summary_text = f"""# 📋 Service Summary
-
-## ✅ **Service Details**
-- **Service Type**: {workflow_type.replace('_', ' ').title()}
-- **Domain**: {domain.title()}
-- **Total Cost**: **{currency_display}**
-- **Processing Status**: {successful_services}/{total_services} services completed
-
-## 📋 **Services Requested**
-"""
-            for item in items:
-                summary_text += f"- **{item.get('quantity', 1)}x {item.get('name', 'Service')}** - *{currency} {item.get('price', 0):.2f}*\n"
-            
-            summary_text += f"""
-## 👤 **Customer Information**
-- **Customer ID**: `{config.get('customer_id', 'N/A')}`
-- **Contact**: {config.get('customer_email', 'N/A')}
-- **Service Level**: {config.get('service_level', 'Standard')}
-"""
+        # Render the domain's precompiled template
+        template = get_summary_template(domain)
+        workflow_label = workflow_type.replace('_', ' ')
+        parts = [template.render({
+            'workflow_title': workflow_label.title(),
+            'domain_title': domain.title(),
+            'currency_display': currency_display,
+            'successful_services': successful_services,
+            'total_services': total_services,
+            'customer_id': config.get('customer_id', 'N/A'),
+            'customer_email': config.get('customer_email', 'N/A'),
+            'service_level': config.get('service_level', 'Standard'),
+            'delivery_timeline': config.get('delivery_timeline', 'Standard shipping'),
+            'payment_method': config.get('payment_method', 'Credit Card')
+        }, items, currency)]
 
         # Add service status details
         if successful_services < total_services:
-            failed_services = []
-            for service_name, result in results.items():
-                if not result.get('success', False):
-                    failed_services.append(service_name.replace('_', ' ').title())
-            
-            summary_text += f"""
-## ⚠️ **Important Notice**
-**{len(failed_services)} service(s) encountered issues:**
-"""
-            for service in failed_services:
-                summary_text += f"- ❌ {service}\n"
-            
-            summary_text += f"""
-🔄 **Retry options are available** for failed services using the retry buttons below.
-"""
+            failed_services = [service_name.replace('_', ' ').title()
+                               for service_name, result in results.items() if not result.success]
+            parts.append(NOTICE_HEADER.format(failed_count=len(failed_services)))
+            parts.extend(NOTICE_LINE.format(service) for service in failed_services)
+            parts.append(NOTICE_FOOTER)
 
         # Add completion status
         if successful_services == total_services:
-            summary_text += f"""
-## 🎉 **Completion Status**
-> ✅ **All services completed successfully!**  
-> Your {workflow_type.replace('_', ' ')} is fully processed and ready.
-"""
+            parts.append(COMPLETION.format(workflow_label=workflow_label))
+        summary_text = ''.join(parts)
 
         summary_data = {
             'summary_id': str(uuid.uuid4()),
@@ -563,7 +653,7 @@ class OrderSummaryService(BaseService):
             'generated_at': '2024-01-01T00:00:00Z'
         }
         
-        self._log_operation("GENERATE_SUMMARY", True, f"Summary generated successfully - {successful_services}/{total_services} services completed")
+        self._log_operation("GENERATE_SUMMARY", True, "Summary generated successfully - %s/%s services completed", successful_services, total_services)
         
         return ServiceResult(
             success=True,
@@ -571,13 +661,17 @@ class OrderSummaryService(BaseService):
         )
 class SMSNotificationService(BaseService):
     """💬 SMS Notification - Sends SMS alert (simulated, can be replaced by Slack/real API optionally)"""
-    
+
+    provider = "sms_gateway"
+    max_batch_size = 50
+    recipient_field = "phone_number"
+
     def __init__(self):
         super().__init__("SMSNotificationService", failure_rate=0.12)
         
     def execute(self, phone_number: str, message: str, **kwargs) -> ServiceResult:
         """Send SMS notification"""
-        self._log_operation("SEND_SMS", True, f"To: {phone_number}, Message: {message[:50]}...")
+        self._log_operation("SEND_SMS", True, "To: %s, Message: %s...", phone_number, message[:50])
         
         # Simulate failure
         if self._simulate_failure():
@@ -598,54 +692,104 @@ class SMSNotificationService(BaseService):
             'cost': 0.05  # Cost per SMS
         }
         
-        self._log_operation("SEND_SMS", True, f"SMS sent successfully to {phone_number}")
+        self._log_operation("SEND_SMS", True, "SMS sent successfully to %s", phone_number)
         
         return ServiceResult(
             success=True,
             data=sms_data
         )
 
+    def send_batch(self, messages: List[Dict[str, Any]]) -> List[ServiceResult]:
+        """Send several SMS in one gateway call; one result per message"""
+        started = time.perf_counter()
+        self._log_operation("SEND_SMS_BATCH", True, "%d messages via %s", len(messages), self.provider)
+        if self._simulate_failure():
+            results = [ServiceResult(success=False, error_message="SMS delivery failed - carrier network unavailable")
+                       for _ in messages]
+            self._record_batch(time.perf_counter() - started, results)
+            return results
+
+        batch_id = str(uuid.uuid4())
+        results = [ServiceResult(success=True, data={
+            'sms_id': str(uuid.uuid4()),
+            'batch_id': batch_id,
+            'phone_number': message['phone_number'],
+            'status': 'delivered',
+            'sent_at': '2024-01-01T00:00:00Z',
+            'cost': 0.05
+        }) for message in messages]
+        self._record_batch(time.perf_counter() - started, results)
+        return results
+
+    @staticmethod
+    def digest(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Merge several SMS to one number into a single message"""
+        return {
+            'phone_number': messages[0]['phone_number'],
+            'message': " | ".join(message.get('message', '') for message in messages)
+        }
+
 # =============================================================================
 # SERVICE REGISTRY
 # =============================================================================
 class ServiceRegistry:
-    """Registry for all services"""
+    """Registry for all services; each service is constructed on first use"""
+    
+    SERVICE_CLASSES = {
+        'order_creation': OrderCreationService,
+        'payment_processing': PaymentProcessingService,
+        'wallet': WalletService,
+        'currency_conversion': CurrencyConversionService,
+        'email_notification': EmailNotificationService,
+        'shipping_confirmation': ShippingConfirmationService,
+        'alternative_booking': AlternativeBookingService,
+        'call_center_trigger': CallCenterTriggerService,
+        'sms_notification': SMSNotificationService,
+        'order_summary': OrderSummaryService
+    }
     
     def __init__(self):
-        self.services = {
-            'order_creation': OrderCreationService(),
-            'payment_processing': PaymentProcessingService(),
-            'currency_conversion': CurrencyConversionService(),
-            'email_notification': EmailNotificationService(),
-            'shipping_confirmation': ShippingConfirmationService(),
-            'call_center_trigger': CallCenterTriggerService(),
-            'sms_notification': SMSNotificationService(),
-            'order_summary': OrderSummaryService()
-        }
+        self.services = {}  # Constructed services, by name
+        self._lock = threading.Lock()
     
     def get_service(self, service_name: str) -> Optional[BaseService]:
-        """Get service by name"""
-        return self.services.get(service_name)
+        """Get service by name, constructing it on first use"""
+        service = self.services.get(service_name)
+        if service is None and service_name in self.SERVICE_CLASSES:
+            with self._lock:
+                service = self.services.get(service_name)
+                if service is None:
+                    service = self.SERVICE_CLASSES[service_name]()
+                    self.services[service_name] = service
+        return service
     
     def list_services(self) -> Dict[str, str]:
-        """List all available services"""
+        """List all available services (without constructing them)"""
         return {
-            name: service.__class__.__doc__ or service.__class__.__name__
-            for name, service in self.services.items()
+            name: service_class.__doc__ or service_class.__name__
+            for name, service_class in self.SERVICE_CLASSES.items()
         }
     
     def reset_all_counters(self):
         """Reset all service counters for testing"""
-        for service in self.services.values():
+        for service in list(self.services.values()):
             if hasattr(service, 'reset_counter'):
                 service.reset_counter()
 
 # =============================================================================
 # CONVENIENCE FUNCTIONS
 # =============================================================================
+_service_registry = None
+_service_registry_lock = threading.Lock()
+
 def get_service_registry() -> ServiceRegistry:
-    """Get the global service registry"""
-    return ServiceRegistry()
+    """Get the global service registry (one per process, shared by all request threads)"""
+    global _service_registry
+    if _service_registry is None:
+        with _service_registry_lock:
+            if _service_registry is None:
+                _service_registry = ServiceRegistry()
+    return _service_registry
 
 def test_all_services():
     """Test all services to ensure they work"""
@@ -667,6 +811,13 @@ def test_all_services():
     result = payment_service.execute(amount=100.0, customer_id="TEST001")
     print(f"Payment Processing: {'✅' if result.success else '❌'}")
     
+    # Test Wallet
+    wallet_service = registry.get_service('wallet')
+    result = wallet_service.execute(customer_id="CORP-TEST001", amount=100.0)
+    if result.success:
+        result = wallet_service.execute(customer_id="CORP-TEST001", action="commit", hold_id=result.data['hold_id'])
+    print(f"Wallet: {'✅' if result.success else '❌'}")
+    
     # Test Currency Conversion
     currency_service = registry.get_service('currency_conversion')
     result = currency_service.execute(amount=100.0, from_currency="USD", to_currency="EUR")
@@ -682,6 +833,11 @@ def test_all_services():
     result = shipping_service.execute(order_id="TEST001")
     print(f"Shipping Confirmation: {'✅' if result.success else '❌'}")
     
+    # Test Alternative Booking
+    alternative_service = registry.get_service('alternative_booking')
+    result = alternative_service.execute(order_id="TEST001", items=[{"name": "Test Product", "price": 100.0, "quantity": 1}])
+    print(f"Alternative Booking: {'✅' if result.success else '❌'}")
+    
     # Test Call Center Trigger
     call_service = registry.get_service('call_center_trigger')
     result = call_service.execute(customer_id="TEST001", phone_number="+1234567890")
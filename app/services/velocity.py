@@ -0,0 +1,264 @@
+"""
+Per-customer payment velocity limits over sliding windows.
+
+``PaymentProcessingService`` declines a payment when the customer has already
+made too many payments, or paid too much, within a window. Each rule is
+``metric:window_seconds:limit``, where ``metric`` is ``count`` (payments) or
+``amount`` (their total):
+
+    VELOCITY_RULES="count:60:3,count:3600:20,amount:86400:50000"
+
+Every window is split into ``VELOCITY_BUCKETS`` time buckets. Per customer it
+keeps one row of bucket counts and amounts, plus the window totals. All rows
+are stored in flat ``array`` columns indexed by the customer's slot, with no
+per-customer objects. When a window is read, the buckets that have fallen out
+of it since the customer's last payment are subtracted from the totals and
+cleared. Old activity expires without a sweeper, and each check costs a few
+array reads per rule, however many payments or customers there are. The
+windows slide in steps of ``window / VELOCITY_BUCKETS``.
+
+Amounts are in US dollars; ``PaymentProcessingService`` converts each payment
+at the rate matrix settlement uses before it is checked. Windows run on the
+monotonic clock, so a wall clock step does not expire or revive payments. At most
+``VELOCITY_MAX_CUSTOMERS`` customers are tracked; the least recently active is
+forgotten first.
+
+A customer is identified by ``customer_key``: the email address from the parsed
+workflow when the input named one. The customer id alone identifies nobody,
+since the parse step usually makes up a new one for every request. Payments
+without a real email fall back to the customer id and so are rarely limited.
+
+Configuration (environment):
+
+- ``VELOCITY_RULES``          rules (default ``count:60:3,count:3600:20,amount:86400:50000``)
+- ``VELOCITY_BUCKETS``        buckets per window (default 12)
+- ``VELOCITY_MAX_CUSTOMERS``  customers tracked (default 100000)
+"""
+
+import os
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+try:
+    from .metrics import Counter
+except ImportError:
+    from metrics import Counter
+
+DEFAULT_RULES = "count:60:3,count:3600:20,amount:86400:50000"
+METRICS = ('count', 'amount')
+
+VELOCITY_DECLINES = Counter('payment_velocity_declines_total', 'Payments declined by a velocity rule', ['rule'])
+
+
+@dataclass(frozen=True, slots=True)
+class VelocityRule:
+    metric: str  # count or amount
+    window_seconds: int
+    limit: float
+
+    @property
+    def name(self) -> str:
+        return f"{self.metric}:{self.window_seconds}"
+
+
+@dataclass(frozen=True, slots=True)
+class VelocityDecline:
+    rule: VelocityRule
+    current: float
+    attempted: float
+
+    @property
+    def reason(self) -> str:
+        window = _describe_window(self.rule.window_seconds)
+        if self.rule.metric == 'count':
+            return f"{self.current:g} payments in the last {window} (limit {self.rule.limit:g})"
+        return (f"{self.current:.2f} paid in the last {window}, {self.attempted:.2f} more would exceed "
+                f"the limit of {self.rule.limit:.2f}")
+
+
+def _describe_window(seconds: int) -> str:
+    for unit, size in (('day', 86400), ('hour', 3600), ('minute', 60)):
+        if seconds % size == 0:
+            count = seconds // size
+            return unit if count == 1 else f"{count} {unit}s"
+    return f"{seconds} seconds"
+
+
+def parse_rules(spec: str) -> List[VelocityRule]:
+    rules = []
+    for entry in spec.split(','):
+        if not entry.strip():
+            continue
+        metric, window_seconds, limit = entry.strip().split(':')
+        if metric not in METRICS:
+            raise ValueError(f"Unknown velocity metric {metric!r} (expected one of {', '.join(METRICS)})")
+        rules.append(VelocityRule(metric, int(window_seconds), float(limit)))
+    return rules
+
+
+class _Window:
+    """Bucketed payment counts and amounts (minor units) of every customer slot over one window"""
+
+    __slots__ = ('seconds', 'buckets', 'width', 'counts', 'amounts', 'epochs', 'count_totals', 'amount_totals')
+
+    def __init__(self, seconds: int, buckets: int):
+        self.seconds = seconds
+        self.buckets = buckets
+        self.width = seconds / buckets
+        # slot s owns counts/amounts[s * buckets:(s + 1) * buckets]
+        self.counts = array('l')
+        self.amounts = array('q')
+        self.epochs = array('q')  # bucket number each slot was last advanced to
+        self.count_totals = array('l')
+        self.amount_totals = array('q')
+
+    def add_slot(self):
+        self.counts.extend(array('l', [0]) * self.buckets)
+        self.amounts.extend(array('q', [0]) * self.buckets)
+        self.epochs.append(0)
+        self.count_totals.append(0)
+        self.amount_totals.append(0)
+
+    def clear(self, slot: int):
+        base = slot * self.buckets
+        for index in range(base, base + self.buckets):
+            self.counts[index] = 0
+            self.amounts[index] = 0
+        self.epochs[slot] = 0
+        self.count_totals[slot] = 0
+        self.amount_totals[slot] = 0
+
+    def advance(self, slot: int, now: float) -> int:
+        """Expire the buckets that left the window; returns the current bucket index"""
+        epoch = int(now // self.width)
+        last = self.epochs[slot]
+        if epoch != last:
+            base = slot * self.buckets
+            if epoch - last >= self.buckets:
+                if self.count_totals[slot]:
+                    for index in range(base, base + self.buckets):
+                        self.counts[index] = 0
+                        self.amounts[index] = 0
+                    self.count_totals[slot] = 0
+                    self.amount_totals[slot] = 0
+            else:
+                for expired in range(last + 1, epoch + 1):
+                    index = base + expired % self.buckets
+                    self.count_totals[slot] -= self.counts[index]
+                    self.amount_totals[slot] -= self.amounts[index]
+                    self.counts[index] = 0
+                    self.amounts[index] = 0
+            self.epochs[slot] = epoch
+        return slot * self.buckets + epoch % self.buckets
+
+    def add(self, bucket: int, slot: int, amount: int):
+        self.counts[bucket] += 1
+        self.amounts[bucket] += amount
+        self.count_totals[slot] += 1
+        self.amount_totals[slot] += amount
+
+
+class VelocityEngine:
+    """Thread-safe sliding-window payment limits per customer"""
+
+    def __init__(self, rules: List[VelocityRule] = None, buckets: int = None, max_customers: int = None):
+        self.rules = parse_rules(os.getenv("VELOCITY_RULES", DEFAULT_RULES)) if rules is None else rules
+        buckets = max(1, int(os.getenv("VELOCITY_BUCKETS", "12")) if buckets is None else buckets)
+        self.max_customers = max(1, int(os.getenv("VELOCITY_MAX_CUSTOMERS", "100000"))
+                                 if max_customers is None else max_customers)
+        # rules over the same window share its buckets
+        self._windows = {seconds: _Window(seconds, buckets)
+                         for seconds in sorted({rule.window_seconds for rule in self.rules})}
+        self._declines = {rule.name: VELOCITY_DECLINES.labels(rule.name) for rule in self.rules}
+        self._slots: 'OrderedDict[str, int]' = OrderedDict()  # customer -> slot, least recently active first
+        self._lock = threading.Lock()
+        self._stats = {'checked': 0, 'approved': 0, 'declined': 0, 'forgotten': 0}
+        self._declined_by_rule = {rule.name: 0 for rule in self.rules}
+
+    def _slot(self, customer_id: str) -> int:
+        # caller holds the lock
+        slot = self._slots.get(customer_id)
+        if slot is not None:
+            self._slots.move_to_end(customer_id)
+            return slot
+        if len(self._slots) < self.max_customers:
+            slot = len(self._slots)
+            for window in self._windows.values():
+                window.add_slot()
+        else:
+            _, slot = self._slots.popitem(last=False)
+            for window in self._windows.values():
+                window.clear(slot)
+            self._stats['forgotten'] += 1
+        self._slots[customer_id] = slot
+        return slot
+
+    def check_and_record(self, customer_id: str, amount: float, now: float = None) -> Optional[VelocityDecline]:
+        """Decline the payment if it breaks a rule, otherwise count it; None means approved"""
+        now = time.monotonic() if now is None else now
+        minor = int(round(amount * 100))
+        with self._lock:
+            self._stats['checked'] += 1
+            slot = self._slot(customer_id)
+            current = {seconds: window.advance(slot, now) for seconds, window in self._windows.items()}
+            for rule in self.rules:
+                window = self._windows[rule.window_seconds]
+                if rule.metric == 'count':
+                    used, attempted = window.count_totals[slot], 1
+                else:
+                    used, attempted = window.amount_totals[slot] / 100, minor / 100
+                if used + attempted > rule.limit:
+                    self._stats['declined'] += 1
+                    self._declined_by_rule[rule.name] += 1
+                    self._declines[rule.name].inc()
+                    return VelocityDecline(rule, used, attempted)
+            for seconds, window in self._windows.items():
+                window.add(current[seconds], slot, minor)
+            self._stats['approved'] += 1
+        return None
+
+    def usage(self, customer_id: str, now: float = None) -> Dict[str, Dict[str, float]]:
+        """Current total and limit of every rule for a customer"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            slot = self._slots.get(customer_id)
+            if slot is not None:
+                for window in self._windows.values():
+                    window.advance(slot, now)
+            report = {}
+            for rule in self.rules:
+                window = self._windows[rule.window_seconds]
+                if slot is None:
+                    used = 0
+                elif rule.metric == 'count':
+                    used = window.count_totals[slot]
+                else:
+                    used = window.amount_totals[slot] / 100
+                report[rule.name] = {'used': used, 'limit': rule.limit}
+            return report
+
+    def reset(self, customer_id: str = None):
+        """Forget one customer's payments, or everyone's"""
+        with self._lock:
+            if customer_id is None:
+                slots = list(self._slots.values())
+            else:
+                slots = [self._slots[customer_id]] if customer_id in self._slots else []
+            for slot in slots:
+                for window in self._windows.values():
+                    window.clear(slot)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            report = dict(self._stats, declined_by_rule=dict(self._declined_by_rule))
+            report['customers'] = len(self._slots)
+        report['rules'] = [rule.name + f":{rule.limit:g}" for rule in self.rules]
+        report['bytes_per_customer'] = sum(
+            window.buckets * (window.counts.itemsize + window.amounts.itemsize)
+            + window.epochs.itemsize + window.count_totals.itemsize + window.amount_totals.itemsize
+            for window in self._windows.values())
+        return report
@@ -0,0 +1,351 @@
+"""
+Corporate wallets: an append-only ledger with balance reservations.
+
+Corporate orders pay from a prepaid wallet (``Check Wallet Balance → Deduct
+from Wallet → Restore Wallet`` in ``Workflow/workflow_diagram.mmd``). An order
+first *reserves* its amount. The reservation is checked against the available
+balance and taken atomically, so two concurrent orders cannot both spend the
+same funds. The reservation is then *committed* (the deduction) or *released*
+(the wallet is restored). A commit may deduct less than was reserved, e.g. when
+a cheaper alternative was booked; the rest is released in the same step.
+
+Every change is a ``LedgerEntry`` appended to the account's ledger; entries are
+never modified. Balances are kept as running totals next to the ledger so a
+check is O(1), and ``WalletLedger.replay`` recomputes them from the entries.
+Amounts are integer minor units (cents) internally.
+
+``WalletService`` keeps one wallet per customer and currency. The customer is
+known by the email parsed from the order (``customer_key``), since the parse
+step makes up a new customer id for every corporate request; orders from the
+same customer therefore reserve against the same balance.
+
+Accounts are guarded by striped locks: an account always maps to the same one
+of ``WALLET_LOCK_STRIPES`` locks, so orders for one account serialise while
+different accounts rarely contend.
+
+The ledger lives in memory and is bounded. Beyond ``WALLET_MAX_ACCOUNTS``, the
+least recently used account with no open reservation is dropped, together with
+its ledger; used again, it reopens with the opening balance. Settled holds are
+kept for ``WALLET_MAX_SETTLED_HOLDS`` further settlements, so a retried commit
+or release stays a no-op, and then forgotten. Open holds are never dropped.
+
+Configuration (environment):
+
+- ``WALLET_OPENING_BALANCE``    balance of a wallet opened on first use (default 100000)
+- ``WALLET_LOCK_STRIPES``       number of account locks (default 64)
+- ``WALLET_MAX_ACCOUNTS``       accounts kept (default 10000)
+- ``WALLET_MAX_SETTLED_HOLDS``  committed or released holds kept (default 10000)
+"""
+
+import itertools
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+try:
+    from .base_service import BaseService, ServiceResult, customer_key
+except ImportError:
+    from base_service import BaseService, ServiceResult, customer_key
+
+
+class WalletError(Exception):
+    """A wallet operation that cannot be applied"""
+
+
+class InsufficientFunds(WalletError):
+    """The available balance does not cover a reservation"""
+
+
+@dataclass(frozen=True, slots=True)
+class LedgerEntry:
+    """One ledger line; ``amount`` is in minor units"""
+    sequence: int
+    account: str
+    kind: str  # open, credit, reserve, commit, release
+    amount: int
+    hold_id: Optional[str]
+    reference: Optional[str]
+    recorded_at: float
+
+
+@dataclass(slots=True)
+class Hold:
+    hold_id: str
+    account: str
+    amount: int
+    reference: Optional[str]
+    status: str = 'reserved'  # reserved, committed, released
+    committed: int = 0  # deducted on commit; the rest of ``amount`` was released
+
+
+class _Account:
+    __slots__ = ('account_id', 'currency', 'balance', 'reserved', 'entries')
+
+    def __init__(self, account_id: str, currency: str):
+        self.account_id = account_id
+        self.currency = currency
+        self.balance = 0
+        self.reserved = 0
+        self.entries: List[LedgerEntry] = []
+
+
+def wallet_account(customer_id: str, customer_email: str = None, currency: str = "USD") -> str:
+    """Ledger account of a customer's wallet in ``currency``"""
+    return f"{customer_key(customer_id, customer_email)}/{currency}"
+
+
+def to_minor(amount: float) -> int:
+    return int(round(amount * 100))
+
+
+def to_major(amount: int) -> float:
+    return amount / 100
+
+
+class WalletLedger:
+    """Thread-safe wallets backed by per-account append-only ledgers"""
+
+    def __init__(self, stripes: int = None, opening_balance: float = None, max_accounts: int = None,
+                 max_settled_holds: int = None):
+        stripes = int(os.getenv("WALLET_LOCK_STRIPES", "64")) if stripes is None else stripes
+        self.opening_balance = (float(os.getenv("WALLET_OPENING_BALANCE", "100000"))
+                                if opening_balance is None else opening_balance)
+        self.max_accounts = max(1, int(os.getenv("WALLET_MAX_ACCOUNTS", "10000"))
+                                if max_accounts is None else max_accounts)
+        self.max_settled_holds = max(1, int(os.getenv("WALLET_MAX_SETTLED_HOLDS", "10000"))
+                                     if max_settled_holds is None else max_settled_holds)
+        self._stripes = [threading.Lock() for _ in range(max(1, stripes))]
+        self._accounts: 'OrderedDict[str, _Account]' = OrderedDict()  # least recently used first
+        self._holds: Dict[str, Hold] = {}
+        self._settled: 'OrderedDict[str, None]' = OrderedDict()  # settled hold ids, oldest first
+        # guards the account and hold maps; taken after a stripe lock, never before one
+        self._index_lock = threading.Lock()
+        self._sequence = itertools.count(1)
+        self._stats = {'accounts_evicted': 0, 'holds_evicted': 0}
+
+    def _lock(self, account_id: str) -> threading.Lock:
+        return self._stripes[hash(account_id) % len(self._stripes)]
+
+    def _append(self, account: _Account, kind: str, amount: int, hold_id: str = None, reference: str = None):
+        account.entries.append(LedgerEntry(next(self._sequence), account.account_id, kind, amount,
+                                           hold_id, reference, time.time()))
+
+    def _account(self, account_id: str, currency: Optional[str]) -> _Account:
+        # caller holds the account's stripe lock; currency None accepts the wallet's own
+        with self._index_lock:
+            account = self._accounts.get(account_id)
+            if account is not None:
+                self._accounts.move_to_end(account_id)
+        if account is None:
+            account = _Account(account_id, currency or "USD")
+            opening = to_minor(self.opening_balance)
+            account.balance = opening
+            self._append(account, 'open', opening)
+            with self._index_lock:
+                self._accounts[account_id] = account
+            self._evict_accounts(keep=account_id)
+        elif currency is not None and account.currency != currency:
+            raise WalletError(f"Wallet {account_id} holds {account.currency}, not {currency}")
+        return account
+
+    def _evict_accounts(self, keep: str):
+        """Drop least recently used accounts without open reservations while over ``max_accounts``,
+        except ``keep``, whose stripe lock the caller holds"""
+        held = self._lock(keep)
+        with self._index_lock:
+            excess = len(self._accounts) - self.max_accounts
+            candidates = list(itertools.islice(self._accounts, excess + 8)) if excess > 0 else []
+        for account_id in candidates:
+            if excess <= 0:
+                break
+            if account_id == keep:
+                continue
+            # an account busy under another stripe lock is skipped, not waited for
+            lock = self._lock(account_id)
+            if lock is not held and not lock.acquire(blocking=False):
+                continue
+            try:
+                with self._index_lock:
+                    account = self._accounts.get(account_id)
+                    if account is not None and account.reserved == 0:
+                        del self._accounts[account_id]
+                        self._stats['accounts_evicted'] += 1
+                        excess -= 1
+            finally:
+                if lock is not held:
+                    lock.release()
+
+    def credit(self, account_id: str, amount: float, currency: str = "USD", reference: str = None) -> Dict[str, Any]:
+        """Top up a wallet"""
+        minor = to_minor(amount)
+        if minor <= 0:
+            raise WalletError("Credit amount must be positive")
+        with self._lock(account_id):
+            account = self._account(account_id, currency)
+            account.balance += minor
+            self._append(account, 'credit', minor, reference=reference)
+            return self._snapshot(account)
+
+    def reserve(self, account_id: str, amount: float, currency: str = "USD", reference: str = None) -> Hold:
+        """Set ``amount`` aside if the available balance covers it"""
+        minor = to_minor(amount)
+        if minor <= 0:
+            raise WalletError("Reservation amount must be positive")
+        with self._lock(account_id):
+            account = self._account(account_id, currency)
+            available = account.balance - account.reserved
+            if minor > available:
+                raise InsufficientFunds(f"Insufficient wallet balance: {to_major(available):.2f} {currency} "
+                                        f"available, {to_major(minor):.2f} {currency} required")
+            hold = Hold(str(uuid.uuid4()), account_id, minor, reference)
+            account.reserved += minor
+            with self._index_lock:
+                self._holds[hold.hold_id] = hold
+            self._append(account, 'reserve', minor, hold.hold_id, reference)
+            return hold
+
+    def commit(self, hold_id: str, amount: float = None) -> Hold:
+        """Deduct a reservation from the balance; with ``amount``, deduct only that
+        much and release the rest"""
+        return self._settle(hold_id, 'commit', None if amount is None else to_minor(amount))
+
+    def release(self, hold_id: str) -> Hold:
+        """Return a reservation to the available balance"""
+        return self._settle(hold_id, 'release')
+
+    def _settle(self, hold_id: str, kind: str, amount: int = None) -> Hold:
+        hold = self._holds.get(hold_id)
+        if hold is None:
+            raise WalletError(f"Unknown reservation {hold_id}")
+        with self._lock(hold.account):
+            status = 'committed' if kind == 'commit' else 'released'
+            if hold.status == status:
+                return hold  # settling twice is a no-op (e.g. a retried compensation)
+            if hold.status != 'reserved':
+                raise WalletError(f"Reservation {hold_id} is already {hold.status}")
+            committed = 0 if kind == 'release' else hold.amount if amount is None else amount
+            if not 0 <= committed <= hold.amount:
+                raise WalletError(f"Cannot commit {to_major(committed):.2f} of a "
+                                  f"{to_major(hold.amount):.2f} reservation")
+            account = self._accounts[hold.account]
+            account.reserved -= hold.amount
+            account.balance -= committed
+            if kind == 'commit':
+                self._append(account, 'commit', committed, hold_id, hold.reference)
+            if committed < hold.amount:
+                self._append(account, 'release', hold.amount - committed, hold_id, hold.reference)
+            hold.status, hold.committed = status, committed
+            with self._index_lock:
+                self._settled[hold_id] = None
+                while len(self._settled) > self.max_settled_holds:
+                    evicted, _ = self._settled.popitem(last=False)
+                    del self._holds[evicted]
+                    self._stats['holds_evicted'] += 1
+            return hold
+
+    def balance(self, account_id: str, currency: str = None) -> Dict[str, Any]:
+        with self._lock(account_id):
+            return self._snapshot(self._account(account_id, currency))
+
+    def lookup(self, account_id: str) -> Optional[Dict[str, Any]]:
+        """Like ``balance``, but None for a wallet that is not open instead of opening it"""
+        with self._lock(account_id):
+            with self._index_lock:
+                account = self._accounts.get(account_id)
+            return self._snapshot(account) if account else None
+
+    def hold(self, hold_id: str) -> Optional[Hold]:
+        return self._holds.get(hold_id)
+
+    def entries(self, account_id: str) -> List[LedgerEntry]:
+        with self._lock(account_id):
+            account = self._accounts.get(account_id)
+            return list(account.entries) if account else []
+
+    def replay(self, account_id: str) -> Dict[str, int]:
+        """Balance and reserved amount recomputed from the ledger alone (minor units)"""
+        balance = reserved = 0
+        for entry in self.entries(account_id):
+            if entry.kind in ('open', 'credit'):
+                balance += entry.amount
+            elif entry.kind == 'reserve':
+                reserved += entry.amount
+            elif entry.kind == 'commit':
+                reserved -= entry.amount
+                balance -= entry.amount
+            elif entry.kind == 'release':
+                reserved -= entry.amount
+        return {'balance': balance, 'reserved': reserved}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._index_lock:
+            return dict(self._stats, accounts=len(self._accounts), holds=len(self._holds),
+                        open_holds=len(self._holds) - len(self._settled), max_accounts=self.max_accounts,
+                        max_settled_holds=self.max_settled_holds)
+
+    @staticmethod
+    def _snapshot(account: _Account) -> Dict[str, Any]:
+        return {
+            'account_id': account.account_id,
+            'currency': account.currency,
+            'balance': to_major(account.balance),
+            'reserved': to_major(account.reserved),
+            'available': to_major(account.balance - account.reserved),
+            'ledger_entries': len(account.entries)
+        }
+
+
+class WalletService(BaseService):
+    """👛 Corporate Wallet - Reserves, deducts and restores prepaid corporate balances"""
+
+    def __init__(self, ledger: WalletLedger = None):
+        super().__init__("WalletService", failure_rate=0.02)
+        self.ledger = ledger or WalletLedger()
+
+    def execute(self, customer_id: str, amount: Optional[float] = None, action: str = "reserve", hold_id: str = None,
+                currency: str = "USD", order_id: str = None, customer_email: str = None, **kwargs) -> ServiceResult:
+        """Run a wallet ``action``: reserve, commit, release, balance or credit.
+
+        The wallet is the customer's (by email when known) in ``currency``.
+        """
+        account = wallet_account(customer_id, customer_email, currency)
+        self._log_operation("WALLET_" + action.upper(), True, "Account: %s, Amount: %s %s", account, amount, currency)
+
+        # Only reservations hit the (simulated) wallet system; settling must stay reliable for compensation
+        if action == 'reserve' and self._simulate_failure():
+            return ServiceResult(success=False, error_message="Wallet check failed - ledger temporarily unavailable")
+
+        try:
+            if action in ('reserve', 'credit') and amount is None:
+                raise WalletError(f"{action} needs an amount")
+            if action == 'reserve':
+                hold = self.ledger.reserve(account, amount, currency, reference=order_id)
+                data = self._hold_data(hold)
+            elif action in ('commit', 'release'):
+                if not hold_id:
+                    raise WalletError(f"{action} needs a hold_id")
+                # a commit with an amount deducts only that much (e.g. a cheaper rebooking)
+                hold = self.ledger.commit(hold_id, amount) if action == 'commit' else self.ledger.release(hold_id)
+                data = self._hold_data(hold)
+            elif action == 'credit':
+                data = self.ledger.credit(account, amount, currency, reference=order_id)
+            elif action == 'balance':
+                data = self.ledger.balance(account, currency)
+            else:
+                raise WalletError(f"Unknown wallet action {action!r}")
+        except WalletError as e:
+            self._log_operation("WALLET_" + action.upper(), False, "%s", e)
+            return ServiceResult(success=False, error_message=str(e))
+
+        data['payment_method'] = 'wallet'
+        return ServiceResult(success=True, data=data)
+
+    def _hold_data(self, hold: Hold) -> Dict[str, Any]:
+        # the wallet of a settled hold may have been evicted since; don't reopen it
+        wallet = self.ledger.lookup(hold.account) or {'account_id': hold.account}
+        return dict(wallet, hold_id=hold.hold_id, amount=to_major(hold.amount), status=hold.status,
+                    committed=to_major(hold.committed), order_id=hold.reference)
@@ -0,0 +1,186 @@
+"""
+Workflow runs kept in SQLite so derived artifacts can be produced on demand.
+
+``/api/execute`` stores its config and step results under a run id instead of
+rendering the markdown summary inline. ``GET /api/workflows/<id>/summary``
+renders the summary on first access and caches it against the run's result
+version. A retry that changes a step's result bumps the version, so the next
+read renders again; API clients that never ask for the summary never pay for it.
+
+Runs live in one SQLite file (``WORKFLOW_RUNS_PATH``, default
+``data/workflow_runs.sqlite3`` in the repository) shared by every worker
+process, so a run created by one gunicorn worker can be summarised or retried
+through another. At most ``WORKFLOW_RUNS`` (default 1000) runs are kept; the
+least recently used is deleted first. Two workers asked for the same stale
+summary at once may both render it; whichever finishes first is cached.
+Configs and step results must be JSON-serialisable.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    from .base_service import FrozenServiceResult, ServiceResult
+except ImportError:
+    from base_service import FrozenServiceResult, ServiceResult
+
+DEFAULT_PATH = Path(__file__).resolve().parent.parent.parent / "data" / "workflow_runs.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS workflow_runs (
+    run_id          TEXT PRIMARY KEY,
+    config          TEXT NOT NULL,
+    results         TEXT NOT NULL,
+    version         INTEGER NOT NULL,
+    summary         TEXT,
+    summary_version INTEGER NOT NULL DEFAULT 0,
+    created_at      REAL NOT NULL,
+    accessed_at     REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS workflow_runs_accessed ON workflow_runs (accessed_at);
+"""
+
+
+def _encode(result: ServiceResult) -> str:
+    return json.dumps(result.__json__(), default=str)
+
+
+def _decode_results(text: str) -> Dict[str, ServiceResult]:
+    return {step: ServiceResult(**fields) for step, fields in json.loads(text).items()}
+
+
+class WorkflowRun:
+    """Config and step results of one executed workflow, as read from the store"""
+
+    __slots__ = ('run_id', 'config', 'results', 'version', 'created_at', 'summary', 'summary_version')
+
+    def __init__(self, run_id: str, config: Dict[str, Any], results: Dict[str, ServiceResult],
+                 version: int = 1, created_at: float = None, summary: Optional[FrozenServiceResult] = None,
+                 summary_version: int = 0):
+        self.run_id = run_id
+        self.config = config
+        self.results = results
+        self.version = version
+        self.created_at = time.time() if created_at is None else created_at
+        self.summary = summary
+        self.summary_version = summary_version
+
+
+class WorkflowRunStore:
+    """Bounded, least recently used map of run id -> ``WorkflowRun`` in SQLite"""
+
+    def __init__(self, path: str = None, capacity: int = None):
+        self.path = str(path or os.getenv("WORKFLOW_RUNS_PATH", DEFAULT_PATH))
+        if self.path != ':memory:':
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.capacity = max(1, int(os.getenv("WORKFLOW_RUNS", "1000")) if capacity is None else capacity)
+        self._connection = sqlite3.connect(self.path, timeout=10.0, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+        self._db_lock = threading.Lock()
+        self._lock = threading.Lock()
+        # counters of this process
+        self._stats = {'runs': 0, 'evicted': 0, 'summary_renders': 0, 'summary_hits': 0, 'invalidations': 0}
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def create(self, config: Dict[str, Any], results: Dict[str, ServiceResult]) -> WorkflowRun:
+        run = WorkflowRun(str(uuid.uuid4()), config, results)
+        encoded = json.dumps({step: result.__json__() for step, result in results.items()}, default=str)
+        with self._db_lock:
+            connection = self._connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute(
+                    "INSERT INTO workflow_runs (run_id, config, results, version, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (run.run_id, json.dumps(config, default=str), encoded, run.version, run.created_at, run.created_at))
+                excess = connection.execute("SELECT COUNT(*) FROM workflow_runs").fetchone()[0] - self.capacity
+                if excess > 0:
+                    connection.execute(
+                        "DELETE FROM workflow_runs WHERE run_id IN "
+                        "(SELECT run_id FROM workflow_runs ORDER BY accessed_at LIMIT ?)", (excess,))
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        self._count('runs')
+        if excess > 0:
+            self._count('evicted', excess)
+        return run
+
+    def get(self, run_id: str) -> Optional[WorkflowRun]:
+        with self._db_lock:
+            row = self._connection.execute(
+                "SELECT config, results, version, created_at, summary, summary_version FROM workflow_runs "
+                "WHERE run_id = ?", (run_id,)).fetchone()
+            if row is None:
+                return None
+            self._connection.execute("UPDATE workflow_runs SET accessed_at = ? WHERE run_id = ?",
+                                     (time.time(), run_id))
+        config, results, version, created_at, summary, summary_version = row
+        return WorkflowRun(run_id, json.loads(config), _decode_results(results), version, created_at,
+                           FrozenServiceResult(**json.loads(summary)) if summary else None, summary_version)
+
+    def update(self, run_id: str, results: Dict[str, ServiceResult]) -> Optional[WorkflowRun]:
+        """Replace step results of a run; the version changes only when a result did"""
+        with self._db_lock:
+            connection = self._connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute(
+                    "SELECT results, version, summary FROM workflow_runs WHERE run_id = ?", (run_id,)).fetchone()
+                if row is None:
+                    connection.execute("COMMIT")
+                    return None
+                stored, version, summary = json.loads(row[0]), row[1], row[2]
+                changed = {step: json.loads(_encode(result)) for step, result in results.items()
+                           if step not in stored or json.dumps(stored[step]) != _encode(result)}
+                if changed:
+                    stored.update(changed)
+                    version += 1
+                    connection.execute(
+                        "UPDATE workflow_runs SET results = ?, version = ?, accessed_at = ? WHERE run_id = ?",
+                        (json.dumps(stored), version, time.time(), run_id))
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        if changed and summary is not None:
+            self._count('invalidations')
+        return self.get(run_id)
+
+    def summary(self, run: WorkflowRun,
+                render: Callable[[Dict[str, Any], Dict[str, ServiceResult]], ServiceResult]
+                ) -> Tuple[FrozenServiceResult, int, bool]:
+        """``(summary, version, cached)``, rendering it when the cached one is missing or stale.
+
+        Failed renders are returned but not cached, and neither is a render of
+        results that changed meanwhile.
+        """
+        if run.summary is not None and run.summary_version == run.version:
+            self._count('summary_hits')
+            return run.summary, run.version, True
+        summary = render(run.config, run.results).freeze()
+        self._count('summary_renders')
+        if summary.success:
+            with self._db_lock:
+                self._connection.execute(
+                    "UPDATE workflow_runs SET summary = ?, summary_version = ? WHERE run_id = ? AND version = ?",
+                    (_encode(summary), run.version, run.run_id, run.version))
+            run.summary, run.summary_version = summary, run.version
+        return summary, run.version, False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._db_lock:
+            kept = self._connection.execute("SELECT COUNT(*) FROM workflow_runs").fetchone()[0]
+        with self._lock:
+            return dict(self._stats, kept=kept, capacity=self.capacity, path=self.path)
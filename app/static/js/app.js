@@ -0,0 +1,580 @@
+let currentNotification = null;
+let currentRunId = null;
+
+function showNotification(message, type = 'info', duration = 4000) {
+    // Remove existing notification
+    if (currentNotification) {
+        currentNotification.remove();
+    }
+
+    const notification = document.createElement('div');
+    notification.className = `notification ${type}`;
+    notification.textContent = message;
+    document.body.appendChild(notification);
+    currentNotification = notification;
+
+    // Show notification
+    setTimeout(() => notification.classList.add('show'), 100);
+
+    // Hide notification
+    setTimeout(() => {
+        notification.classList.remove('show');
+        setTimeout(() => {
+            if (notification.parentNode) {
+                notification.parentNode.removeChild(notification);
+            }
+            if (currentNotification === notification) {
+                currentNotification = null;
+            }
+        }, 300);
+    }, duration);
+}
+
+function showProgress() {
+    document.getElementById('progressContainer').style.display = 'block';
+    // Reset all steps
+    document.querySelectorAll('.step').forEach(step => {
+        step.className = 'step';
+    });
+}
+
+function hideProgress() {
+    document.getElementById('progressContainer').style.display = 'none';
+}
+
+function generateProgressSteps(workflowSteps) {
+    const container = document.getElementById('progressSteps');
+    container.innerHTML = '';
+
+    workflowSteps.forEach((stepName, index) => {
+        const stepDiv = document.createElement('div');
+        stepDiv.className = 'step';
+        stepDiv.setAttribute('data-step', `step-${index}`);
+
+        stepDiv.innerHTML = `
+            <div class="step-circle">${index + 1}</div>
+            <div class="step-label">${stepName}</div>
+        `;
+
+        container.appendChild(stepDiv);
+    });
+}
+
+function updateProgressStep(stepIndex, status = 'active') {
+    const step = document.querySelector(`[data-step="step-${stepIndex}"]`);
+    if (step) {
+        step.className = `step ${status}`;
+    }
+}
+
+function displayWorkflowConfig(config) {
+    const container = document.getElementById('resultsContainer');
+    container.innerHTML = '';
+
+    const card = document.createElement('div');
+    card.className = 'result-card';
+
+    const header = document.createElement('div');
+    header.className = 'result-header success';
+    header.innerHTML = '✅ Request Analyzed Successfully';
+
+    const body = document.createElement('div');
+    body.className = 'result-body';
+
+    const details = `
+        <h4>Service Details:</h4>
+        <p><strong>Service Type:</strong> ${config.workflow_type || 'General Service'}</p>
+        <p><strong>Category:</strong> ${config.domain || 'General'}</p>
+        <p><strong>Service Level:</strong> ${config.service_level || 'Standard'}</p>
+        <p><strong>Payment Method:</strong> ${config.payment_method || 'Credit Card'}</p>
+
+        <h4>Items/Services:</h4>
+        <ul>
+            ${config.items ? config.items.map(item => 
+                `<li>${item.quantity || 1}x ${item.name || 'Service'} - $${item.price || 0}</li>`
+            ).join('') : '<li>No items specified</li>'}
+        </ul>
+
+        <h4>Customer Information:</h4>
+        <p><strong>Customer ID:</strong> ${config.customer_id || 'Generated'}</p>
+        <p><strong>Email:</strong> ${config.customer_email || 'Not specified'}</p>
+        <p><strong>Delivery Timeline:</strong> ${config.delivery_timeline || 'Standard'}</p>
+    `;
+
+    body.innerHTML = details;
+    card.appendChild(header);
+    card.appendChild(body);
+    container.appendChild(card);
+}
+
+function highlightUsedServices(results) {
+    // Reset all service cards first
+    document.querySelectorAll('.service-card').forEach(card => {
+        card.classList.remove('used');
+    });
+
+    // Map service keys to their corresponding DOM elements
+    const serviceMapping = {
+        'order': 'service-order',
+        'payment': 'service-payment', 
+        'currency_conversion': 'service-currency',
+        'email': 'service-email',
+        'shipping': 'service-shipping',
+        'call': 'service-call',
+        'sms': 'service-sms',
+        'booking': 'service-booking'
+    };
+
+    // Highlight services that were used
+    Object.keys(results).forEach(serviceKey => {
+        const elementId = serviceMapping[serviceKey];
+        if (elementId) {
+            const serviceElement = document.getElementById(elementId);
+            if (serviceElement) {
+                serviceElement.classList.add('used');
+
+                // Add a subtle animation
+                serviceElement.style.animation = 'none';
+                setTimeout(() => {
+                    serviceElement.style.animation = 'highlight 0.8s ease-in-out';
+                }, 100);
+            }
+        }
+    });
+}
+
+function displayExecutionResults(results, workflowSteps = null) {
+    const container = document.getElementById('resultsContainer');
+    container.innerHTML = '';
+
+    // Check if summary exists and display it first
+    if (results.summary && results.summary.success && results.summary.data) {
+        const summaryCard = document.createElement('div');
+        summaryCard.className = 'result-card summary-card';
+        summaryCard.style.cssText = `
+            background: linear-gradient(135deg, #f8f9fa, #e9ecef);
+            border: 2px solid #28a745;
+            margin-bottom: 20px;
+            box-shadow: 0 4px 20px rgba(40,167,69,0.15);
+        `;
+
+        const summaryHeader = document.createElement('div');
+        summaryHeader.className = 'result-header success';
+        summaryHeader.style.cssText = `
+            background: linear-gradient(135deg, #28a745, #20c997);
+            color: white;
+            font-size: 1.2rem;
+            font-weight: bold;
+        `;
+        summaryHeader.innerHTML = '📋 Order Complete - Summary';
+
+        const summaryBody = document.createElement('div');
+        summaryBody.className = 'result-body';
+        summaryBody.style.cssText = `
+            font-size: 1rem;
+            line-height: 1.6;
+        `;
+
+        // Convert markdown to HTML
+        if (typeof marked !== 'undefined') {
+            summaryBody.innerHTML = marked.parse(results.summary.data.summary_text);
+        } else {
+            // Fallback if marked.js doesn't load
+            summaryBody.style.whiteSpace = 'pre-line';
+            summaryBody.innerHTML = results.summary.data.summary_text;
+        }
+
+        summaryCard.appendChild(summaryHeader);
+        summaryCard.appendChild(summaryBody);
+        container.appendChild(summaryCard);
+    }
+
+    // Dynamic service mapping based on workflow steps if available
+    const getServiceInfo = (service, index) => {
+        if (workflowSteps && workflowSteps[index]) {
+            return { name: workflowSteps[index], icon: '✓' };
+        }
+
+        // Fallback to user-friendly names (no technical terms)
+        const serviceMap = {
+            'analysis': { name: 'Request Analysis', icon: '📋' },
+            'order': { name: 'Service Setup', icon: '🔧' },
+            'payment': { name: 'Payment Processing', icon: '💳' },
+            'shipping': { name: 'Delivery Arrangement', icon: '📦' },
+            'email': { name: 'Email Notification', icon: '📧' },
+            'sms': { name: 'SMS Notification', icon: '📱' },
+            'summary': { name: 'Order Summary', icon: '�' }
+        };
+
+        return serviceMap[service] || { name: 'Service Processing', icon: '⚙️' };
+    };
+
+    // Display service details (exclude summary as it's shown above)
+    Object.entries(results).forEach(([service, result], index) => {
+        if (service === 'summary') return; // Skip summary as it's displayed above
+
+        const serviceInfo = getServiceInfo(service, index);
+
+        const card = document.createElement('div');
+        card.className = 'result-card';
+
+        const header = document.createElement('div');
+        header.className = `result-header ${result.success ? 'success' : 'error'}`;
+        header.innerHTML = `${serviceInfo.icon} ${serviceInfo.name} ${result.success ? '✅' : '❌'}`;
+
+        const body = document.createElement('div');
+        body.className = 'result-body';
+
+        if (result.success && result.data) {
+            let details = '';
+            if (service === 'analysis' && result.data.status) {
+                details = `
+                    <strong>Status:</strong> ${result.data.status}<br>
+                    <strong>Type:</strong> ${result.data.workflow_type}<br>
+                    <strong>Items:</strong> ${result.data.total_items}<br>
+                    <strong>Estimated Total:</strong> ${result.data.currency} ${result.data.estimated_total}
+                `;
+            } else if (service === 'order' && result.data.order_id) {
+                details = `<strong>Reference ID:</strong> ${result.data.order_id}`;
+            } else if (service === 'payment' && result.data.payment_id) {
+                details = `
+                    <strong>Payment ID:</strong> ${result.data.payment_id}<br>
+                    <strong>Amount:</strong> ${result.data.currency_display || result.data.amount + ' ' + (result.data.currency || 'USD')}<br>
+                    <strong>Status:</strong> ${result.data.status}
+                `;
+            } else if (service === 'shipping' && result.data.tracking_number) {
+                details = `<strong>Tracking Number:</strong> ${result.data.tracking_number}`;
+            } else if (result.data.notification_id) {
+                details = `<strong>Queued for delivery:</strong> ${result.data.notification_id}`;
+            } else if (service === 'email' && result.data.email_id) {
+                details = `<strong>Email ID:</strong> ${result.data.email_id}`;
+            } else if (service === 'sms' && result.data.sms_id) {
+                details = `<strong>SMS ID:</strong> ${result.data.sms_id}`;
+            } else if (result.data.message) {
+                details = result.data.message;
+            }
+            body.innerHTML = `<p>✅ Completed Successfully</p>${details ? `<p>${details}</p>` : ''}`;
+        } else {
+            const errorMsg = `<p>❌ Service temporarily unavailable</p>`;
+
+            // Add retry options for failed services (excluding analysis)
+            if (service !== 'analysis') {
+                const retrySection = `
+                    <div class="retry-section">
+                        <p><strong>Recovery Options:</strong></p>
+                        <div class="retry-buttons">
+                            <button class="retry-btn email" onclick="retryWithNotification('${service}', 'email')">
+                                📧 Retry + Email Alert
+                            </button>
+                            <button class="retry-btn sms" onclick="retryWithNotification('${service}', 'sms')">
+                                📱 Retry + SMS Alert
+                            </button>
+                            <button class="retry-btn call" onclick="retryWithNotification('${service}', 'call')">
+                                📞 Retry + Support Call
+                            </button>
+                        </div>
+                    </div>
+                `;
+                body.innerHTML = errorMsg + retrySection;
+            } else {
+                body.innerHTML = errorMsg;
+            }
+        }
+
+        card.appendChild(header);
+        card.appendChild(body);
+        container.appendChild(card);
+    });
+
+    // Highlight the services that were used
+    highlightUsedServices(results);
+}
+
+function displayServiceResult(serviceKey, result, serviceName, stepIndex) {
+    const container = document.getElementById('resultsContainer');
+
+    // Get service info
+    const serviceMap = {
+        'analysis': { name: 'Request Analysis', icon: '📋' },
+        'order': { name: 'Service Setup', icon: '🔧' },
+        'payment': { name: 'Payment Processing', icon: '💳' },
+        'shipping': { name: 'Delivery Arrangement', icon: '📦' },
+        'email': { name: 'Email Notification', icon: '📧' },
+        'sms': { name: 'SMS Notification', icon: '📱' },
+        'booking': { name: 'Booking Management', icon: '📅' }
+    };
+
+    const serviceInfo = serviceMap[serviceKey] || { name: serviceName, icon: '⚙️' };
+
+    const card = document.createElement('div');
+    card.className = 'result-card';
+    card.style.animation = 'slideIn 0.5s ease-out';
+    card.setAttribute('data-service', serviceKey);
+
+    const header = document.createElement('div');
+    header.className = `result-header ${result.success ? 'success' : 'error'}`;
+    header.innerHTML = `${serviceInfo.icon} ${serviceInfo.name} ${result.success ? '✅' : '❌'}`;
+
+    const body = document.createElement('div');
+    body.className = 'result-body';
+
+    if (result.success && result.data) {
+        let details = '';
+        if (serviceKey === 'analysis' && result.data.status) {
+            details = `
+                <strong>Status:</strong> ${result.data.status}<br>
+                <strong>Type:</strong> ${result.data.workflow_type}<br>
+                <strong>Items:</strong> ${result.data.total_items}<br>
+                <strong>Estimated Total:</strong> ${result.data.currency} ${result.data.estimated_total}
+            `;
+        } else if (serviceKey === 'order' && result.data.order_id) {
+            details = `<strong>Reference ID:</strong> ${result.data.order_id}`;
+        } else if (serviceKey === 'payment' && result.data.payment_id) {
+            details = `
+                <strong>Payment ID:</strong> ${result.data.payment_id}<br>
+                <strong>Amount:</strong> ${result.data.currency_display || result.data.amount + ' ' + (result.data.currency || 'USD')}<br>
+                <strong>Status:</strong> ${result.data.status}
+            `;
+        } else if (serviceKey === 'shipping' && result.data.tracking_number) {
+            details = `<strong>Tracking Number:</strong> ${result.data.tracking_number}`;
+        } else if (result.data.notification_id) {
+            details = `<strong>Queued for delivery:</strong> ${result.data.notification_id}`;
+        } else if (serviceKey === 'email' && result.data.email_id) {
+            details = `<strong>Email ID:</strong> ${result.data.email_id}`;
+        } else if (serviceKey === 'sms' && result.data.sms_id) {
+            details = `<strong>SMS ID:</strong> ${result.data.sms_id}`;
+        } else if (result.data.message) {
+            details = result.data.message;
+        }
+        body.innerHTML = `<p>✅ Completed Successfully</p>${details ? `<p>${details}</p>` : ''}`;
+    } else {
+        const errorMsg = `<p>❌ Service temporarily unavailable</p>`;
+
+        // Add retry options for failed services (excluding analysis)
+        if (serviceKey !== 'analysis') {
+            const retrySection = `
+                <div class="retry-section">
+                    <p><strong>Recovery Options:</strong></p>
+                    <div class="retry-buttons">
+                        <button class="retry-btn email" onclick="retryWithNotification('${serviceKey}', 'email')">
+                            📧 Retry + Email Alert
+                        </button>
+                        <button class="retry-btn sms" onclick="retryWithNotification('${serviceKey}', 'sms')">
+                            📱 Retry + SMS Alert
+                        </button>
+                        <button class="retry-btn call" onclick="retryWithNotification('${serviceKey}', 'call')">
+                            📞 Retry + Support Call
+                        </button>
+                    </div>
+                </div>
+            `;
+            body.innerHTML = errorMsg + retrySection;
+        } else {
+            body.innerHTML = errorMsg;
+        }
+    }
+
+    card.appendChild(header);
+    card.appendChild(body);
+    container.appendChild(card);
+
+    // Scroll to the new card
+    card.scrollIntoView({ behavior: 'smooth', block: 'center' });
+}
+
+async function loadSummary(summaryUrl) {
+    // The summary is rendered on the server the first time it is requested
+    try {
+        const response = await fetch(summaryUrl);
+        const result = await response.json();
+        if (result.success) {
+            document.querySelectorAll('#resultsContainer .summary-card').forEach(card => card.remove());
+            displaySummaryResult(result.summary);
+        }
+    } catch (error) {
+        showNotification(`❌ Could not load summary: ${error.message}`, 'error');
+    }
+}
+
+function displaySummaryResult(summaryResult) {
+    if (!summaryResult.success || !summaryResult.data) return;
+
+    const container = document.getElementById('resultsContainer');
+
+    // Create summary card at the top
+    const summaryCard = document.createElement('div');
+    summaryCard.className = 'result-card summary-card';
+    summaryCard.style.cssText = `
+        background: linear-gradient(135deg, #f8f9fa, #e9ecef);
+        border: 2px solid #28a745;
+        margin-bottom: 20px;
+        box-shadow: 0 4px 20px rgba(40,167,69,0.15);
+        animation: slideIn 0.8s ease-out;
+    `;
+
+    const summaryHeader = document.createElement('div');
+    summaryHeader.className = 'result-header success';
+    summaryHeader.style.cssText = `
+        background: linear-gradient(135deg, #28a745, #20c997);
+        color: white;
+        font-size: 1.2rem;
+        font-weight: bold;
+    `;
+    summaryHeader.innerHTML = '📋 Order Complete - Summary';
+
+    const summaryBody = document.createElement('div');
+    summaryBody.className = 'result-body';
+    summaryBody.style.cssText = `
+        font-size: 1rem;
+        line-height: 1.6;
+    `;
+
+    // Convert markdown to HTML
+    if (typeof marked !== 'undefined') {
+        summaryBody.innerHTML = marked.parse(summaryResult.data.summary_text);
+    } else {
+        // Fallback if marked.js doesn't load
+        summaryBody.style.whiteSpace = 'pre-line';
+        summaryBody.innerHTML = summaryResult.data.summary_text;
+    }
+
+    summaryCard.appendChild(summaryHeader);
+    summaryCard.appendChild(summaryBody);
+
+    // Insert at the top
+    container.insertBefore(summaryCard, container.firstChild);
+
+    // Scroll to top to show summary
+    summaryCard.scrollIntoView({ behavior: 'smooth', block: 'start' });
+}
+
+        async function executeWorkflow() {
+    const input = document.getElementById('userInput').value;
+    if (!input.trim()) {
+        showNotification('Please enter some text to execute', 'warning');
+        return;
+    }
+
+    // Disable button during execution
+    const button = document.querySelector('button');
+    const originalText = button.textContent;
+    button.disabled = true;
+    button.textContent = 'Processing...';
+    button.style.opacity = '0.7';
+
+    // Clear previous results
+    document.getElementById('resultsContainer').innerHTML = '';
+
+    showNotification('Starting workflow execution...', 'info');
+
+    try {
+        // Step 1: Initial request to get configuration
+        showNotification('📋 Analyzing your request...', 'info');
+
+        const response = await fetch('/api/execute', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ input: input })
+        });
+        const result = await response.json();
+
+        if (result.success) {
+            // Get workflow steps and results
+            const workflowSteps = result.workflow_steps || ['Reviewing Request', 'Setting Up Service', 'Processing Payment', 'Arranging Delivery', 'Sending Confirmation'];
+            const results = result.results;
+
+            generateProgressSteps(workflowSteps);
+            showProgress();
+
+            // Step 2: Show each workflow step with realistic timing
+            for (let i = 0; i < workflowSteps.length; i++) {
+                updateProgressStep(i, 'active');
+
+                // Show step-specific notification
+                const stepName = workflowSteps[i];
+                showNotification(`🔄 ${stepName} in progress...`, 'info');
+
+                // Realistic delays for different steps
+                const stepDelays = {
+                    0: 1500, // Review Request
+                    1: 2200, // Service Setup  
+                    2: 2800, // Payment Processing
+                    3: 1800, // Delivery Arrangement
+                    4: 1200  // Confirmation
+                };
+
+                const delay = stepDelays[i] || 1500;
+                await new Promise(resolve => setTimeout(resolve, delay));
+
+                // Complete the step
+                updateProgressStep(i, 'completed');
+                showNotification(`✅ ${stepName} completed!`, 'success');
+
+                // Small pause between steps
+                await new Promise(resolve => setTimeout(resolve, 400));
+            }
+
+            // Show final results
+            showNotification('🎉 Workflow completed successfully!', 'success');
+            currentRunId = result.run_id || null;
+            displayExecutionResults(result.results, workflowSteps);
+            if (result.saga && result.saga.status !== 'completed') {
+                const undone = Object.keys(result.saga.compensations || {}).join(', ') || 'nothing to undo';
+                showNotification(`↩️ ${result.saga.failed_step} failed - order rolled back (${undone})`, 'warning');
+            }
+            if (result.summary_url) {
+                await loadSummary(result.summary_url);
+            }
+
+        } else {
+            hideProgress();
+            showNotification(`Execution failed: ${result.error_message}`, 'error');
+        }
+    } catch (error) {
+        hideProgress();
+        showNotification(`❌ Error: ${error.message}`, 'error');
+    } finally {
+        // Re-enable button
+        button.disabled = false;
+        button.textContent = originalText;
+        button.style.opacity = '1';
+    }
+}
+
+async function retryWithNotification(serviceName, notificationType) {
+    const input = document.getElementById('userInput').value;
+    if (!input.trim()) {
+        showNotification('Please enter some text to retry', 'warning');
+        return;
+    }
+
+    showNotification(`Retrying ${serviceName} service with ${notificationType} notification...`, 'info');
+
+    try {
+        const response = await fetch('/api/retry', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ 
+                input: input,
+                service: serviceName,
+                notification_type: notificationType,
+                run_id: currentRunId
+            })
+        });
+        const result = await response.json();
+
+        if (result.success) {
+            showNotification(`${serviceName} service retry successful! ${notificationType} notification sent.`, 'success');
+            // Update the result display with workflow steps
+            const workflowSteps = result.workflow_steps || ['Processing Request', 'Completing Setup', 'Finalizing', 'Sending Confirmation'];
+            displayExecutionResults(result.results, workflowSteps);
+            if (result.summary_url) {
+                await loadSummary(result.summary_url);
+            }
+        } else {
+            showNotification(`Retry failed: ${result.error_message}`, 'error');
+        }
+    } catch (error) {
+        showNotification(`❌ Retry error: ${error.message}`, 'error');
+    }
+}
@@ -0,0 +1,4 @@
+"""Performance benchmarks for the workflow orchestration system.
+
+Run from the repository root, e.g. ``python -m benchmarks.startup``.
+"""
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Allocation benchmark for ``ServiceResult`` and one ``/api/execute`` workflow.
+
+Uses ``tracemalloc`` to report:
+
+- bytes per ``ServiceResult`` instance (with and without a data dict)
+- memory blocks and bytes allocated during one workflow that are still alive
+  when the response is serialized (the results structure), grouped by file,
+  plus the peak traced memory of the request
+
+The workflow runs offline against the replay LLM backend with a same-currency
+input, so no exchange-rate API call is made.
+
+Usage:
+    python -m benchmarks.allocations
+    python -m benchmarks.allocations --runs 50
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+sys.path.insert(0, str(APP_DIR))
+
+WORKFLOW_INPUT = "Order 3 laptops for our office team"
+
+
+def measure_service_results(count: int = 10000) -> Dict[str, float]:
+    """Average traced bytes per ``ServiceResult``"""
+    from services.base_service import ServiceResult
+
+    report = {}
+    for label, data in (('empty', None), ('with_data', {'status': 'ok'})):
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        results = [ServiceResult(True, data) for _ in range(count)]
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        report[f'bytes_per_result_{label}'] = round((after - before - sys.getsizeof(results)) / count, 1)
+    return report
+
+
+def measure_workflow(runs: int = 20, warmup: int = 3) -> Dict[str, Any]:
+    """Live blocks and bytes allocated by one workflow at serialization time"""
+    os.environ.setdefault('LLM_BACKEND', 'replay')
+    logging.disable(logging.CRITICAL)
+
+    import main
+
+    app = main.app
+    client = app.test_client()
+    provider = app.json
+    serialize = provider.response
+    snapshots = []
+
+    def snapshot_then_serialize(*args, **kwargs):
+        if tracemalloc.is_tracing():
+            snapshots.append((tracemalloc.take_snapshot(), tracemalloc.get_traced_memory()[1]))
+        return serialize(*args, **kwargs)
+
+    provider.response = snapshot_then_serialize
+    for _ in range(warmup):
+        client.post('/api/execute', json={'input': WORKFLOW_INPUT})
+
+    blocks, sizes, peaks = [], [], []
+    by_file: Dict[str, List[int]] = defaultdict(list)
+    for _ in range(runs):
+        snapshots.clear()
+        tracemalloc.start(1)
+        baseline = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        client.post('/api/execute', json={'input': WORKFLOW_INPUT})
+        tracemalloc.stop()
+        if not snapshots:
+            continue
+        snapshot, peak = snapshots[-1]
+        stats = snapshot.compare_to(baseline, 'filename')
+        blocks.append(sum(stat.count_diff for stat in stats if stat.count_diff > 0))
+        sizes.append(sum(stat.size_diff for stat in stats if stat.size_diff > 0))
+        peaks.append(peak)
+        per_file = defaultdict(int)
+        for stat in stats:
+            if stat.count_diff > 0:
+                per_file[os.path.basename(stat.traceback[0].filename)] += stat.count_diff
+        for filename in ('main.py', 'base_service.py', 'updated_services.py'):
+            by_file[filename].append(per_file.get(filename, 0))
+    provider.response = serialize
+
+    return {
+        'runs': len(blocks),
+        'live_blocks': int(statistics.median(blocks)),
+        'live_bytes': int(statistics.median(sizes)),
+        'peak_bytes': int(statistics.median(peaks)),
+        'blocks_by_file': {name: int(statistics.median(counts)) for name, counts in by_file.items()}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ServiceResult and workflow allocation benchmark")
+    parser.add_argument('--runs', type=int, default=20, help='Measured workflows (default: 20)')
+    args = parser.parse_args()
+
+    results = measure_service_results()
+    print(f"ServiceResult: {results['bytes_per_result_empty']} bytes without data, "
+          f"{results['bytes_per_result_with_data']} bytes with a shared data dict")
+
+    workflow = measure_workflow(args.runs)
+    print(f"/api/execute ({workflow['runs']} runs, median):")
+    print(f"  live blocks at serialization: {workflow['live_blocks']} ({workflow['live_bytes']} bytes)")
+    print(f"  peak traced memory:           {workflow['peak_bytes']} bytes")
+    for filename, count in workflow['blocks_by_file'].items():
+        print(f"  blocks from {filename:<20} {count}")
+
+
+if __name__ == '__main__':
+    main()
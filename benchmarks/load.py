@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test of ``/api/parse``, ``/api/execute`` and ``/api/retry``.
+
+By default a server process is started with the app, the OpenAI-compatible
+LLM stub (``services/llm_stub.py``) and the exchange rate stub
+(``services/fx_stub.py``), so no network access or API quota is needed, and
+client threads run in this process. Each scenario runs for ``--duration``
+seconds at ``--concurrency``. The report gives throughput, p50/p95/p99 latency
+and the mix of outcomes per scenario:
+
+- ``ok``        HTTP 200 with ``success: true`` and every service succeeded
+- ``degraded``  ``success: true`` but a service failed (counted per service)
+- ``failed``    ``success: false``
+- ``http_<n>``  any other status; ``error:<Exception>`` when the request itself failed
+
+Results can be saved as a JSON baseline and compared against later. The
+comparison exits with status 1 when a scenario's latency or throughput is
+worse than the baseline by more than ``--threshold``, or its error rate is
+higher by more than ``--max-error-rise`` (percentage points, as a fraction).
+``benchmarks/baselines/load.json`` is a baseline of the default configuration;
+it is only meaningful on comparable hardware, so re-record it (``--save-baseline``)
+on the machine that runs the comparison.
+
+Usage:
+    python -m benchmarks.load
+    python -m benchmarks.load --concurrency 16 --duration 20 --llm-latency-ms 300
+    python -m benchmarks.load --save-baseline
+    python -m benchmarks.load --compare --threshold 0.2 --max-error-rise 0.01
+    python -m benchmarks.load --url http://localhost:5000 --scenarios execute
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+ROOT = Path(__file__).resolve().parent.parent
+APP_DIR = ROOT / "app"
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baselines" / "load.json"
+
+SCENARIOS = ('parse', 'execute', 'retry')
+
+PROMPTS = [
+    "Order 3 laptops for the Berlin office, paying in EUR",
+    "Book a flight to London for 2 people, paid in GBP",
+    "Reserve a hotel room in Tokyo for 4 nights, paying in JPY",
+    "Buy 10 software licenses for the team in USD",
+    "Schedule a dentist appointment and pay in CAD",
+    "Cater a conference for 50 people in Zurich, pay in CHF",
+]
+
+RETRIES = [('payment', 'email'), ('order', 'sms'), ('shipping', 'email'), ('email', 'call')]
+
+# metrics compared against the baseline, and whether higher is better
+COMPARED = (('throughput_rps', True), ('p50_ms', False), ('p95_ms', False), ('p99_ms', False))
+
+
+def request_body(scenario: str, index: int) -> Dict[str, Any]:
+    prompt = PROMPTS[index % len(PROMPTS)]
+    if scenario == 'retry':
+        service, notification_type = RETRIES[index % len(RETRIES)]
+        return {'input': prompt, 'service': service, 'notification_type': notification_type}
+    return {'input': prompt}
+
+
+def classify(status: int, payload: Optional[Dict[str, Any]]) -> Tuple[str, List[str]]:
+    """Outcome of one response, plus the services that failed in it"""
+    if status != 200:
+        return f"http_{status}", []
+    if not payload or not payload.get('success'):
+        return 'failed', []
+    results = payload.get('results') or {}
+    failed = sorted(name for name, result in results.items()
+                    if isinstance(result, dict) and result.get('success') is False)
+    return ('degraded' if failed else 'ok'), failed
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(fraction * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Worker(threading.Thread):
+    """Sends requests for one scenario over a keep-alive connection until the deadline"""
+
+    def __init__(self, host: str, port: int, scenario: str, offset: int, deadline: float):
+        super().__init__(daemon=True)
+        self.host, self.port = host, port
+        self.scenario = scenario
+        self.offset = offset
+        self.deadline = deadline
+        self.latencies: List[float] = []
+        self.outcomes: Counter = Counter()
+        self.service_failures: Counter = Counter()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        return http.client.HTTPConnection(self.host, self.port, timeout=120)
+
+    def run(self):
+        connection = self._connect()
+        index = self.offset
+        path = f"/api/{self.scenario}"
+        while time.perf_counter() < self.deadline:
+            body = json.dumps(request_body(self.scenario, index)).encode('utf-8')
+            index += 1
+            started = time.perf_counter()
+            try:
+                connection.request('POST', path, body, {'Content-Type': 'application/json'})
+                response = connection.getresponse()
+                data = response.read()
+                elapsed = time.perf_counter() - started
+                try:
+                    payload = json.loads(data)
+                except ValueError:
+                    payload = None
+                outcome, failed = classify(response.status, payload)
+            except (OSError, http.client.HTTPException) as e:
+                elapsed = time.perf_counter() - started
+                outcome, failed = f"error:{type(e).__name__}", []
+                connection.close()
+                connection = self._connect()
+            self.latencies.append(elapsed)
+            self.outcomes[outcome] += 1
+            self.service_failures.update(failed)
+        connection.close()
+
+
+def run_scenario(host: str, port: int, scenario: str, concurrency: int, duration: float,
+                 warmup: float) -> Dict[str, Any]:
+    if warmup > 0:
+        warm = [Worker(host, port, scenario, i * 7, time.perf_counter() + warmup) for i in range(concurrency)]
+        for worker in warm:
+            worker.start()
+        for worker in warm:
+            worker.join()
+
+    started = time.perf_counter()
+    workers = [Worker(host, port, scenario, i * 7, started + duration) for i in range(concurrency)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    wall = time.perf_counter() - started
+
+    latencies = sorted(latency for worker in workers for latency in worker.latencies)
+    outcomes, service_failures = Counter(), Counter()
+    for worker in workers:
+        outcomes.update(worker.outcomes)
+        service_failures.update(worker.service_failures)
+    requests = len(latencies)
+    errors = requests - outcomes['ok'] - outcomes['degraded']
+    return {
+        'requests': requests,
+        'throughput_rps': round(requests / wall, 2) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        'error_rate': round(errors / requests, 4) if requests else 0.0,
+        'outcomes': dict(outcomes.most_common()),
+        'service_failures': dict(service_failures.most_common())
+    }
+
+
+def serve_stack(args):
+    """Child process: stubs plus the app on ephemeral ports; prints the app port when ready"""
+    sys.path.insert(0, str(APP_DIR))
+    # before any service import, which configures logging
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    from services import fx_stub, llm_stub
+
+    servers = [llm_stub.create_server(port=0, latency_ms=args.llm_latency_ms),
+               fx_stub.create_server(port=0, latency_ms=args.fx_latency_ms)]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    llm_port, fx_port = (server.server_address[1] for server in servers)
+
+    os.environ.update({
+        'LLM_BACKEND': 'openai',
+        'LLM_BASE_URL': f"http://127.0.0.1:{llm_port}/v1",
+        'CURRENCY_API_BASE_URL': f"http://127.0.0.1:{fx_port}",
+        'SERVICE_FAILURE_RATE': str(args.failure_rate),
+    })
+
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    from main import app, shutdown_background_workers
+
+    # keep-alive, so connection setup is not part of every measured request
+    WSGIRequestHandler.protocol_version = "HTTP/1.1"
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    print(f"READY {server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shutdown_background_workers()
+
+
+def start_stack(args) -> Tuple[subprocess.Popen, int]:
+    command = [sys.executable, '-m', 'benchmarks.load', '--serve-stack',
+               '--llm-latency-ms', str(args.llm_latency_ms), '--fx-latency-ms', str(args.fx_latency_ms),
+               '--failure-rate', str(args.failure_rate)]
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line.startswith('READY '):
+        process.kill()
+        raise RuntimeError(f"Server process did not start (exit status {process.wait()})")
+    return process, int(line.split()[1])
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float,
+            max_error_rise: float) -> List[str]:
+    """Regressions of ``report`` against ``baseline``: latency or throughput worse by more
+    than ``threshold`` (a fraction), or an error rate up by more than ``max_error_rise``"""
+    regressions = []
+    for scenario, current in report['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(scenario)
+        if not previous:
+            continue
+        for metric, higher_is_better in COMPARED:
+            before, after = previous.get(metric), current.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            if (higher_is_better and change < -threshold) or (not higher_is_better and change > threshold):
+                regressions.append(f"{scenario} {metric}: {before} -> {after} ({change:+.0%})")
+        rise = current['error_rate'] - previous.get('error_rate', 0.0)
+        if rise > max_error_rise:
+            regressions.append(f"{scenario} error_rate: {previous.get('error_rate')} -> {current['error_rate']}")
+    return regressions
+
+
+def print_report(report: Dict[str, Any]):
+    config = report['config']
+    print(f"Load test: concurrency {config['concurrency']}, {config['duration']}s per scenario, "
+          f"LLM {config['llm_latency_ms']}ms, FX {config['fx_latency_ms']}ms, failure rate {config['failure_rate']}")
+    print(f"{'scenario':<9} {'requests':>8} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>7}  outcomes")
+    for scenario, row in report['scenarios'].items():
+        outcomes = ', '.join(f"{name} {count}" for name, count in row['outcomes'].items())
+        print(f"{scenario:<9} {row['requests']:>8} {row['throughput_rps']:>8.1f} {row['p50_ms']:>7.1f}ms "
+              f"{row['p95_ms']:>7.1f}ms {row['p99_ms']:>7.1f}ms {row['error_rate']:>7.1%}  {outcomes}")
+        if row['service_failures']:
+            failures = ', '.join(f"{name} {count}" for name, count in row['service_failures'].items())
+            print(f"{'':<9} service failures: {failures}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test against local LLM and FX stubs")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Comma-separated subset of parse,execute,retry')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients (default: 8)')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per scenario (default: 10)')
+    parser.add_argument('--warmup', type=float, default=1.0, help='Unmeasured seconds before each scenario (default: 1)')
+    parser.add_argument('--llm-latency-ms', type=float, default=0.0, help='LLM stub latency (default: 0)')
+    parser.add_argument('--fx-latency-ms', type=float, default=0.0, help='FX stub latency (default: 0)')
+    parser.add_argument('--failure-rate', type=float, default=0.0,
+                        help='Simulated service failure rate, SERVICE_FAILURE_RATE (default: 0)')
+    parser.add_argument('--url', help='Load an already running server instead of starting one')
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE, help=f'Baseline file (default: {DEFAULT_BASELINE.relative_to(ROOT)})')
+    parser.add_argument('--save-baseline', action='store_true', help='Write the results to the baseline file')
+    parser.add_argument('--compare', action='store_true', help='Fail when results regress against the baseline')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed regression as a fraction (default: 0.2)')
+    parser.add_argument('--max-error-rise', type=float, default=0.01,
+                        help='Allowed error rate increase as a fraction of requests (default: 0.01)')
+    parser.add_argument('--output', type=Path, help='Also write the results to this JSON file')
+    parser.add_argument('--serve-stack', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_stack:
+        serve_stack(args)
+        return
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    process = None
+    if args.url:
+        target = urlparse(args.url)
+        host, port = target.hostname, target.port or 80
+    else:
+        process, port = start_stack(args)
+        host = '127.0.0.1'
+
+    try:
+        report = {
+            'config': {
+                'concurrency': args.concurrency, 'duration': args.duration,
+                'llm_latency_ms': args.llm_latency_ms, 'fx_latency_ms': args.fx_latency_ms,
+                'failure_rate': args.failure_rate, 'target': args.url or 'local stubs'
+            },
+            'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                            'cpus': os.cpu_count()},
+            'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'scenarios': {scenario: run_scenario(host, port, scenario, args.concurrency, args.duration, args.warmup)
+                          for scenario in scenarios}
+        }
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + '\n')
+
+    if args.compare:
+        if not args.baseline.exists():
+            print(f"No baseline at {args.baseline}; record one with --save-baseline")
+            sys.exit(2)
+        baseline = json.loads(args.baseline.read_text())
+        if baseline.get('config') != report['config']:
+            print("Warning: baseline was recorded with a different configuration")
+        regressions = compare(report, baseline, args.threshold, args.max_error_rise)
+        if regressions:
+            print(f"FAIL: regressions beyond {args.threshold:.0%} (error rate {args.max_error_rise:+.1%}) "
+                  f"of {args.baseline}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"OK: within {args.threshold:.0%} of {args.baseline}")
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(report, indent=2) + '\n')
+        print(f"Baseline written to {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Per-call overhead of the service metrics instrumentation.
+
+Times a trivial ``BaseService`` with and without the ``execute`` wrapper that
+``BaseService.__init_subclass__`` installs, and fails (exit status 1) when the
+median overhead exceeds the budget.
+
+Usage:
+    python -m benchmarks.metrics_overhead
+    python -m benchmarks.metrics_overhead --calls 200000 --budget-ns 1000
+"""
+
+import argparse
+import logging
+import statistics
+import sys
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+sys.path.insert(0, str(APP_DIR))
+
+from services.base_service import BaseService, ServiceResult
+
+RESULT = ServiceResult(True, {'status': 'ok'})
+
+
+class NoopService(BaseService):
+    """Returns a prebuilt result so only the instrumentation is measured"""
+
+    def __init__(self):
+        super().__init__("BenchmarkNoopService", failure_rate=0.0)
+
+    def execute(self, **kwargs) -> ServiceResult:
+        return RESULT
+
+
+def _per_call_ns(func, calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - started) / calls * 1e9
+
+
+def run(calls: int = 100000, repeats: int = 7) -> dict:
+    logging.disable(logging.CRITICAL)
+    service = NoopService()
+    raw_execute = NoopService.execute.__wrapped__
+    instrumented = service.execute
+    raw = lambda: raw_execute(service)
+
+    raw_ns, instrumented_ns = [], []
+    for _ in range(repeats):
+        raw_ns.append(_per_call_ns(raw, calls))
+        instrumented_ns.append(_per_call_ns(instrumented, calls))
+    raw_median = statistics.median(raw_ns)
+    instrumented_median = statistics.median(instrumented_ns)
+    return {
+        'calls': calls,
+        'raw_ns': round(raw_median, 1),
+        'instrumented_ns': round(instrumented_median, 1),
+        'overhead_ns': round(instrumented_median - raw_median, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Service metrics instrumentation overhead")
+    parser.add_argument('--calls', type=int, default=100000, help='Calls per measurement (default: 100000)')
+    parser.add_argument('--budget-ns', type=float, default=1000.0, help='Maximum overhead per call (default: 1000)')
+    args = parser.parse_args()
+
+    report = run(args.calls)
+    print(f"execute(): {report['raw_ns']} ns raw, {report['instrumented_ns']} ns instrumented, "
+          f"overhead {report['overhead_ns']} ns per call (budget {args.budget_ns:.0f} ns)")
+    if report['overhead_ns'] > args.budget_ns:
+        print("FAIL: instrumentation overhead exceeds budget")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Serialization benchmark for ``/api/execute`` responses.
+
+Builds a representative execute response (real order and summary services,
+``--items`` line items) and reports serialization time and bytes per response
+for Flask's default provider and ``FastJSONProvider`` (stdlib and orjson),
+in full and compact mode, with and without gzip.
+
+Usage:
+    python -m benchmarks.serialization
+    python -m benchmarks.serialization --items 200 --iterations 2000
+"""
+
+import argparse
+import gzip
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+sys.path.insert(0, str(APP_DIR))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from services.base_service import ServiceResult
+from services.json_provider import FastJSONProvider, compact_results, orjson
+from services.llm_stub import synthesize_workflow_config
+from services.updated_services import OrderCreationService, OrderSummaryService
+
+
+def build_response(item_count: int) -> Dict[str, Any]:
+    """An execute response shaped like the one ``main.execute_workflow`` returns"""
+    config = synthesize_workflow_config("Order laptops for the office, paying in EUR")
+    template = config['items'][0]
+    config['items'] = [dict(template, name=f"{template['name']} {i + 1}", price=template['price'] + i)
+                       for i in range(item_count)]
+    total = sum(item['price'] * item['quantity'] for item in config['items'])
+    config.update(converted_total=total, converted_amount=total, original_amount=total)
+
+    order_service = OrderCreationService()
+    summary_service = OrderSummaryService()
+    order_service.failure_rate = summary_service.failure_rate = 0.0
+
+    order = order_service.execute(customer_id=config['customer_id'], items=config['items'], channel=config['channel'])
+    results = {
+        'analysis': ServiceResult(True, {
+            'status': 'analyzed', 'workflow_type': config['workflow_type'], 'domain': config['domain'],
+            'total_items': item_count, 'estimated_total': total, 'currency': config['currency'],
+            'message': 'Request successfully analyzed and validated'}),
+        'currency_conversion': ServiceResult(True, {
+            'original_amount': total, 'converted_amount': total, 'from_currency': config['currency'],
+            'to_currency': config['target_currency'], 'exchange_rate': 1.0, 'source': 'no_conversion_needed',
+            'cross_border': False, 'payment_country': config['payment_country']}),
+        'order': order,
+        'payment': ServiceResult(True, {
+            'payment_id': 'PAY-0001', 'amount': total, 'currency': config['currency'], 'status': 'completed'}),
+    }
+    summary = summary_service.execute(config=config, results=results)
+    results['summary'] = summary
+    return {'success': True, 'results': results, 'workflow_steps': config['workflow_steps']}
+
+
+def _median_us(func: Callable[[], Any], iterations: int) -> float:
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1_000_000
+
+
+def run(item_count: int = 20, iterations: int = 1000, gzip_level: int = 6) -> List[Dict[str, Any]]:
+    app = Flask(__name__)
+    providers = [('flask default', DefaultJSONProvider(app))]
+    stdlib_provider = FastJSONProvider(app)
+    stdlib_provider.use_orjson = False
+    providers.append(('fast (stdlib)', stdlib_provider))
+    if orjson is not None:
+        orjson_provider = FastJSONProvider(app)
+        orjson_provider.use_orjson = True
+        providers.append(('fast (orjson)', orjson_provider))
+
+    full = build_response(item_count)
+    compact = dict(full, results=compact_results(full['results']))
+
+    rows = []
+    for name, provider in providers:
+        dumps = provider.dumps_bytes if isinstance(provider, FastJSONProvider) else (
+            lambda obj, p=provider: p.dumps(obj).encode('utf-8'))
+        for mode, payload in (('full', full), ('compact', compact)):
+            body = dumps(payload)
+            rows.append({
+                'serializer': name,
+                'mode': mode,
+                'dumps_us': round(_median_us(lambda: dumps(payload), iterations), 1),
+                'bytes': len(body),
+                'gzip_us': round(_median_us(lambda: gzip.compress(body, compresslevel=gzip_level, mtime=0),
+                                            max(1, iterations // 10)), 1),
+                'gzip_bytes': len(gzip.compress(body, compresslevel=gzip_level, mtime=0))
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API response serialization benchmark")
+    parser.add_argument('--items', type=int, default=20, help='Line items in the order (default: 20)')
+    parser.add_argument('--iterations', type=int, default=1000, help='Serializations per measurement (default: 1000)')
+    parser.add_argument('--gzip-level', type=int, default=6, help='gzip level (default: 6)')
+    args = parser.parse_args()
+
+    rows = run(args.items, args.iterations, args.gzip_level)
+    print(f"/api/execute response with {args.items} items (median of {args.iterations} runs)")
+    print(f"{'serializer':<15} {'mode':<8} {'dumps':>10} {'bytes':>8} {'gzip':>10} {'gz bytes':>9}")
+    for row in rows:
+        print(f"{row['serializer']:<15} {row['mode']:<8} {row['dumps_us']:>8.1f}us {row['bytes']:>8} "
+              f"{row['gzip_us']:>8.1f}us {row['gzip_bytes']:>9}")
+
+
+if __name__ == '__main__':
+    main()
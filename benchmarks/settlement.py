@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Payment settlement benchmark.
+
+Settles ``--payments`` authorized payments in mixed currencies two ways. First
+one at a time, as if settlement still ran inline on the request path (a
+batch of one per payment, one transaction each). Then in batches of each
+``--batch-sizes``. It reports the settlement cost per payment and the
+throughput, and checks that both give the same ledger totals.
+
+Usage:
+    python -m benchmarks.settlement
+    python -m benchmarks.settlement --payments 20000 --batch-sizes 50 500 5000
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+sys.path.insert(0, str(APP_DIR))
+
+from services.rate_matrix import REFERENCE_USD_RATES, RateMatrix
+from services.settlement import SettlementPipeline
+
+CURRENCIES = sorted(REFERENCE_USD_RATES)
+
+
+def run(payments: int, batch_size: int, inline: bool, directory: str, seed: int = 7):
+    matrix = RateMatrix(REFERENCE_USD_RATES)
+    pipeline = SettlementPipeline(lambda: matrix, path=f"{directory}/settlement-{batch_size}-{inline}.sqlite3",
+                                  batch_size=batch_size, background=False)
+    rng = random.Random(seed)
+    work = [(f"PAY-{i:07d}", f"CUST-{rng.randrange(1000):04d}", round(rng.uniform(5, 2000), 2), rng.choice(CURRENCIES))
+            for i in range(payments)]
+    started = time.perf_counter()
+    for payment_id, customer_id, amount, currency in work:
+        pipeline.submit(payment_id, customer_id, amount, currency)
+        if inline:
+            pipeline.settle_pending()
+    pipeline.settle_pending()
+    elapsed = time.perf_counter() - started
+    stats = pipeline.stats()
+    return {
+        'mode': 'inline' if inline else f'batch {batch_size}',
+        'us_per_payment': elapsed / payments * 1e6,
+        'payments_per_second': payments / elapsed,
+        'batches': stats['batches'],
+        'usd_settled': stats['usd_settled'],
+        'usd_fees': stats['usd_fees']
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched payment settlement benchmark")
+    parser.add_argument('--payments', type=int, default=10000, help='Payments to settle (default: 10000)')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[50, 500],
+                        help='Batch sizes (default: 50 500)')
+    args = parser.parse_args()
+
+    print(f"{args.payments} payments in {len(CURRENCIES)} currencies")
+    print(f"{'mode':>11} {'us/payment':>11} {'payments/s':>11} {'batches':>8} {'USD settled':>14} {'USD fees':>11}")
+    with tempfile.TemporaryDirectory() as directory:
+        rows = [run(args.payments, 1, True, directory)]
+        rows += [run(args.payments, size, False, directory) for size in args.batch_sizes]
+    for row in rows:
+        print(f"{row['mode']:>11} {row['us_per_payment']:>11.1f} {row['payments_per_second']:>11.0f} "
+              f"{row['batches']:>8} {row['usd_settled']:>14.2f} {row['usd_fees']:>11.2f}")
+    totals = {(round(row['usd_settled'], 2), round(row['usd_fees'], 2)) for row in rows}
+    if len(totals) > 1:
+        print("ledger totals differ between modes")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
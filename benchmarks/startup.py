@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark based on ``python -X importtime``.
+
+Imports the Flask app (``app/main.py``) in fresh interpreters, reports the
+slowest imports, and fails (exit status 1) when the median import time exceeds
+the budget or when an SDK that must stay lazy is imported at startup.
+
+Usage:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --budget-ms 400 --runs 7
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+
+# SDKs that must only be imported when first used
+LAZY_MODULES = ('groq', 'temporalio', 'requests', 'httpx')
+
+_IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def measure_once(module: str = "main") -> Tuple[float, List[Tuple[str, int, int]]]:
+    """Import ``module`` in a fresh interpreter; returns (cumulative ms, [(name, self_us, cumulative_us)])"""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=APP_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    imports = []
+    total_us = 0
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = int(match.group(1)), int(match.group(2)), match.group(3), match.group(4)
+        imports.append((name, self_us, cumulative_us))
+        if name == module and len(indent) == 1:
+            total_us = cumulative_us
+    return total_us / 1000.0, imports
+
+
+def run(runs: int = 5, budget_ms: float = 500.0, top: int = 10) -> Dict:
+    timings = []
+    imports: List[Tuple[str, int, int]] = []
+    for _ in range(runs):
+        total_ms, imports = measure_once()
+        timings.append(total_ms)
+
+    imported = {name.split('.')[0] for name, _, _ in imports}
+    return {
+        'runs': runs,
+        'median_ms': round(statistics.median(timings), 1),
+        'min_ms': round(min(timings), 1),
+        'max_ms': round(max(timings), 1),
+        'budget_ms': budget_ms,
+        'slowest_imports': sorted(imports, key=lambda item: item[2], reverse=True)[1:top + 1],
+        'eager_lazy_modules': sorted(imported.intersection(LAZY_MODULES))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup import-time benchmark")
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to measure (default: 5)')
+    parser.add_argument('--budget-ms', type=float, default=float(os.getenv('STARTUP_BUDGET_MS', '500')),
+                        help='Maximum median import time of app/main.py (default: 500, env STARTUP_BUDGET_MS)')
+    parser.add_argument('--top', type=int, default=10, help='Slowest imports to list (default: 10)')
+    args = parser.parse_args()
+
+    report = run(args.runs, args.budget_ms, args.top)
+
+    print(f"import main: median {report['median_ms']} ms (min {report['min_ms']}, max {report['max_ms']}, "
+          f"{report['runs']} runs, budget {report['budget_ms']:.0f} ms)")
+    print("Slowest imports (cumulative):")
+    for name, self_us, cumulative_us in report['slowest_imports']:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    failures = []
+    if report['median_ms'] > args.budget_ms:
+        failures.append(f"median import time {report['median_ms']} ms exceeds budget {args.budget_ms:.0f} ms")
+    if report['eager_lazy_modules']:
+        failures.append(f"imported at startup but should be lazy: {', '.join(report['eager_lazy_modules'])}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Order summary rendering benchmark.
+
+Times ``OrderSummaryService.execute`` (template rendering of the markdown
+summary) per domain at several order sizes, and the item list alone against
+the per-item ``+=`` concatenation the service used before templates.
+
+Usage:
+    python -m benchmarks.summary
+    python -m benchmarks.summary --items 10 1000 10000 --iterations 50
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+sys.path.insert(0, str(APP_DIR))
+
+from services.base_service import ServiceResult
+from services.summary_templates import get_summary_template
+from services.updated_services import OrderSummaryService
+
+DOMAINS = ('ecommerce', 'travel', 'general')
+
+
+def build_inputs(domain: str, item_count: int) -> Dict[str, Any]:
+    """Summary arguments shaped like the ones ``main.execute_workflow`` passes"""
+    items = [{'name': f"Line item {i + 1}", 'price': 10.0 + i % 97, 'quantity': 1 + i % 5}
+             for i in range(item_count)]
+    total = sum(item['price'] * item['quantity'] for item in items)
+    config = {
+        'domain': domain, 'workflow_type': 'corporate_order', 'items': items, 'currency': 'EUR',
+        'target_currency': 'USD', 'cross_border_transaction': True, 'payment_country': 'DE',
+        'customer_id': 'CUST-001', 'customer_email': 'buyer@example.com',
+        'original_amount': total, 'converted_amount': total * 1.18
+    }
+    results = {
+        'currency_conversion': ServiceResult(True, {
+            'original_amount': total, 'converted_amount': total * 1.18, 'exchange_rate': 1.18, 'source': 'api'}),
+        'order': ServiceResult(True, {'order_id': 'ORD-0001'}),
+        'payment': ServiceResult(True, {'payment_id': 'PAY-0001', 'status': 'completed'}),
+        'shipping': ServiceResult(False, error_message='warehouse system unavailable')
+    }
+    return {'config': config, 'results': results}
+
+
+def concatenated_items(items: List[Dict[str, Any]], currency: str, default_name: str) -> str:
+    """Item list built the way the service did before templates, for reference"""
+    text = ""
+    for item in items:
+        text += f"- **{item.get('quantity', 1)}x {item.get('name', default_name)}** - *{currency} {item.get('price', 0):.2f}*\n"
+    return text
+
+
+def _median_us(func: Callable[[], Any], iterations: int) -> float:
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1_000_000
+
+
+def run(item_counts: List[int], iterations: int = 50) -> List[Dict[str, Any]]:
+    service = OrderSummaryService()
+    service.failure_rate = 0.0
+    rows = []
+    for domain in DOMAINS:
+        template = get_summary_template(domain)
+        for count in item_counts:
+            inputs = build_inputs(domain, count)
+            items = inputs['config']['items']
+            # fewer repetitions for large orders, at least 5
+            repeat = max(5, iterations * 10 // max(10, count) if count > 1000 else iterations)
+            execute_us = _median_us(lambda: service.execute(**inputs), repeat)
+            rows.append({
+                'domain': domain,
+                'items': count,
+                'execute_us': round(execute_us, 1),
+                'per_item_ns': round(execute_us * 1000 / count, 1) if count else 0.0,
+                'items_join_us': round(_median_us(lambda: template.render_items(items, 'EUR'), repeat), 1),
+                'items_concat_us': round(_median_us(
+                    lambda: concatenated_items(items, 'EUR', template.item_name), repeat), 1),
+                'summary_bytes': len(service.execute(**inputs).data['summary_text'].encode('utf-8'))
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Order summary rendering benchmark")
+    parser.add_argument('--items', type=int, nargs='+', default=[10, 1000, 10000],
+                        help='Order sizes to render (default: 10 1000 10000)')
+    parser.add_argument('--iterations', type=int, default=50, help='Renders per measurement (default: 50)')
+    args = parser.parse_args()
+
+    rows = run(args.items, args.iterations)
+    print(f"{'domain':<10} {'items':>6} {'execute':>12} {'per item':>10} {'items join':>12} "
+          f"{'items +=':>12} {'bytes':>9}")
+    for row in rows:
+        print(f"{row['domain']:<10} {row['items']:>6} {row['execute_us']:>10.1f}us {row['per_item_ns']:>8.1f}ns "
+              f"{row['items_join_us']:>10.1f}us {row['items_concat_us']:>10.1f}us {row['summary_bytes']:>9}")
+
+
+if __name__ == '__main__':
+    main()
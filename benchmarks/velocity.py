@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Payment velocity benchmark.
+
+Runs ``--payments`` velocity checks spread over ``--customers`` customers,
+with simulated time advancing ``--rate`` payments per second, for each
+customer count. It reports the cost of one check, the decline rate and the
+memory the bucket arrays use. The cost of a check should stay flat as
+customers and payment history grow.
+
+Usage:
+    python -m benchmarks.velocity
+    python -m benchmarks.velocity --customers 100 10000 100000 --payments 200000
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+sys.path.insert(0, str(APP_DIR))
+
+from services.velocity import DEFAULT_RULES, VelocityEngine, parse_rules
+
+
+def run(customers: int, payments: int, rate: float, rules: str, seed: int = 7):
+    engine = VelocityEngine(parse_rules(rules), max_customers=customers)
+    rng = random.Random(seed)
+    # a few busy customers, a long tail of occasional ones
+    work = [(f"CUST-{int(customers * rng.random() ** 3):06d}", round(rng.uniform(5, 500), 2)) for _ in range(payments)]
+    clock = 1_700_000_000.0
+    step = 1 / rate
+    declined = 0
+    started = time.perf_counter()
+    for customer_id, amount in work:
+        clock += step
+        if engine.check_and_record(customer_id, amount, now=clock) is not None:
+            declined += 1
+    elapsed = time.perf_counter() - started
+    stats = engine.stats()
+    return {
+        'customers': customers,
+        'tracked': stats['customers'],
+        'us_per_check': elapsed / payments * 1e6,
+        'declined': declined / payments,
+        'memory_kb': stats['customers'] * stats['bytes_per_customer'] / 1024
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Payment velocity check benchmark")
+    parser.add_argument('--customers', type=int, nargs='+', default=[100, 10000, 100000],
+                        help='Customer counts (default: 100 10000 100000)')
+    parser.add_argument('--payments', type=int, default=200000, help='Payments per run (default: 200000)')
+    parser.add_argument('--rate', type=float, default=50.0, help='Simulated payments per second (default: 50)')
+    parser.add_argument('--rules', default=DEFAULT_RULES, help=f'Velocity rules (default: {DEFAULT_RULES})')
+    args = parser.parse_args()
+
+    print(f"{args.payments} payments at {args.rate:g}/s, rules {args.rules}")
+    print(f"{'customers':>10} {'tracked':>8} {'us/check':>9} {'declined':>9} {'memory':>10}")
+    for customers in args.customers:
+        row = run(customers, args.payments, args.rate, args.rules)
+        print(f"{row['customers']:>10} {row['tracked']:>8} {row['us_per_check']:>9.2f} {row['declined']:>8.1%} "
+              f"{row['memory_kb']:>8.0f}KB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Wallet contention benchmark.
+
+Runs ``--orders`` concurrent orders against each of ``--accounts`` corporate
+wallets from ``--threads`` threads. Every order reserves its amount, then
+commits it (or releases it, for ``--release-ratio`` of orders). Wallets
+start with only enough funds for ``--funded`` of the orders, so reservations
+race for the last of the balance.
+
+For each lock-stripe count it reports throughput and reserve latency, and
+checks the ledger invariants: no wallet overdrawn, committed amounts equal the
+balance spent, nothing left reserved, and replaying the ledger gives the
+running balance.
+
+Usage:
+    python -m benchmarks.wallet_contention
+    python -m benchmarks.wallet_contention --accounts 8 --orders 1000 --threads 32 --stripes 1 64
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+sys.path.insert(0, str(APP_DIR))
+
+from services.wallet import InsufficientFunds, WalletLedger, to_minor
+
+
+def run(accounts: int, orders: int, threads: int, stripes: int, funded: float, release_ratio: float,
+        amount: float = 125.0, seed: int = 7) -> Dict[str, Any]:
+    account_ids = [f"CORP-{i:04d}" for i in range(accounts)]
+    ledger = WalletLedger(stripes=stripes, opening_balance=amount * orders * funded)
+    rng = random.Random(seed)
+    work = [(account_id, rng.random() < release_ratio) for account_id in account_ids for _ in range(orders)]
+    rng.shuffle(work)
+    chunks = [work[i::threads] for i in range(threads)]
+
+    barrier = threading.Barrier(threads + 1)
+    latencies: List[List[float]] = [[] for _ in range(threads)]
+    outcome = {'committed': 0, 'released': 0, 'declined': 0}
+    outcome_lock = threading.Lock()
+
+    def worker(index: int):
+        local = {'committed': 0, 'released': 0, 'declined': 0}
+        timings = latencies[index]
+        barrier.wait()
+        for account_id, release in chunks[index]:
+            started = time.perf_counter()
+            try:
+                hold = ledger.reserve(account_id, amount)
+            except InsufficientFunds:
+                timings.append(time.perf_counter() - started)
+                local['declined'] += 1
+                continue
+            timings.append(time.perf_counter() - started)
+            if release:
+                ledger.release(hold.hold_id)
+                local['released'] += 1
+            else:
+                ledger.commit(hold.hold_id)
+                local['committed'] += 1
+        with outcome_lock:
+            for key, value in local.items():
+                outcome[key] += value
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    violations = []
+    spent = 0
+    for account_id in account_ids:
+        snapshot = ledger.balance(account_id)
+        replayed = ledger.replay(account_id)
+        if snapshot['balance'] < 0:
+            violations.append(f"{account_id} overdrawn: {snapshot['balance']}")
+        if snapshot['reserved'] != 0 or replayed['reserved'] != 0:
+            violations.append(f"{account_id} still has {snapshot['reserved']} reserved")
+        if replayed['balance'] != to_minor(snapshot['balance']):
+            violations.append(f"{account_id} ledger replay {replayed['balance']} != balance {snapshot['balance']}")
+        spent += to_minor(amount * orders * funded) - to_minor(snapshot['balance'])
+    if spent != outcome['committed'] * to_minor(amount):
+        violations.append(f"spent {spent} != committed {outcome['committed']} x {to_minor(amount)}")
+
+    reserve_times = sorted(t for timings in latencies for t in timings)
+    total = len(work)
+    return {
+        'stripes': stripes,
+        'orders': total,
+        'orders_per_second': round(total / elapsed, 1),
+        'reserve_p50_us': round(statistics.median(reserve_times) * 1e6, 1),
+        'reserve_p99_us': round(reserve_times[min(len(reserve_times) - 1, int(len(reserve_times) * 0.99))] * 1e6, 1),
+        **outcome,
+        'violations': violations
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Corporate wallet contention benchmark")
+    parser.add_argument('--accounts', type=int, default=4, help='Corporate accounts (default: 4)')
+    parser.add_argument('--orders', type=int, default=1000, help='Concurrent orders per account (default: 1000)')
+    parser.add_argument('--threads', type=int, default=16, help='Client threads (default: 16)')
+    parser.add_argument('--stripes', type=int, nargs='+', default=[1, 64], help='Lock stripe counts (default: 1 64)')
+    parser.add_argument('--funded', type=float, default=0.8,
+                        help='Fraction of orders the opening balance covers (default: 0.8)')
+    parser.add_argument('--release-ratio', type=float, default=0.1,
+                        help='Fraction of orders released instead of committed (default: 0.1)')
+    args = parser.parse_args()
+
+    print(f"{args.accounts} accounts x {args.orders} orders, {args.threads} threads, "
+          f"balance covers {args.funded:.0%} of orders")
+    print(f"{'stripes':>7} {'orders/s':>10} {'reserve p50':>12} {'p99':>9} {'committed':>10} "
+          f"{'released':>9} {'declined':>9}  invariants")
+    failed = False
+    for stripes in args.stripes:
+        row = run(args.accounts, args.orders, args.threads, stripes, args.funded, args.release_ratio)
+        status = 'ok' if not row['violations'] else '; '.join(row['violations'][:3])
+        failed = failed or bool(row['violations'])
+        print(f"{row['stripes']:>7} {row['orders_per_second']:>10.1f} {row['reserve_p50_us']:>10.1f}us "
+              f"{row['reserve_p99_us']:>7.1f}us {row['committed']:>10} {row['released']:>9} {row['declined']:>9}  {status}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -8,6 +8,7 @@ Usage:
     python start.py --host 0.0.0.0    # Start with custom host
     python start.py --port 8080       # Start with custom port
     python start.py --debug           # Start in debug mode
+    python start.py --workers 4 --threads 8   # Production server (gunicorn, pre-forked)
 """
 
 import sys
@@ -39,6 +40,96 @@ def print_banner():
     print("=" * 80)
     print()
     
+def print_services():
+    """List the registered services without constructing them"""
+    from services.updated_services import ServiceRegistry
+    
+    print("📋 Available Services:")
+    for name, service_class in ServiceRegistry.SERVICE_CLASSES.items():
+        service_type = "🌐 REAL API" if "Currency" in service_class.__name__ else "🤖 DUMMY"
+        summary = (service_class.__doc__ or service_class.__name__).strip().splitlines()[0]
+        print(f"   {service_type} {name} - {summary}")
+
+def run_development_server(args):
+    """Werkzeug development server (single process)"""
+    from main import app
+    
+    app.run(
+        host=args.host,
+        port=args.port,
+        debug=args.debug
+    )
+
+def run_gunicorn(args):
+    """Pre-forked gunicorn server with threaded (gthread) workers.
+    
+    Each worker process imports the app itself, so the shared service registry,
+    LLM client and caches are built once per worker and shared by its threads.
+    Workers are recycled after --max-requests (with jitter) and drain in-flight
+    requests for up to --graceful-timeout seconds on SIGTERM.
+    
+    Client-side LLM rate limits (GROQ_REQUESTS_PER_MINUTE, ...) are kept per
+    process, so WEB_CONCURRENCY is set to the worker count and each worker
+    takes its share of the quota.
+    """
+    from gunicorn.app.base import BaseApplication
+    
+    os.environ['WEB_CONCURRENCY'] = str(args.workers)
+    
+    def worker_exit(server, worker):
+        from main import shutdown_background_workers
+        shutdown_background_workers()
+    
+    class OrchestratorApplication(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+        
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+        
+        def load(self):
+            from main import app
+            return app
+    
+    OrchestratorApplication({
+        'bind': f"{args.host}:{args.port}",
+        'workers': args.workers,
+        'worker_class': 'gthread',
+        'threads': args.threads,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': max(1, args.max_requests // 10) if args.max_requests else 0,
+        'graceful_timeout': args.graceful_timeout,
+        'timeout': 120,  # streamed LLM parses can take a while
+        'worker_exit': worker_exit,
+    }).run()
+
+def run_waitress(args):
+    """Multi-threaded waitress server, for platforms without fork (Windows)"""
+    from waitress import serve
+    from main import app, shutdown_background_workers
+    
+    if args.workers > 1:
+        print(f"⚠️  waitress is single-process; serving with {args.workers * args.threads} threads instead of {args.workers} workers")
+    try:
+        serve(app, host=args.host, port=args.port, threads=args.workers * args.threads)
+    finally:
+        shutdown_background_workers()
+
+def run_production_server(args):
+    """Pick gunicorn where fork is available, waitress otherwise"""
+    server = args.server
+    if server == 'auto':
+        server = 'waitress' if sys.platform.startswith('win') else 'gunicorn'
+    
+    print(f"🏭 Production mode: {server}, {args.workers} worker(s) x {args.threads} thread(s), "
+          f"max {args.max_requests} requests per worker")
+    if server == 'gunicorn':
+        run_gunicorn(args)
+    else:
+        run_waitress(args)
+
 def main():
     """Main entry point"""
     parser = argparse.ArgumentParser(
@@ -60,33 +151,44 @@ def main():
         action='store_true', 
         help='Run in debug mode'
     )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=0,
+        help='Worker processes for the production server (default: 0, use the development server)'
+    )
+    parser.add_argument(
+        '--threads',
+        type=int,
+        default=4,
+        help='Threads per worker process (default: 4)'
+    )
+    parser.add_argument(
+        '--max-requests',
+        type=int,
+        default=1000,
+        help='Recycle a worker after this many requests, 0 to disable (default: 1000)'
+    )
+    parser.add_argument(
+        '--graceful-timeout',
+        type=int,
+        default=30,
+        help='Seconds workers get to finish in-flight requests on shutdown (default: 30)'
+    )
+    parser.add_argument(
+        '--server',
+        choices=['auto', 'gunicorn', 'waitress'],
+        default='auto',
+        help='Production WSGI server (default: gunicorn, waitress on Windows)'
+    )
     
     args = parser.parse_args()
     
     print_banner()
     
     try:
-        # Import Flask app from the workflow-ui module
-        from flask import Flask, render_template_string, request, jsonify
-        from flask_cors import CORS
-        from services.updated_services import ServiceRegistry
-        from services.groq_service import GroqLLMService
-        
-        # Import the main app
-        sys.path.insert(0, str(Path(__file__).parent / "app"))
-        from main import app
-        
         print(f"🌐 Starting Flask Web UI on http://{args.host}:{args.port}")
-        print("📋 Available Services:")
-        
-        # Show available services
-        registry = ServiceRegistry()
-        services = registry.list_services()
-        for name, description in services.items():
-            service = registry.get_service(name)
-            service_type = "🌐 REAL API" if "Currency" in service.__class__.__name__ else "🤖 DUMMY"
-            failure_rate = getattr(service, 'failure_rate', 0) * 100
-            print(f"   {service_type} {name} (Failure Rate: {failure_rate:.1f}%)")
+        print_services()
         
         print("\n✨ System ready! Open your browser and start creating workflows!")
         print(f"🔗 Access the UI at: http://localhost:{args.port}")
@@ -98,11 +200,10 @@ def main():
         print("-" * 80)
         
         # Start the Flask application
-        app.run(
-            host=args.host,
-            port=args.port,
-            debug=args.debug
-        )
+        if args.workers > 0:
+            run_production_server(args)
+        else:
+            run_development_server(args)
         
     except KeyboardInterrupt:
         print("\n\n🛑 Server stopped by user")
@@ -110,6 +211,8 @@ def main():
         print(f"❌ Import error: {e}")
         print("Make sure all dependencies are installed:")
         print("pip install flask flask-cors temporalio groq")
+        if args.workers > 0:
+            print("Production mode also needs gunicorn (or waitress on Windows)")
     except Exception as e:
         print(f"❌ Error starting server: {e}")
         sys.exit(1)
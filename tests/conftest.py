@@ -0,0 +1,25 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# The app imports its services as top-level modules (see start.py)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+# Offline defaults: the replay backend, no simulated failures, data files in a scratch directory
+os.environ.setdefault("GROQ_API_KEY_PROD4", "test")
+os.environ.setdefault("LLM_BACKEND", "replay")
+os.environ.setdefault("SERVICE_FAILURE_RATE", "0")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+data = Path(tempfile.mkdtemp(prefix="workflow-tests-"))
+for variable in ("SAGA_PATH", "OUTBOX_PATH", "SETTLEMENT_PATH", "WORKFLOW_RUNS_PATH"):
+    os.environ.setdefault(variable, str(data / variable.lower().replace("_path", ".sqlite3")))
+
+
+@pytest.fixture(scope="session")
+def client():
+    import main
+    yield main.app.test_client()
+    main.shutdown_background_workers()
@@ -0,0 +1,59 @@
+import time
+
+from services.alternative_booking import AlternativeBookingService, ProviderError, StubBookingProvider
+
+HOTEL = {'name': 'Hotel night', 'category': 'hotel', 'price': 100.0, 'quantity': 1}
+CAR = {'name': 'Car rental', 'category': 'car', 'price': 50.0, 'quantity': 1}
+
+
+class NoCars(StubBookingProvider):
+    def book(self, offer, quantity, reference):
+        if offer.item == CAR['name']:
+            raise ProviderError(f"{self.name} has no cars left")
+        return super().book(offer, quantity, reference)
+
+
+def test_slow_providers_are_cut_off_and_do_not_hold_up_the_booking():
+    fast, slow = StubBookingProvider('fast', 1, 1.0, failure_rate=0), StubBookingProvider('slow', 1000, 0.5, failure_rate=0)
+    # one quoting thread, which the cut-off quote keeps busy
+    service = AlternativeBookingService([fast, slow], deadline_ms=100, workers=1)
+    try:
+        started = time.perf_counter()
+        result = service.execute('ORD-1', [HOTEL])
+        elapsed = time.perf_counter() - started
+
+        assert result.success
+        assert result.data['search']['cut_off'] == ['slow']
+        assert [booking['provider'] for booking in result.data['bookings']] == ['fast']
+        assert elapsed < 0.5
+    finally:
+        service.shutdown(wait=False)
+
+
+def test_fresh_quotes_are_not_requested_again():
+    provider = StubBookingProvider('only', 1, 1.0, failure_rate=0)
+    service = AlternativeBookingService([provider], deadline_ms=1000, quote_ttl_seconds=60)
+    try:
+        first, first_search = service.search([HOTEL], 'USD')
+        again, search = service.search([HOTEL], 'USD')
+        in_euros, euro_search = service.search([HOTEL], 'EUR')
+
+        assert again == first
+        assert (first_search['providers_asked'], search['providers_asked'], search['quotes_cached']) == (1, 0, 1)
+        assert euro_search['providers_asked'] == 1 and in_euros[0][0].currency == 'EUR'
+    finally:
+        service.shutdown()
+
+
+def test_items_already_booked_are_cancelled_when_another_cannot_be():
+    provider = NoCars('nocars', 1, 1.0, failure_rate=0)
+    service = AlternativeBookingService([provider], deadline_ms=1000)
+    try:
+        result = service.execute('ORD-1', [HOTEL, CAR])
+
+        assert not result.success
+        assert 'Car rental' in result.error_message
+        assert provider.bookings == set() and result.data['not_cancelled'] == []
+        assert service.stats()['bookings_cancelled'] == 1
+    finally:
+        service.shutdown()
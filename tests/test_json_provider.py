@@ -0,0 +1,36 @@
+import gzip
+import json
+
+import main
+from services.base_service import ServiceResult
+from services.json_provider import compact_results
+
+
+def test_compact_responses_leave_out_echoed_items(client):
+    full = client.post('/api/execute', json={'input': "Order 2 laptops for compact@acme.com"}).get_json()
+    compact = client.post('/api/execute?compact=1', json={'input': "Order 2 laptops for compact@acme.com"}).get_json()
+
+    assert full['results']['order']['data']['items']
+    assert 'items' not in compact['results']['order']['data']
+    assert compact['results']['order']['data']['order_id'] and compact['results']['payment']['success']
+
+
+def test_compacting_copies_results_instead_of_changing_them():
+    order = ServiceResult(True, {'order_id': 'ORD-1', 'items': [{'name': 'Laptop'}]})
+    payment = ServiceResult(True, {'payment_id': 'PAY-1'})
+
+    compact = compact_results({'order': order, 'payment': payment})
+
+    assert compact['order'].data == {'order_id': 'ORD-1'} and order.data['items']
+    assert compact['payment'] is payment
+
+
+def test_large_bodies_are_gzipped_for_clients_that_accept_it(client, monkeypatch):
+    monkeypatch.setattr(main.app.json, 'gzip_min_bytes', 64)
+
+    compressed = client.get('/api/stats', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip' and 'Accept-Encoding' in compressed.headers['Vary']
+    assert json.loads(gzip.decompress(compressed.data)).keys() == client.get('/api/stats').get_json().keys()
+
+    plain = client.get('/api/stats')
+    assert 'Content-Encoding' not in plain.headers and plain.get_json()
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from services.json_stream import IncrementalJSONParser
+
+DOCUMENT = ('Here is the config:\n```json\n{"domain": "travel", "note": "say \\"hi\\" \\\\ caf\\u00e9 – ok", '
+            '"items": [{"name": "Hotel {suite}", "price": 120.5, "tags": ["a", "b,c"]}], '
+            '"nested": {"a": {"b": [1, 2, {"c": null}]}}, "count": 3, "ok": true}\n```')
+EXPECTED = json.loads(DOCUMENT[DOCUMENT.index('{'):DOCUMENT.rindex('}') + 1])
+
+
+def parse(chunks):
+    streamed = []
+    parser = IncrementalJSONParser(on_field=lambda name, value: streamed.append((name, value)))
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser, streamed
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64])
+def test_values_split_anywhere_are_decoded_once(size):
+    parser, streamed = parse(DOCUMENT[i:i + size] for i in range(0, len(DOCUMENT), size))
+
+    assert parser.complete
+    assert parser.close() == EXPECTED
+    assert streamed == list(EXPECTED.items())
+    assert parser.text == DOCUMENT
+
+
+def test_every_split_point_of_escapes_and_unicode():
+    for split in range(len(DOCUMENT)):
+        parser, _ = parse([DOCUMENT[:split], DOCUMENT[split:]])
+        assert parser.close() == EXPECTED, split
+
+
+def test_truncated_input_keeps_the_completed_fields():
+    cut = DOCUMENT.index('"nested"') + 20
+    parser, streamed = parse([DOCUMENT[:cut]])
+
+    assert not parser.complete
+    assert parser.close() == {name: EXPECTED[name] for name in ('domain', 'note', 'items')}
+    assert [name for name, _ in streamed] == ['domain', 'note', 'items']
+
+
+def test_input_without_a_complete_field_is_rejected():
+    with pytest.raises(ValueError, match="No JSON found"):
+        parse(["no json here"])[0].close()
+    with pytest.raises(ValueError, match="Could not parse JSON"):
+        parse(['{"domain": "trav'])[0].close()
+    with pytest.raises(ValueError, match="Invalid value for field 'count'"):
+        parse(['{"count": 3x, "ok": true}'])
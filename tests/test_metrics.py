@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+
+from services.base_service import ServiceResult
+from services.metrics import REGISTRY, Counter, Gauge, Histogram, Registry, _Metric
+from services.updated_services import EmailNotificationService
+
+
+def test_counters_and_gauges_render_in_the_text_format():
+    registry = Registry()
+    calls = Counter('calls_total', 'Calls by outcome', ['service', 'outcome'], registry=registry)
+    calls.labels('Email "bulk"\n', 'ok').inc()
+    calls.labels('Email "bulk"\n', 'ok').inc(2.5)
+    Gauge('queue_depth', 'Waiting calls', registry=registry, callback=lambda: 7)
+    Gauge('broken', 'Callback that fails', registry=registry, callback=lambda: 1 / 0)
+
+    assert registry.render() == (
+        '# HELP calls_total Calls by outcome\n'
+        '# TYPE calls_total counter\n'
+        'calls_total{service="Email \\"bulk\\"\\n",outcome="ok"} 3.5\n'
+        '# HELP queue_depth Waiting calls\n'
+        '# TYPE queue_depth gauge\n'
+        'queue_depth 7\n'
+        '# HELP broken Callback that fails\n'
+        '# TYPE broken gauge\n')
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = Histogram('latency_seconds', 'Latency', registry=registry, buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value)
+
+    assert registry.render().splitlines()[2:] == [
+        'latency_seconds_bucket{le="0.1"} 2',
+        'latency_seconds_bucket{le="1"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        'latency_seconds_sum 3.65',
+        'latency_seconds_count 4']
+
+
+def test_concurrent_increments_are_all_counted():
+    counter = Counter('hits_total', 'Hits', registry=Registry())
+    child = counter.labels()
+    threads = [threading.Thread(target=lambda: [child.inc() for _ in range(10000)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert child.value == 40000
+
+
+def test_metric_types_must_define_their_children_and_samples():
+    with pytest.raises(TypeError):
+        _Metric('incomplete', 'No children', registry=Registry())
+
+
+def test_service_calls_are_counted_by_outcome_when_scraped():
+    service = EmailNotificationService()
+    before = service.metrics.success.value
+    result = service.execute(recipient='ops@acme.com', message="Your order is confirmed")
+    REGISTRY.render()
+
+    assert isinstance(result, ServiceResult) and result.success
+    assert service.metrics.success.value == before + 1
@@ -0,0 +1,58 @@
+from services.groq_service import GroqLLMService
+from services.llm_backends import LLMBackend, LLMBackendError
+from services.llm_stub import synthesize_completion
+from services.model_router import ModelRouter
+
+
+class TieredBackend(LLMBackend):
+    """Answers the small model with ``small`` (text, or an exception to raise) and the large model properly"""
+
+    name = "replay"
+
+    def __init__(self, small):
+        self.small = small
+        self.models = []
+
+    def complete(self, messages, model, temperature=0.3, max_tokens=1200, **options):
+        self.models.append(model)
+        if model == "small":
+            if isinstance(self.small, Exception):
+                raise self.small
+            return self.small
+        return synthesize_completion(messages)
+
+
+def parse(backend):
+    service = GroqLLMService(backend=backend)
+    service.router = ModelRouter("small", "large", threshold=100.0)
+    return service, service.execute("Book a hotel in Paris for 2 nights")
+
+
+def test_invalid_small_model_json_is_escalated():
+    backend = TieredBackend('{"workflow_type": hotel_booking, "domain": "travel"}')
+    service, result = parse(backend)
+
+    assert result.success, result.error_message
+    assert backend.models == ["small", "large"]
+    assert result.data["model"] == "large"
+    assert service.router.stats()["escalations"] == 1
+
+
+def test_small_model_backend_error_is_escalated():
+    backend = TieredBackend(LLMBackendError("model not available"))
+    _, result = parse(backend)
+
+    assert result.success, result.error_message
+    assert backend.models == ["small", "large"]
+
+
+def test_fields_reach_the_callback_once_and_only_from_accepted_output():
+    backend = TieredBackend('{"workflow_type": "hotel_booking", "currency": "EUR", "items": [')
+    service = GroqLLMService(backend=backend)
+    service.router = ModelRouter("small", "large", threshold=100.0)
+    fields = []
+
+    result = service.execute("Book a hotel in Paris for 2 nights", on_field=lambda name, value: fields.append(name))
+
+    assert result.data["model"] == "large"
+    assert len(fields) == len(set(fields)) and "currency" in fields
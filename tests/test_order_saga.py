@@ -0,0 +1,115 @@
+from services.alternative_booking import AlternativeBookingService, StubBookingProvider
+from services.base_service import ServiceResult
+from services.order_saga import CORPORATE_ORDER_SAGA, order_sagas
+from services.saga import COMPENSATED, DONE, FAILED, RUNNING, Saga, SagaEngine, SagaLog, SagaStep
+from services.updated_services import ServiceRegistry
+from services.wallet import WalletLedger, WalletService
+
+
+def engine_for(path, registry=None, **options):
+    registry = registry or ServiceRegistry()
+    engine = SagaEngine(SagaLog(path), **options)
+    for saga in order_sagas(registry.get_service):
+        engine.register(saga)
+    return engine
+
+
+def crashed_saga(log, name, context, steps):
+    """Checkpoints of a saga whose process died after ``steps`` completed"""
+    log.start('crashed', name, context)
+    for position, (step, result) in enumerate(steps):
+        log.record_step('crashed', step, position, DONE, result)
+    log.set_status('crashed', RUNNING)
+
+
+def test_resume_after_crash_treats_lost_order_and_hold_as_compensated(tmp_path):
+    path = tmp_path / "sagas.sqlite3"
+    context = {'customer_id': 'CORP-1', 'items': [], 'channel': 'Corporate', 'amount': 100.0, 'currency': 'USD'}
+    crashed_saga(SagaLog(path), CORPORATE_ORDER_SAGA, context, [
+        ('order', ServiceResult(True, {'order_id': 'ORD-lost'})),
+        ('payment', ServiceResult(True, {'hold_id': 'hold-lost'})),
+    ])
+
+    [outcome] = engine_for(path, compensation_attempts=1).resume_incomplete(older_than=0)
+
+    assert outcome.status == COMPENSATED
+    assert {name: result.data['status'] for name, result in outcome.compensations.items()} == \
+        {'order': 'not_found', 'payment': 'not_found'}
+
+
+def test_failing_saga_is_given_up_after_its_resume_attempts(tmp_path):
+    path = tmp_path / "sagas.sqlite3"
+    log = SagaLog(path)
+    crashed_saga(log, 'stuck', {}, [('step', ServiceResult(True, {}))])
+    engine = SagaEngine(log, compensation_attempts=1, resume_attempts=2)
+    engine.register(Saga('stuck', [SagaStep('step', lambda context, results: ServiceResult(True),
+                                            lambda context, result: ServiceResult(False, error_message="down"))]))
+
+    resumed = [len(engine.resume_incomplete(older_than=0)) for _ in range(3)]
+
+    assert resumed == [1, 1, 0]
+    assert log.load('crashed')['status'] == FAILED
+    assert engine.stats()['given_up'] == 1
+
+
+def test_only_the_most_recently_finished_sagas_are_kept(tmp_path):
+    log = SagaLog(tmp_path / "sagas.sqlite3", retention=2)
+    engine = SagaEngine(log)
+    engine.register(Saga('noop', [SagaStep('step', lambda context, results: ServiceResult(True))]))
+    crashed_saga(log, 'noop', {}, [('step', ServiceResult(True))])
+
+    finished = [engine.run('noop', {}).saga_id for _ in range(3)]
+
+    # the unfinished saga is kept whatever its age
+    assert log.load(finished[0]) is None
+    assert [log.load(saga_id)['status'] for saga_id in finished[1:]] == ['completed'] * 2
+    assert log.counts() == {'completed': 2, 'running': 1}
+    assert log._connection().execute("SELECT COUNT(*) FROM saga_steps").fetchone()[0] == 3
+
+
+def test_a_saga_recording_steps_is_not_stale(tmp_path):
+    log = SagaLog(tmp_path / "sagas.sqlite3")
+    log.start('slow', 'noop', {})
+    log._connection().execute("UPDATE sagas SET updated_at = 0")
+
+    log.record_step('slow', 'step', 0, DONE, ServiceResult(True))
+
+    assert log.claim_stale(older_than=60, max_attempts=5) == ([], 0)
+
+
+class Unavailable:
+    def execute(self, **kwargs):
+        return ServiceResult(False, error_message="Booking failed - no availability")
+
+
+def corporate_services(**overrides):
+    registry = ServiceRegistry()
+    services = {'shipping_confirmation': Unavailable(),
+                'alternative_booking': AlternativeBookingService(
+                    [StubBookingProvider('cheaper', 1, 0.9, failure_rate=0)], deadline_ms=2000),
+                'wallet': WalletService(WalletLedger(opening_balance=1000)), **overrides}
+    return lambda name: services[name] if name in services else registry.get_service(name)
+
+
+def test_rebooking_a_non_usd_order_quotes_in_the_payment_currency(tmp_path):
+    wallet = WalletService(WalletLedger(opening_balance=1000))
+    get_service = corporate_services(wallet=wallet)
+    engine = SagaEngine(SagaLog(tmp_path / "sagas.sqlite3"))
+    for saga in order_sagas(get_service):
+        engine.register(saga)
+
+    # 20000 JPY of hotel nights, paid in EUR at 0.0075
+    outcome = engine.run(CORPORATE_ORDER_SAGA, {
+        'customer_id': 'CORP-1', 'channel': 'Corporate', 'amount': 150.0, 'currency': 'EUR',
+        'items': [{'name': 'Hotel night', 'category': 'hotel', 'price': 10000.0, 'quantity': 2}]})
+
+    assert outcome.status == 'completed', outcome.results['shipping'].error_message
+    booked = outcome.results['shipping'].data
+    assert booked['currency'] == 'EUR'
+    assert 0.85 * 150 <= booked['total'] <= 0.95 * 150
+
+    # only the cheaper booking is deducted; the rest of the hold goes back
+    assert outcome.results['wallet_commit'].data['committed'] == booked['total']
+    assert wallet.ledger.balance('CORP-1/EUR') == {
+        'account_id': 'CORP-1/EUR', 'currency': 'EUR', 'balance': round(1000 - booked['total'], 2),
+        'reserved': 0.0, 'available': round(1000 - booked['total'], 2), 'ledger_entries': 4}
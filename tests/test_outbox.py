@@ -0,0 +1,137 @@
+import time
+
+from services.base_service import ServiceResult
+from services.outbox import CHANNEL_SERVICES, NotificationDispatcher, NotificationOutbox
+from services.updated_services import EmailNotificationService
+
+
+class Provider:
+    """Notification service recording what it sends to ``sent``"""
+
+    def __init__(self, channel, sent, max_batch_size=100, batches=True):
+        self.channel = channel
+        self.sent = sent
+        self.max_batch_size = max_batch_size
+        self.recipient_field = 'to'
+        if not batches:
+            self.send_batch = None
+            del self.send_batch
+
+    def execute(self, **payload):
+        self.sent.append((self.channel, [payload['to']]))
+        return ServiceResult(True, {'id': payload['notification_id']})
+
+    def send_batch(self, messages):
+        self.sent.append((self.channel, [message['to'] for message in messages]))
+        return [ServiceResult(True, {'id': index}) for index, _ in enumerate(messages)]
+
+    @staticmethod
+    def digest(messages):
+        return {'to': messages[0]['to'], 'body': ' | '.join(message['body'] for message in messages)}
+
+
+def dispatcher_for(outbox, providers, **options):
+    services = {CHANNEL_SERVICES[provider.channel]: provider for provider in providers}
+    return NotificationDispatcher(outbox, services.get, workers=0, linger=0, **dict({'rate_limits': ''}, **options))
+
+
+def test_enqueueing_a_dedupe_key_twice_returns_the_first_notification(tmp_path):
+    outbox = NotificationOutbox(tmp_path / "outbox.sqlite3")
+    first_id, created = outbox.enqueue('email', {'to': 'ops@acme.com'}, dedupe_key='ORD-1:email:confirmation')
+
+    assert outbox.enqueue('email', {'to': 'other@acme.com'}, dedupe_key='ORD-1:email:confirmation') == \
+        (first_id, False)
+    assert created and outbox.counts() == {'pending': 1}
+
+
+def test_a_claim_is_leased_until_it_expires(tmp_path):
+    outbox = NotificationOutbox(tmp_path / "outbox.sqlite3")
+    outbox.enqueue('email', {'to': 'ops@acme.com'})
+    outbox.enqueue('sms', {'to': '+15550100'})
+
+    [claimed] = outbox.claim(10, lease_seconds=30, channel='email')
+    assert outbox.claim(10, lease_seconds=30, channel='email') == []
+
+    # a worker that died with the claim leaves it in flight until the lease runs out
+    outbox._connection().execute("UPDATE notifications SET lease_until = ? WHERE id = ?",
+                                 (time.time() - 1, claimed.id))
+    again, sms = outbox.claim(10, lease_seconds=30)
+    assert (again.id, again.attempts, sms.channel) == (claimed.id, 2, 'sms')
+
+
+def test_finished_notifications_are_purged_after_the_retention(tmp_path):
+    outbox = NotificationOutbox(tmp_path / "outbox.sqlite3")
+    sent, _ = outbox.enqueue('email', {'to': 'ops@acme.com'})
+    pending, _ = outbox.enqueue('email', {'to': 'ops@acme.com'})
+    outbox.claim(1, lease_seconds=30)
+    outbox.mark_sent(sent, {'message_id': 'm-1'})
+    dispatcher = NotificationDispatcher(outbox, lambda name: None, workers=0, retention=0)
+
+    time.sleep(0.01)
+    dispatcher._purge_if_due()
+
+    assert outbox.get(sent) is None and outbox.get(pending)['status'] == 'pending'
+    assert dispatcher.stats()['purged'] == 1
+
+
+def test_batches_are_split_at_the_provider_limit(tmp_path):
+    outbox, sent = NotificationOutbox(tmp_path / "outbox.sqlite3"), []
+    for index in range(5):
+        outbox.enqueue('email', {'to': f'user{index}@acme.com', 'body': 'hi'})
+    dispatcher = dispatcher_for(outbox, [Provider('email', sent, max_batch_size=2)])
+
+    assert dispatcher.dispatch_once() == 5
+    assert [len(recipients) for _, recipients in sent] == [2, 2, 1]
+    assert dispatcher.stats()['channels']['email']['provider_calls'] == 3
+    assert outbox.counts() == {'sent': 5}
+
+
+def test_messages_to_one_recipient_are_sent_as_one_digest(tmp_path):
+    outbox, sent = NotificationOutbox(tmp_path / "outbox.sqlite3"), []
+    ids = [outbox.enqueue('email', {'to': to, 'body': body})[0]
+           for to, body in (('a@acme.com', 'one'), ('b@acme.com', 'two'), ('a@acme.com', 'three'))]
+    dispatcher = dispatcher_for(outbox, [Provider('email', sent)], coalesce_window=0.01)
+
+    assert dispatcher.dispatch_once() == 0  # held for the coalescing window
+    time.sleep(0.02)
+    assert dispatcher.dispatch_once() == 3
+
+    assert sorted(sent[0][1]) == ['a@acme.com', 'b@acme.com']
+    assert outbox.get(ids[0])['result']['digest_of'] == 2 and outbox.get(ids[2])['status'] == 'sent'
+    assert dispatcher.stats()['channels']['email']['coalesced'] == 1
+
+
+def test_channels_are_delivered_most_urgent_first(tmp_path):
+    outbox, sent = NotificationOutbox(tmp_path / "outbox.sqlite3"), []
+    outbox.enqueue('sms', {'to': '+15550100', 'body': 'bulk'})
+    outbox.enqueue('email', {'to': 'ops@acme.com', 'body': 'receipt'})
+    outbox.enqueue('call', {'to': '+15550199', 'body': 'escalation'})
+    dispatcher = dispatcher_for(outbox, [Provider('sms', sent), Provider('email', sent),
+                                         Provider('call', sent, batches=False)])
+
+    dispatcher.dispatch_once()
+
+    assert [channel for channel, _ in sent] == ['call', 'email', 'sms']
+
+
+def test_a_channel_is_deferred_once_its_tokens_run_out(tmp_path):
+    outbox, sent = NotificationOutbox(tmp_path / "outbox.sqlite3"), []
+    for index in range(5):
+        outbox.enqueue('sms', {'to': f'+1555010{index}', 'body': 'hi'})
+    dispatcher = dispatcher_for(outbox, [Provider('sms', sent)], rate_limits='sms=0.001:2')
+
+    assert dispatcher.dispatch_once() == 2
+    assert dispatcher.dispatch_once() == 0
+    assert dispatcher.stats()['channels']['sms']['deferred'] == 1
+    assert outbox.counts() == {'sent': 2, 'pending': 3}
+
+
+def test_a_failed_batch_counts_every_message():
+    service = EmailNotificationService()
+    service.failure_rate = 1.0
+    before = service.metrics.failure.value + len(service.metrics.failure_pending)
+
+    results = service.send_batch([{'recipient': f'user{index}@acme.com'} for index in range(3)])
+
+    assert [result.success for result in results] == [False] * 3
+    assert service.metrics.failure.value + len(service.metrics.failure_pending) == before + 3
@@ -0,0 +1,40 @@
+from services.rate_matrix import REFERENCE_USD_RATES, RateMatrix
+from services.settlement import SettlementPipeline
+from services.updated_services import PaymentProcessingService
+from services.velocity import VelocityEngine, parse_rules
+
+
+def execute(client, user_input):
+    response = client.post('/api/execute', json={'input': user_input}).get_json()
+    assert response['success'], response.get('error_message')
+    return response['saga']['status'], response['results']['payment']
+
+
+def test_parsed_email_is_limited_across_requests(client):
+    outcomes = [execute(client, f"Book a hotel room for {nights} nights, receipt to Ops@Acme.com")
+                for nights in (1, 2, 3, 4)]
+
+    # every request gets its own customer id, but the 4th payment within a minute is declined
+    assert [status for status, _ in outcomes] == ['completed'] * 3 + ['compensated']
+    assert 'card declined' in outcomes[3][1]['error_message']
+    assert outcomes[2][1]['data']['velocity']['count:60']['used'] == 3
+
+    status, _ = execute(client, "Book a hotel room for 4 nights, receipt to finance@acme.com")
+    assert status == 'completed'
+
+
+def test_inputs_without_an_email_are_not_limited(client):
+    statuses = [execute(client, f"Book a hotel room for {nights} nights")[0] for nights in (1, 2, 3, 4)]
+    assert statuses == ['completed'] * 4
+
+
+def test_amount_limits_add_up_payments_in_usd():
+    payments = PaymentProcessingService(
+        VelocityEngine(parse_rules("amount:60:1000")),
+        SettlementPipeline(lambda: RateMatrix(REFERENCE_USD_RATES), path=':memory:', background=False))
+
+    # 100000 JPY is about 909 USD: allowed, but 100 EUR more is not
+    first = payments.execute(100000.0, 'C-1', currency='JPY', customer_email='ops@acme.com')
+    assert first.success and first.data['velocity']['amount:60']['used'] == 909.09
+    second = payments.execute(100.0, 'C-2', currency='EUR', customer_email='ops@acme.com')
+    assert not second.success and 'would exceed the limit of 1000.00' in second.error_message
@@ -0,0 +1,63 @@
+import threading
+import time
+
+from services.prefetch import SpeculativePrefetcher
+from services.updated_services import ExchangeRateCache
+
+
+class FakeConversion:
+    """Live rates that arrive when ``ready`` is set, or fail when the rate is an exception"""
+
+    def __init__(self, rates):
+        self.rates = rates
+        self.rate_cache = ExchangeRateCache(ttl_seconds=60)
+        self.ready = threading.Event()
+        self.ready.set()
+
+    def fetch_live_rate(self, from_currency, to_currency, cache=True):
+        self.ready.wait(5)
+        rate = self.rates[(from_currency, to_currency)]
+        if isinstance(rate, Exception):
+            raise rate
+        return rate
+
+
+def prefetch(service, user_input, wait=0.3):
+    prefetcher = SpeculativePrefetcher(lambda: service, wait=wait)
+    return prefetcher, prefetcher.start(user_input)
+
+
+def test_the_confirmed_rate_is_cached_and_the_others_discarded():
+    service = FakeConversion({('EUR', 'USD'): 1.17, ('EUR', 'GBP'): 0.86})
+    prefetcher, session = prefetch(service, "Hotel in Paris for a British and an American guest")
+
+    assert session.resolve('EUR', 'USD')
+    assert service.rate_cache.get('EUR', 'USD') == 1.17
+    assert service.rate_cache.get('EUR', 'GBP') is None
+    assert prefetcher.stats()['hits'] == 1 and prefetcher.stats()['discarded'] == 1
+    prefetcher.shutdown()
+
+
+def test_a_slow_fetch_is_waited_for_only_until_the_budget_runs_out():
+    service = FakeConversion({('EUR', 'USD'): 1.17})
+    service.ready.clear()
+    prefetcher, session = prefetch(service, "Hotel in Paris for an American guest", wait=0.05)
+
+    started = time.perf_counter()
+    assert not session.resolve('EUR', 'USD')
+    assert time.perf_counter() - started < 0.5
+    service.ready.set()
+    prefetcher.shutdown()
+    assert service.rate_cache.get('EUR', 'USD') is None
+
+
+def test_a_failed_fetch_is_a_miss_without_waiting():
+    service = FakeConversion({('EUR', 'USD'): ConnectionError("rate API down")})
+    prefetcher, session = prefetch(service, "Hotel in Paris for an American guest", wait=5.0)
+    time.sleep(0.05)
+
+    started = time.perf_counter()
+    assert not session.resolve('EUR', 'USD')
+    assert time.perf_counter() - started < 0.5
+    assert prefetcher.stats()['hits'] == 0
+    prefetcher.shutdown()
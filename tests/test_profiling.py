@@ -0,0 +1,37 @@
+import time
+
+from services.profiling import SlowRequestRecorder
+
+
+def test_debug_endpoints_are_hidden_until_an_admin_token_is_set(client, monkeypatch):
+    monkeypatch.delenv('ADMIN_TOKEN', raising=False)
+    assert client.get('/debug/slow-requests').status_code == 404
+    assert client.get('/debug/slow-requests', headers={'X-Admin-Token': ''}).status_code == 404
+
+    monkeypatch.setenv('ADMIN_TOKEN', 'secret')
+    assert client.get('/debug/slow-requests').status_code == 403
+    assert client.get('/debug/slow-requests', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+    assert client.get('/debug/slow-requests', headers={'X-Admin-Token': 'secret'}).status_code == 200
+    assert client.get('/debug/slow-requests', headers={'Authorization': 'Bearer secret'}).status_code == 200
+
+
+def test_the_sampling_profiler_returns_collapsed_stacks(client, monkeypatch):
+    monkeypatch.setenv('ADMIN_TOKEN', 'secret')
+    response = client.get('/debug/profile?seconds=0.1&interval_ms=5', headers={'X-Admin-Token': 'secret'})
+
+    assert response.status_code == 200 and response.content_type.startswith('text/plain')
+    stacks = response.get_data(as_text=True).splitlines()
+    assert stacks and all(line.rpartition(' ')[2].isdigit() for line in stacks)
+
+
+def test_only_slow_calls_are_kept():
+    recorder = SlowRequestRecorder(threshold_ms=20, sample_rate=1.0, capacity=5)
+    fast = recorder.record('fast')(lambda: 'done')
+    slow = recorder.record('slow')(lambda: time.sleep(0.03) or 'done')
+
+    assert fast() == slow() == 'done'
+
+    kept = recorder.list()
+    assert [entry['endpoint'] for entry in kept] == ['slow'] and kept[0]['duration_ms'] >= 20
+    assert 'sleep' in SlowRequestRecorder.report(recorder.get(kept[0]['id']))
+    assert (recorder.stats()['profiled'], recorder.stats()['captured']) == (2, 1)
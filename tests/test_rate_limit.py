@@ -0,0 +1,82 @@
+import pytest
+
+from services.rate_limit import AdaptiveConcurrencyLimiter, AdmissionController, RateLimitTimeout, TokenBucket
+
+
+class FakeClock:
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_bucket_refills_at_its_rate_up_to_its_capacity():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, capacity=4.0, clock=clock, sleep=clock.sleep)
+    assert all(bucket.try_acquire() for _ in range(4)) and not bucket.try_acquire()
+
+    clock.now += 0.75
+    assert bucket.available == 1.5
+    clock.now += 60
+    assert bucket.available == 4.0
+
+    # waiting for a token sleeps until it has refilled
+    assert bucket.try_acquire(4.0)
+    started = clock.now
+    assert bucket.acquire(deadline=clock.now + 1.0) is True
+    assert clock.now - started == 0.5 and bucket.available == 0.0
+
+
+def test_bucket_gives_up_when_the_tokens_would_come_after_the_deadline():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1.0, capacity=1.0, clock=clock, sleep=clock.sleep)
+    bucket.try_acquire()
+
+    assert bucket.acquire(deadline=clock.now + 0.5) is False
+    assert clock.now == 100.0  # did not sleep
+
+
+def test_a_throttled_call_halves_the_concurrency_limit():
+    clock = FakeClock()
+    controller = AdmissionController(None, AdaptiveConcurrencyLimiter(initial_limit=8, clock=clock), clock=clock)
+
+    with pytest.raises(ConnectionError):
+        with controller.admit(deadline=clock.now + 1) as ticket:
+            ticket.overloaded = True  # the upstream answered 429
+            raise ConnectionError("429 Too Many Requests")
+
+    assert controller.limiter.limit == 4
+    assert controller.stats()['throttled'] == 1
+
+
+def test_requests_time_out_in_the_queue_at_their_deadline():
+    clock = FakeClock()
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1, clock=clock)
+    controller = AdmissionController(TokenBucket(rate=1.0, capacity=1.0, clock=clock, sleep=clock.sleep),
+                                     limiter, clock=clock)
+    assert limiter.acquire()
+
+    with pytest.raises(RateLimitTimeout, match="concurrency slot"):
+        with controller.admit(deadline=clock.now):
+            pass
+    limiter.release()
+
+    controller.bucket.try_acquire()
+    with pytest.raises(RateLimitTimeout, match="rate limit quota"):
+        with controller.admit(deadline=clock.now + 0.5):
+            pass
+    assert controller.stats()['timed_out'] == 2 and limiter.snapshot()['in_flight'] == 0
+
+
+def test_the_quota_is_shared_between_worker_processes(monkeypatch):
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    monkeypatch.setenv("TEST_REQUESTS_PER_MINUTE", "120")
+    monkeypatch.setenv("TEST_BURST", "8")
+
+    bucket = AdmissionController.from_env("TEST").bucket
+
+    assert (bucket.rate, bucket.capacity) == (0.5, 2.0)
@@ -0,0 +1,29 @@
+import dataclasses
+import json
+
+import pytest
+
+import main
+from services.base_service import FrozenServiceResult, ServiceResult
+
+
+def test_results_round_trip_through_json(client):
+    result = ServiceResult(False, {'order_id': 'ORD-1', 'items': [{'name': 'Laptop', 'price': 999.0}]},
+                           'Payment declined', retry_count=2)
+
+    fields = json.loads(main.app.json.dumps({'payment': result}))['payment']
+
+    assert fields == {'success': False, 'data': result.data, 'error_message': 'Payment declined', 'retry_count': 2}
+    assert ServiceResult(**fields) == result
+    assert FrozenServiceResult(**fields).__json__() == result.freeze().__json__()
+
+
+def test_results_are_slotted_and_frozen_copies_share_data():
+    result = ServiceResult(True, {'order_id': 'ORD-1'})
+    assert not hasattr(result, '__dict__')
+
+    frozen = result.freeze()
+    assert frozen.data is result.data and frozen.freeze() is frozen
+    assert frozen.timestamp == result.timestamp
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        frozen.success = False
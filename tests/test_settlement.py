@@ -0,0 +1,67 @@
+import pytest
+
+from services.rate_matrix import REFERENCE_USD_RATES, RateMatrix
+from services.settlement import SettlementPipeline
+
+
+def pipeline(rates=lambda: RateMatrix(REFERENCE_USD_RATES), **options):
+    return SettlementPipeline(rates, path=':memory:', background=False, fee_rate=0.029, **options)
+
+
+def test_fees_and_usd_amounts_use_the_rate_matrix():
+    settlement = pipeline()
+    settlement.submit('P-1', 'C-1', 100.0, 'EUR')
+    settlement.submit('P-1', 'C-1', 40.0, 'EUR', kind='refund')
+    settlement.submit('P-2', 'C-2', 50.0, 'XYZ')  # unknown currencies settle at par with USD
+
+    assert settlement.settle_pending() == 3
+
+    charge, refund = settlement.status('P-1')['entries']
+    assert (charge['fee'], charge['net']) == (2.9, 97.1)
+    assert charge['usd_rate'] == pytest.approx(1 / 0.85)
+    assert (charge['usd_amount'], charge['usd_fee']) == (117.65, 3.41)
+    assert (refund['amount'], refund['fee'], refund['usd_amount']) == (-40.0, 0.0, -47.06)
+    assert settlement.status('P-2')['entries'][0]['usd_amount'] == 50.0
+
+
+def test_a_payment_settles_once_however_often_it_is_queued():
+    settlement = pipeline()
+    settlement.submit('P-1', 'C-1', 100.0, 'USD')
+    settlement.settle_pending()
+    settlement.submit('P-1', 'C-1', 100.0, 'USD')
+    settlement.settle_pending()
+
+    stats = settlement.stats()
+    assert (stats['batches'], stats['duplicates'], stats['usd_settled']) == (2, 1, 100.0)
+    assert len(settlement.status('P-1')['entries']) == 1
+
+
+def test_a_failed_batch_is_requeued_in_order():
+    snapshots = iter([RuntimeError("rates unavailable")])
+
+    def rates():
+        error = next(snapshots, None)
+        if error:
+            raise error
+        return RateMatrix(REFERENCE_USD_RATES)
+
+    settlement = pipeline(rates, batch_size=2)
+    for index in range(3):
+        settlement.submit(f'P-{index}', 'C-1', 10.0, 'USD')
+
+    assert settlement.settle_pending() == 0
+    assert settlement.stats()['queued'] == 3
+    assert settlement.status('P-0')['status'] == 'pending'
+
+    assert settlement.settle_pending() == 3
+    assert settlement.stats()['queued'] == 0
+    assert [settlement.status(f'P-{index}')['status'] for index in range(3)] == ['settled'] * 3
+
+
+def test_a_live_cross_rate_sets_both_directions():
+    matrix = RateMatrix(REFERENCE_USD_RATES, {('EUR', 'GBP'): 0.8})
+    assert matrix.rate('EUR', 'GBP') == 0.8
+    assert matrix.rate('GBP', 'EUR') == 1.25
+
+    quoted = RateMatrix(REFERENCE_USD_RATES, {('EUR', 'GBP'): 0.8, ('GBP', 'EUR'): 1.2})
+    assert quoted.rate('GBP', 'EUR') == 1.2
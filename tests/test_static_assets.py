@@ -0,0 +1,36 @@
+import gzip
+
+import main
+from services.static_assets import IMMUTABLE_CACHE_CONTROL
+
+
+def test_the_index_is_revalidated_with_its_etag(client):
+    first = client.get('/')
+    assert first.status_code == 200 and first.headers['Cache-Control'] == 'no-cache'
+    assert main.static_assets.url_for('js/app.js').encode() in first.data
+
+    repeat = client.get('/', headers={'If-None-Match': first.headers['ETag']})
+    assert repeat.status_code == 304 and repeat.data == b''
+    assert client.get('/', headers={'If-None-Match': f"W/{first.headers['ETag']}"}).status_code == 304
+    assert client.get('/', headers={'If-None-Match': '"stale"'}).status_code == 200
+
+
+def test_assets_are_served_in_the_best_accepted_encoding(client):
+    url = main.static_assets.url_for('js/app.js')
+    plain = client.get(url)
+    assert plain.headers['Cache-Control'] == IMMUTABLE_CACHE_CONTROL
+    assert 'Content-Encoding' not in plain.headers and plain.headers['Vary'] == 'Accept-Encoding'
+
+    compressed = client.get(url, headers={'Accept-Encoding': 'deflate, gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.data) == plain.data
+    # each representation has its own ETag, so a cached gzip body never answers an identity request
+    assert compressed.headers['ETag'] != plain.headers['ETag']
+
+    refused = client.get(url, headers={'Accept-Encoding': 'gzip;q=0, identity'})
+    assert 'Content-Encoding' not in refused.headers and refused.data == plain.data
+
+
+def test_only_fingerprinted_urls_are_immutable(client):
+    assert client.get('/static/js/app.js').headers['Cache-Control'] == 'no-cache'
+    assert client.get('/static/js/missing.js').status_code == 404
@@ -0,0 +1,58 @@
+import logging
+import os
+import queue
+import subprocess
+import sys
+import threading
+from logging.handlers import QueueListener
+from pathlib import Path
+
+import pytest
+
+from services import structured_logging
+
+APP = Path(__file__).resolve().parent.parent / "app"
+
+FORKING_WORKER = """
+import logging, os
+from services.structured_logging import configure_logging, stop_logging
+
+configure_logging(level='INFO', fmt='text', async_io=True)
+logging.getLogger('parent').info('before fork')
+pid = os.fork()
+if pid == 0:
+    logging.getLogger('child').info('from the child')
+    stop_logging()
+    os._exit(0)
+os.waitpid(pid, 0)
+logging.getLogger('parent').info('after fork')
+stop_logging()
+"""
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs fork()")
+def test_a_forked_child_logs_through_its_own_listener():
+    process = subprocess.run([sys.executable, '-c', FORKING_WORKER], cwd=APP, capture_output=True,
+                             text=True, timeout=30)
+
+    assert process.returncode == 0, process.stderr
+    assert 'INFO:child:from the child' in process.stderr
+    assert 'INFO:parent:after fork' in process.stderr
+    assert 'Traceback' not in process.stderr
+
+
+def test_the_fork_hook_replaces_the_inherited_listener(monkeypatch):
+    # what a forked child inherits: a listener whose thread object exists but never runs there
+    inherited = QueueListener(queue.SimpleQueue(), logging.NullHandler(), respect_handler_level=True)
+    inherited._thread = threading.Thread(target=lambda: None)
+    monkeypatch.setattr(structured_logging, '_listener', inherited)
+
+    structured_logging._restart_listener_in_child()
+
+    listener = structured_logging._listener
+    try:
+        assert listener is not inherited and listener._thread.is_alive()
+        assert (listener.queue, listener.handlers, listener.respect_handler_level) == \
+            (inherited.queue, inherited.handlers, True)
+    finally:
+        listener.stop()
@@ -0,0 +1,104 @@
+import pytest
+
+from services.base_service import ServiceResult
+from services.updated_services import OrderSummaryService
+
+
+def legacy_summary(config, results, currency_display):
+    """The summary as rendered before the templates, kept as the reference output"""
+    items, currency = config.get('items', []), config.get('currency', 'USD')
+    workflow_type, domain = config.get('workflow_type', 'service_request'), config.get('domain', 'general')
+    successful_services = sum(1 for result in results.values() if result.success)
+    total_services = len(results)
+
+    if domain == 'travel':
+        summary_text = f"""# 🧳 Travel Booking Summary
+
+## ✅ **Service Details**
+- **Service Type**: {workflow_type.replace('_', ' ').title()}
+- **Total Cost**: **{currency_display}**
+- **Processing Status**: {successful_services}/{total_services} services completed successfully
+
+## 📋 **Items Booked**
+"""
+        for item in items:
+            summary_text += f"- **{item.get('quantity', 1)}x {item.get('name', 'Service')}** - *{currency} {item.get('price', 0):.2f}*\n"
+        summary_text += f"""
+## 👤 **Customer Information**
+- **Customer ID**: `{config.get('customer_id', 'N/A')}`
+- **Contact Email**: {config.get('customer_email', 'N/A')}
+- **Service Level**: {config.get('service_level', 'Standard')}
+- **Processing Time**: ⚡ Completed in real-time
+"""
+    elif domain == 'ecommerce':
+        summary_text = f"""# 🛒 Order Summary
+
+## ✅ **Order Details**
+- **Order Type**: {workflow_type.replace('_', ' ').title()}
+- **Total Amount**: **{currency_display}**
+- **Processing Status**: {successful_services}/{total_services} processes completed
+
+## 📦 **Items Ordered**
+"""
+        for item in items:
+            summary_text += f"- **{item.get('quantity', 1)}x {item.get('name', 'Product')}** - *{currency} {item.get('price', 0):.2f}*\n"
+        summary_text += f"""
+## 🚚 **Delivery & Payment**
+- **Delivery Timeline**: {config.get('delivery_timeline', 'Standard shipping')}
+- **Payment Method**: {config.get('payment_method', 'Credit Card')}
+- **Customer ID**: `{config.get('customer_id', 'N/A')}`
+- **Email**: {config.get('customer_email', 'N/A')}
+"""
+    else:
+        summary_text = f"""# 📋 Service Summary
+
+## ✅ **Service Details**
+- **Service Type**: {workflow_type.replace('_', ' ').title()}
+- **Domain**: {domain.title()}
+- **Total Cost**: **{currency_display}**
+- **Processing Status**: {successful_services}/{total_services} services completed
+
+## 📋 **Services Requested**
+"""
+        for item in items:
+            summary_text += f"- **{item.get('quantity', 1)}x {item.get('name', 'Service')}** - *{currency} {item.get('price', 0):.2f}*\n"
+        summary_text += f"""
+## 👤 **Customer Information**
+- **Customer ID**: `{config.get('customer_id', 'N/A')}`
+- **Contact**: {config.get('customer_email', 'N/A')}
+- **Service Level**: {config.get('service_level', 'Standard')}
+"""
+
+    if successful_services < total_services:
+        failed_services = [name.replace('_', ' ').title() for name, result in results.items() if not result.success]
+        summary_text += f"""
+## ⚠️ **Important Notice**
+**{len(failed_services)} service(s) encountered issues:**
+"""
+        for service in failed_services:
+            summary_text += f"- ❌ {service}\n"
+        summary_text += f"""
+🔄 **Retry options are available** for failed services using the retry buttons below.
+"""
+    if successful_services == total_services:
+        summary_text += f"""
+## 🎉 **Completion Status**
+> ✅ **All services completed successfully!**  
+> Your {workflow_type.replace('_', ' ')} is fully processed and ready.
+"""
+    return summary_text
+
+
+@pytest.mark.parametrize('domain', ['travel', 'ecommerce', 'healthcare'])
+@pytest.mark.parametrize('failed', [(), ('shipping', 'sms_notification')])
+def test_summaries_match_the_pre_template_output(domain, failed):
+    config = {'domain': domain, 'workflow_type': 'multi_item_order', 'currency': 'EUR', 'customer_id': 'CUST-7',
+              'customer_email': 'ops@acme.com', 'payment_method': 'Corporate Wallet',
+              'items': [{'name': 'Laptop', 'quantity': 2, 'price': 999.5}, {'price': 12}, {'name': '{braces}'}]}
+    results = {name: ServiceResult(name not in failed, {})
+               for name in ('order', 'payment', 'shipping', 'sms_notification')}
+
+    summary = OrderSummaryService().execute(config, results)
+
+    assert summary.success
+    assert summary.data['summary_text'] == legacy_summary(config, results, summary.data['currency_display'])
@@ -0,0 +1,59 @@
+import pytest
+
+from services.wallet import WalletError, WalletLedger, WalletService
+
+
+def test_idle_accounts_and_settled_holds_are_evicted():
+    ledger = WalletLedger(opening_balance=100, max_accounts=2, max_settled_holds=1)
+    open_hold = ledger.reserve('busy', 10)
+    first = ledger.reserve('a', 10)
+    ledger.commit(first.hold_id)
+    ledger.commit(first.hold_id)  # settling twice is still a no-op
+    second = ledger.reserve('b', 20)
+    ledger.release(second.hold_id)
+
+    # 'busy' is least recently used but has an open hold, so 'a' goes
+    assert ledger.stats()['accounts'] == 2
+    assert ledger.balance('busy')['reserved'] == 10
+    assert ledger.hold(first.hold_id) is None
+    with pytest.raises(WalletError):
+        ledger.commit(first.hold_id)
+    assert ledger.commit(open_hold.hold_id).status == 'committed'
+    assert ledger.stats()['accounts_evicted'] >= 1
+
+
+def test_partial_commit_releases_the_rest_and_replays():
+    ledger = WalletLedger(opening_balance=100)
+    hold = ledger.reserve('a', 40)
+    assert ledger.commit(hold.hold_id, 25.5).committed == 2550
+    assert ledger.balance('a')['balance'] == 74.5
+    assert ledger.replay('a') == {'balance': 7450, 'reserved': 0}
+    assert [entry.kind for entry in ledger.entries('a')] == ['open', 'reserve', 'commit', 'release']
+    with pytest.raises(WalletError):
+        ledger.commit(ledger.reserve('a', 10).hold_id, 11)
+
+
+def test_orders_from_the_same_customer_share_a_wallet(client):
+    payments = []
+    for _ in range(2):
+        response = client.post('/api/execute', json={
+            'input': "Book a hotel room for the company team, invoice Ops@Acme.com"}).get_json()
+        assert response['saga']['status'] == 'completed'
+        payments.append(response['results']['payment']['data'])
+
+    # each request gets a fresh customer id, but both are charged to the one wallet
+    first, second = payments
+    assert first['account_id'] == second['account_id'] == 'email:ops@acme.com/USD'
+    assert second['balance'] == first['balance'] - second['committed']
+
+
+def test_settling_a_hold_does_not_reopen_its_evicted_wallet():
+    wallet = WalletService(WalletLedger(opening_balance=100, max_accounts=1))
+    first = wallet.execute('a', 10.0)
+    assert wallet.execute('a', action='commit', hold_id=first.data['hold_id']).data['committed'] == 10.0
+    wallet.execute('b', 20.0)  # evicts a
+
+    # a retried commit is a no-op and reports the hold without its wallet's balance
+    retried = wallet.execute('a', action='commit', hold_id=first.data['hold_id'])
+    assert retried.success and 'balance' not in retried.data
+    assert wallet.ledger.stats()['accounts'] == 1
@@ -0,0 +1,32 @@
+from services.base_service import ServiceResult
+from services.workflow_runs import WorkflowRunStore
+
+
+def render(config, results):
+    return ServiceResult(True, {'summary': f"{config['domain']}: {results['payment'].data['status']}"})
+
+
+def test_runs_are_shared_between_worker_processes(tmp_path):
+    path = tmp_path / "runs.sqlite3"
+    first, second = WorkflowRunStore(path), WorkflowRunStore(path)
+    run = first.create({'domain': 'travel'}, {'payment': ServiceResult(False, {'status': 'failed'})})
+
+    summary, version, cached = second.summary(second.get(run.run_id), render)
+    assert (summary.data['summary'], version, cached) == ('travel: failed', 1, False)
+
+    first.update(run.run_id, {'payment': ServiceResult(True, {'status': 'paid'})})
+    summary, version, cached = second.summary(second.get(run.run_id), render)
+    assert (summary.data['summary'], version, cached) == ('travel: paid', 2, False)
+    assert first.summary(first.get(run.run_id), render)[2] is True
+
+
+def test_unchanged_retry_keeps_version_and_least_recently_used_run_is_evicted(tmp_path):
+    store = WorkflowRunStore(tmp_path / "runs.sqlite3", capacity=2)
+    old, kept = (store.create({'domain': 'travel'}, {'payment': ServiceResult(True, {'status': 'paid'})})
+                 for _ in range(2))
+    assert store.update(old.run_id, {'payment': ServiceResult(True, {'status': 'paid'})}).version == 1
+
+    store.create({'domain': 'retail'}, {})
+    assert store.get(kept.run_id) is None
+    assert store.get(old.run_id) is not None
+    assert store.stats()['kept'] == 2